@@ -2,9 +2,79 @@
 Punto de entrada principal para el sistema de restaurante
 
 """
-from web.Menu_App import app
+import os
+import argparse
+import sys
+from contextlib import nullcontext
+
+def main():
+    """Interpreta la línea de comandos y ejecuta el comando pedido"""
+    parser = argparse.ArgumentParser(description="Sistema de restaurante")
+    subparsers = parser.add_subparsers(dest="comando")
+    subparsers.add_parser("migrar-sqlite", help="Importa los archivos JSON a la base de datos SQLite")
+    
+    importar = subparsers.add_parser("importar", help="Importa productos en bloque desde CSV o JSONL")
+    importar.add_argument("archivo", help="Archivo a importar, o - para la entrada estándar")
+    importar.add_argument("--formato", choices=("csv", "jsonl"), help="Formato del archivo (por defecto según la extensión)")
+    
+    exportar = subparsers.add_parser("exportar", help="Exporta el catálogo de productos a CSV o JSONL")
+    exportar.add_argument("archivo", help="Archivo de destino, o - para la salida estándar")
+    exportar.add_argument("--formato", choices=("csv", "jsonl"), help="Formato del archivo (por defecto según la extensión)")
+    
+    servir = subparsers.add_parser("serve", help="Servidor de producción con varios procesos que comparten el catálogo")
+    servir.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Número de procesos (por defecto uno por CPU)")
+    servir.add_argument("--bind", default="127.0.0.1:8000", help="Dirección host:puerto en la que escuchar")
+    servir.add_argument("--backlog", type=int, default=128, help="Longitud de la cola de conexiones pendientes")
+    servir.add_argument("--intervalo-recarga", type=float, default=2.0, help="Segundos entre comprobaciones de cambios en los datos (0 para recargar solo con SIGHUP)")
+    servir.add_argument("--sin-registro", action="store_true", help="No escribir una línea por petición")
+    
+    args = parser.parse_args()
+    
+    if args.comando == "migrar-sqlite":
+        from persistence.Conexion_SQLite import Conexion_SQLite
+        for tabla, cantidad in Conexion_SQLite.migrar_desde_json().items():
+            print(f"{tabla}: {cantidad} registros importados")
+        return
+    
+    if args.comando == "serve":
+        from web import create_app
+        from web.Servidor import Servidor
+        servidor = Servidor(create_app(), args.bind, args.workers, args.backlog, args.intervalo_recarga, not args.sin_registro)
+        if not servidor.servir():
+            sys.exit(1)
+        return
+    
+    if args.comando in ("importar", "exportar"):
+        importar_exportar(parser, args)
+        return
+    
+    # Ejecutar la aplicación
+    from web import create_app
+    create_app().run(debug=True)
+
+def importar_exportar(parser, args):
+    """Ejecuta los comandos de importación y exportación del catálogo"""
+    from domain.service.Producto_Service import Producto_Service
+    
+    formato = args.formato or Producto_Service.formato_desde_nombre(args.archivo)
+    if formato is None:
+        parser.error("No se pudo deducir el formato; indique --formato csv o --formato jsonl")
+    
+    if args.comando == "importar":
+        # La entrada estándar no es del comando y no se cierra
+        archivo = nullcontext(sys.stdin) if args.archivo == "-" else open(args.archivo, 'r', encoding='utf-8', newline='')
+        with archivo as entrada:
+            resultado = Producto_Service.importar_productos(entrada, formato)
+        for linea, motivo in resultado['errores']:
+            print(f"Línea {linea}: {motivo}", file=sys.stderr)
+        print(f"{resultado['importados']} productos importados, {len(resultado['errores'])} filas rechazadas")
+    else:
+        archivo = nullcontext(sys.stdout) if args.archivo == "-" else open(args.archivo, 'w', encoding='utf-8', newline='')
+        with archivo as salida:
+            total = Producto_Service.exportar_productos(salida, formato)
+        if args.archivo != "-":
+            print(f"{total} productos exportados")
 
 # Punto de entrada principal
 if __name__ == "__main__":
-    # Ejecutar la aplicación
-    app.run(debug=True)
+    main()
@@ -0,0 +1,3 @@
+"""
+Inicializador de módulos para el paquete benchmarks
+"""
@@ -0,0 +1,83 @@
+"""
+Benchmark del arranque de la aplicación
+
+Mide, en procesos nuevos, el tiempo de importar el paquete web, de crear la
+aplicación con create_app y de servir la primera petición con el cliente de
+pruebas de Flask (que incluye la primera carga de los datos y la
+compilación de las plantillas). Estos tiempos marcan lo que tarda un
+proceso del servidor en estar listo y lo que tarda en arrancar cada
+ejecución de pruebas.
+
+Uso: python -m benchmarks.bench_arranque [--repeticiones 5] [--ruta /]
+     [--salida resultados.json]
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Código que se ejecuta en cada proceso nuevo; imprime un JSON con los tiempos
+MEDICION = """
+import json, sys, time
+resultado = {}
+inicio = time.perf_counter()
+try:
+    import web
+    resultado['importar_web_ms'] = (time.perf_counter() - inicio) * 1000
+    
+    inicio = time.perf_counter()
+    app = web.create_app()
+    resultado['crear_app_ms'] = (time.perf_counter() - inicio) * 1000
+    
+    inicio = time.perf_counter()
+    respuesta = app.test_client().get(sys.argv[1])
+    respuesta.close()
+    resultado['primera_respuesta_ms'] = (time.perf_counter() - inicio) * 1000
+    resultado['estado'] = respuesta.status_code
+    
+    inicio = time.perf_counter()
+    app.test_client().get(sys.argv[1]).close()
+    resultado['segunda_respuesta_ms'] = (time.perf_counter() - inicio) * 1000
+except ImportError as e:
+    resultado['error'] = str(e)
+resultado['modulos'] = len(sys.modules)
+print(json.dumps(resultado))
+"""
+
+def medir_proceso(ruta):
+    """
+    Ejecuta la medición en un intérprete nuevo
+    
+    Returns:
+        dict: Tiempos del proceso
+    """
+    proceso = subprocess.run([sys.executable, "-c", MEDICION, ruta], stdout=subprocess.PIPE, check=True)
+    return json.loads(proceso.stdout.decode('utf-8').strip().splitlines()[-1])
+
+def main():
+    """Repite la medición y muestra la mediana de cada tiempo"""
+    parser = argparse.ArgumentParser(description="Benchmark del arranque de la aplicación")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Procesos a medir")
+    parser.add_argument("--ruta", default="/", help="Ruta de la primera petición")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+    
+    mediciones = [medir_proceso(args.ruta) for _ in range(args.repeticiones)]
+    claves = ('importar_web_ms', 'crear_app_ms', 'primera_respuesta_ms', 'segunda_respuesta_ms')
+    resumen = {
+        clave: statistics.median(m[clave] for m in mediciones)
+        for clave in claves if all(clave in m for m in mediciones)
+    }
+    
+    for clave, valor in resumen.items():
+        print(f"{clave:<24} {valor:9.1f}", file=sys.stderr)
+    if 'error' in mediciones[0]:
+        print(f"Medición incompleta: {mediciones[0]['error']}", file=sys.stderr)
+    
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump({'ruta': args.ruta, 'mediana': resumen, 'mediciones': mediciones}, file, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
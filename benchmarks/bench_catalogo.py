@@ -0,0 +1,372 @@
+"""
+Benchmark de repositorios, servicios y rutas con catálogos sintéticos
+
+Genera catálogos de distintos tamaños en un directorio de datos temporal y
+mide cada operación de Producto_Repositorio y Categoria_Repositorio, cada
+método de los servicios y cada ruta de Flask a través del cliente de
+pruebas. De cada operación se informa la latencia p50/p99, el rendimiento
+en operaciones por segundo y el pico de memoria asignada.
+
+Cada tamaño se ejecuta en un proceso aparte para que las cachés y los
+índices de un catálogo no se mezclen con los del siguiente y para que el
+pico de memoria del proceso corresponda solo a ese catálogo.
+
+Uso: python -m benchmarks.bench_catalogo [--tamanos 1000,10000,100000]
+     [--categorias 12] [--lecturas 50] [--escrituras 10] [--sin-rutas]
+     [--salida resultados.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TAMANOS = (1000, 10000, 100000)
+
+def generar_catalogo(data_dir, cantidad, categorias):
+    """
+    Escribe categorias.json y productos.json con datos sintéticos
+    
+    Args:
+        data_dir: Directorio de datos de destino
+        cantidad: Número de productos
+        categorias: Número de categorías
+    """
+    data_categorias = [
+        {'id': c, 'nombre': f"Categoría {c}", 'descripcion': f"Descripción de la categoría {c}"}
+        for c in range(1, categorias + 1)
+    ]
+    data_productos = [
+        {
+            'id': i,
+            'nombre': f"Producto {i}",
+            'descripcion': f"Descripción del producto {i}",
+            'precio': 1000 + i % 500,
+            'categoria_id': i % categorias + 1,
+            'nombre_categoria': f"Categoría {i % categorias + 1}"
+        }
+        for i in range(1, cantidad + 1)
+    ]
+    
+    # Mismo formato que Conexion.save_json
+    for file_name, data in (("categorias.json", data_categorias), ("productos.json", data_productos)):
+        with open(os.path.join(data_dir, file_name), 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=4, ensure_ascii=False)
+
+def percentil(tiempos, p):
+    """Obtiene el percentil p (0-100) de una lista ordenada de tiempos"""
+    return tiempos[min(len(tiempos) - 1, round(p / 100 * (len(tiempos) - 1)))]
+
+def medir(capa, nombre, funcion, repeticiones):
+    """
+    Mide una operación repetida
+    
+    La primera llamada se mide aparte, porque construye los índices que se
+    crean bajo demanda, y la última se repite con tracemalloc para obtener
+    el pico de memoria sin distorsionar los tiempos.
+    
+    Args:
+        capa: Capa medida ("repositorio", "servicio" o "ruta")
+        nombre: Nombre de la operación
+        funcion: Función que recibe el número de repetición
+        repeticiones: Número de llamadas cronometradas
+        
+    Returns:
+        dict: Resultado de la medición
+    """
+    inicio = time.perf_counter()
+    funcion(0)
+    primera = time.perf_counter() - inicio
+    
+    tiempos = []
+    for i in range(1, repeticiones + 1):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append(time.perf_counter() - inicio)
+    
+    tracemalloc.start()
+    funcion(repeticiones + 1)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    tiempos.sort()
+    total = sum(tiempos)
+    return {
+        'capa': capa,
+        'nombre': nombre,
+        'repeticiones': repeticiones,
+        'primera_ms': primera * 1000,
+        'p50_ms': percentil(tiempos, 50) * 1000,
+        'p99_ms': percentil(tiempos, 99) * 1000,
+        'media_ms': total / repeticiones * 1000,
+        'ops_por_segundo': repeticiones / total if total else None,
+        'pico_bytes': pico
+    }
+
+def medir_carga_en_frio(repeticiones):
+    """
+    Mide la carga completa del catálogo descartando las cachés cada vez
+    
+    Returns:
+        dict: Resultado de la medición
+    """
+    from persistence.Conexion import Conexion
+    from persistence.Producto_Repositorio import Producto_Repositorio
+    
+    def cargar(_):
+        Conexion.invalidar_cache()
+        Producto_Repositorio.listar_productos()
+    
+    return medir("almacenamiento", "carga en frío de productos", cargar, repeticiones)
+
+def operaciones_repositorio(cantidad, categorias, lecturas, escrituras):
+    """Mide las operaciones de los repositorios"""
+    from persistence.Producto_Repositorio import Producto_Repositorio
+    from persistence.Categoria_Repositorio import Categoria_Repositorio
+    
+    def id_producto(i):
+        return i * 7919 % cantidad + 1
+    
+    def categoria(i):
+        return i % categorias + 1
+    
+    resultados = [
+        medir("repositorio", "Producto.listar_productos", lambda i: Producto_Repositorio.listar_productos(), lecturas),
+        medir("repositorio", "Producto.buscar_por_id", lambda i: Producto_Repositorio.buscar_por_id(id_producto(i)), lecturas),
+        medir("repositorio", "Producto.listar_por_categoria", lambda i: Producto_Repositorio.listar_por_categoria(categoria(i)), lecturas),
+        medir("repositorio", "Producto.contar_por_categoria", lambda i: Producto_Repositorio.contar_por_categoria(categoria(i)), lecturas),
+        medir("repositorio", "Producto.listar_pagina", lambda i: Producto_Repositorio.listar_pagina(i * 50 % cantidad, 50), lecturas),
+        medir("repositorio", "Producto.listar_por_rango_precio", lambda i: Producto_Repositorio.listar_por_rango_precio(1000, 1010), lecturas),
+        medir("repositorio", "Producto.buscar", lambda i: Producto_Repositorio.buscar(f"producto {i}"), lecturas),
+        medir("repositorio", "Categoria.listar_categorias", lambda i: Categoria_Repositorio.listar_categorias(), lecturas),
+        medir("repositorio", "Categoria.buscar_por_id", lambda i: Categoria_Repositorio.buscar_por_id(categoria(i)), lecturas)
+    ]
+    
+    creados = []
+    resultados.append(medir(
+        "repositorio", "Producto.crear",
+        lambda i: creados.append(Producto_Repositorio.crear(f"Nuevo {i}", "Benchmark", 1500, categoria(i), f"Categoría {categoria(i)}")),
+        escrituras
+    ))
+    resultados.append(medir(
+        "repositorio", "Producto.actualizar",
+        lambda i: Producto_Repositorio.actualizar(creados[i], f"Editado {i}", "Benchmark", 1600 + i, categoria(i + 1), f"Categoría {categoria(i + 1)}"),
+        escrituras
+    ))
+    resultados.append(medir("repositorio", "Producto.eliminar", lambda i: Producto_Repositorio.eliminar(creados[i]), escrituras))
+    
+    categorias_creadas = []
+    resultados.append(medir(
+        "repositorio", "Categoria.crear",
+        lambda i: categorias_creadas.append(Categoria_Repositorio.crear(f"Nueva {i}", "Benchmark")),
+        escrituras
+    ))
+    resultados.append(medir(
+        "repositorio", "Categoria.actualizar",
+        lambda i: Categoria_Repositorio.actualizar(categorias_creadas[i], f"Editada {i}", "Benchmark"),
+        escrituras
+    ))
+    resultados.append(medir("repositorio", "Categoria.eliminar", lambda i: Categoria_Repositorio.eliminar(categorias_creadas[i]), escrituras))
+    return resultados
+
+def operaciones_servicio(cantidad, categorias, lecturas, escrituras):
+    """Mide los métodos de los servicios"""
+    from domain.service.Producto_Service import Producto_Service
+    from domain.service.Categoria_Service import Categoria_Service
+    
+    def categoria(i):
+        return i % categorias + 1
+    
+    resultados = [
+        medir("servicio", "Producto.listar_productos", lambda i: Producto_Service.listar_productos(), lecturas),
+        medir("servicio", "Producto.obtener_producto", lambda i: Producto_Service.obtener_producto(i * 7919 % cantidad + 1), lecturas),
+        medir("servicio", "Producto.listar_productos_por_categoria", lambda i: Producto_Service.listar_productos_por_categoria(categoria(i)), lecturas),
+        medir("servicio", "Producto.listar_productos_paginado", lambda i: Producto_Service.listar_productos_paginado(i % 20 + 1), lecturas),
+        medir("servicio", "Producto.listar_productos_paginado (precio)", lambda i: Producto_Service.listar_productos_paginado(1, precio_min=1000, precio_max=1100, orden='precio_desc'), lecturas),
+        medir("servicio", "Producto.buscar", lambda i: Producto_Service.buscar(f"producto {i}"), lecturas),
+        medir("servicio", "Producto.menu_agrupado", lambda i: Producto_Service.menu_agrupado(), lecturas),
+        medir("servicio", "Categoria.listar_categorias", lambda i: Categoria_Service.listar_categorias(), lecturas),
+        medir("servicio", "Categoria.conteos_productos", lambda i: Categoria_Service.conteos_productos(), lecturas)
+    ]
+    
+    creados = []
+    resultados.append(medir(
+        "servicio", "Producto.crear_producto",
+        lambda i: creados.append(Producto_Service.crear_producto(f"Nuevo {i}", "Benchmark", 1500, categoria(i))),
+        escrituras
+    ))
+    resultados.append(medir(
+        "servicio", "Producto.actualizar_producto",
+        lambda i: Producto_Service.actualizar_producto(creados[i], f"Editado {i}", "Benchmark", 1600 + i, categoria(i + 1)),
+        escrituras
+    ))
+    resultados.append(medir("servicio", "Producto.eliminar_producto", lambda i: Producto_Service.eliminar_producto(creados[i]), escrituras))
+    resultados.append(medir(
+        "servicio", "Categoria.actualizar_categoria",
+        lambda i: Categoria_Service.actualizar_categoria(categoria(i), f"Categoría {categoria(i)} v{i}", "Benchmark"),
+        escrituras
+    ))
+    return resultados
+
+def operaciones_rutas(cantidad, categorias, lecturas, escrituras):
+    """
+    Mide las rutas de Flask a través del cliente de pruebas
+    
+    Las páginas cacheadas se sirven desde la caché de páginas a partir de la
+    segunda petición, igual que en producción.
+    """
+    from web.App import App
+    
+    cliente = App().app.test_client()
+    
+    def get(url):
+        def peticion(i):
+            respuesta = cliente.get(url(i))
+            respuesta.close()
+            if respuesta.status_code != 200:
+                raise RuntimeError(f"GET {url(i)}: {respuesta.status_code}")
+        return peticion
+    
+    def post(url, datos=None):
+        def peticion(i):
+            respuesta = cliente.post(url(i), data=datos(i) if datos else None)
+            respuesta.close()
+            if respuesta.status_code >= 400:
+                raise RuntimeError(f"POST {url(i)}: {respuesta.status_code}")
+        return peticion
+    
+    resultados = [
+        medir("ruta", "GET /", get(lambda i: "/"), lecturas),
+        medir("ruta", "GET /menu", get(lambda i: "/menu"), lecturas),
+        medir("ruta", "GET /categorias", get(lambda i: "/categorias"), lecturas),
+        medir("ruta", "GET /productos", get(lambda i: "/productos"), lecturas),
+        medir("ruta", "GET /productos?pagina=N", get(lambda i: f"/productos?pagina={i % 20 + 1}"), lecturas),
+        medir("ruta", "GET /productos/categoria/N", get(lambda i: f"/productos/categoria/{i % categorias + 1}"), lecturas),
+        medir("ruta", "GET /productos/buscar", get(lambda i: f"/productos/buscar?q=producto+{i}"), lecturas),
+        medir("ruta", "GET /api/productos/N", get(lambda i: f"/api/productos/{i * 7919 % cantidad + 1}"), lecturas)
+    ]
+    
+    from persistence.Producto_Repositorio import Producto_Repositorio
+    
+    def formulario(i):
+        return {'nombre': f"Web {i}", 'descripcion': "Benchmark", 'precio': str(1500 + i), 'categoria_id': str(i % categorias + 1)}
+    
+    # Los IDs que recibirán las altas, para editarlas y eliminarlas después
+    primero = Producto_Repositorio.obtener_siguiente_id()
+    resultados.append(medir("ruta", "POST /productos/nuevo", post(lambda i: "/productos/nuevo", formulario), escrituras))
+    resultados.append(medir("ruta", "POST /productos/editar/N", post(lambda i: f"/productos/editar/{primero + i}", formulario), escrituras))
+    resultados.append(medir("ruta", "POST /productos/eliminar/N", post(lambda i: f"/productos/eliminar/{primero + i}"), escrituras))
+    return resultados
+
+def ejecutar_tamano(cantidad, args):
+    """
+    Genera un catálogo y ejecuta todas las mediciones sobre él
+    
+    Args:
+        cantidad: Número de productos del catálogo
+        args: Argumentos de la línea de comandos
+        
+    Returns:
+        dict: Resultados del catálogo
+    """
+    with tempfile.TemporaryDirectory(prefix="bench_catalogo_") as data_dir:
+        from persistence.Conexion import Conexion
+        Conexion.DATA_DIR = data_dir
+        
+        inicio = time.perf_counter()
+        generar_catalogo(data_dir, cantidad, args.categorias)
+        if Conexion.BACKEND == 'sqlite':
+            from persistence.Conexion_SQLite import Conexion_SQLite
+            Conexion_SQLite.migrar_desde_json()
+        generacion = time.perf_counter() - inicio
+        
+        operaciones = [medir_carga_en_frio(max(args.escrituras, 3))]
+        operaciones += operaciones_repositorio(cantidad, args.categorias, args.lecturas, args.escrituras)
+        operaciones += operaciones_servicio(cantidad, args.categorias, args.lecturas, args.escrituras)
+        
+        rutas = None
+        if not args.sin_rutas:
+            try:
+                operaciones += operaciones_rutas(cantidad, args.categorias, args.lecturas, args.escrituras)
+                rutas = True
+            except ImportError as e:
+                print(f"Rutas omitidas: {e}", file=sys.stderr)
+                rutas = False
+        
+        return {
+            'productos': cantidad,
+            'categorias': args.categorias,
+            'backend': Conexion.BACKEND,
+            'journal': Conexion.JOURNAL_ACTIVO,
+            'generacion_s': generacion,
+            'bytes_productos': os.path.getsize(os.path.join(data_dir, "productos.json")),
+            'rutas': rutas,
+            'rss_max_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+            'operaciones': operaciones
+        }
+
+def imprimir(resultado):
+    """Imprime los resultados de un catálogo como tabla"""
+    print(f"\n{resultado['productos']} productos, {resultado['categorias']} categorías "
+          f"(backend {resultado['backend']}, RSS máximo {resultado['rss_max_kib']} KiB)", file=sys.stderr)
+    print(f"{'capa':<15} {'operación':<48} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>10} {'pico KiB':>10}", file=sys.stderr)
+    for r in resultado['operaciones']:
+        ops = f"{r['ops_por_segundo']:10.0f}" if r['ops_por_segundo'] else f"{'-':>10}"
+        print(f"{r['capa']:<15} {r['nombre']:<48} {r['p50_ms']:9.3f} {r['p99_ms']:9.3f} {ops} {r['pico_bytes'] / 1024:10.0f}", file=sys.stderr)
+
+def main():
+    """Ejecuta el benchmark para cada tamaño y guarda los resultados en JSON"""
+    parser = argparse.ArgumentParser(description="Benchmark del catálogo a distintas escalas")
+    parser.add_argument("--tamanos", default=",".join(map(str, TAMANOS)), help="Números de productos separados por comas (por ejemplo 1000,10000,100000,1000000)")
+    parser.add_argument("--categorias", type=int, default=12, help="Número de categorías")
+    parser.add_argument("--lecturas", type=int, default=50, help="Repeticiones de cada operación de lectura")
+    parser.add_argument("--escrituras", type=int, default=10, help="Repeticiones de cada operación de escritura")
+    parser.add_argument("--sin-rutas", action="store_true", help="No medir las rutas de Flask")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto la salida estándar)")
+    parser.add_argument("--tamano", type=int, help=argparse.SUPPRESS)  # Uso interno: un solo tamaño en este proceso
+    args = parser.parse_args()
+    
+    if args.tamano is not None:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump(ejecutar_tamano(args.tamano, args), file)
+        return
+    
+    # Cada tamaño en un proceso nuevo con los mismos argumentos; lo que
+    # imprima el proceso hijo no se mezcla con el JSON de resultados
+    resultados = []
+    for cantidad in (int(t) for t in args.tamanos.split(",") if t.strip()):
+        with tempfile.NamedTemporaryFile(suffix=".json") as salida:
+            comando = [sys.executable, "-m", "benchmarks.bench_catalogo", "--tamano", str(cantidad),
+                       "--categorias", str(args.categorias), "--lecturas", str(args.lecturas),
+                       "--escrituras", str(args.escrituras), "--salida", salida.name]
+            if args.sin_rutas:
+                comando.append("--sin-rutas")
+            subprocess.run(comando, stdout=sys.stderr, check=True)
+            resultado = json.load(salida)
+        imprimir(resultado)
+        resultados.append(resultado)
+    
+    informe = {
+        'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'resultados': resultados
+    }
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump(informe, file, indent=4, ensure_ascii=False)
+    else:
+        json.dump(informe, sys.stdout, indent=4, ensure_ascii=False)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Latencia de entrega de los avisos de /eventos con muchos suscriptores
+
+Abre N suscriptores de Centro_Eventos, cada uno en su hilo como lo estaría
+con una conexión abierta al servidor, y comprueba primero que en reposo
+apenas consumen CPU. Después hace una serie de cambios a través de
+Producto_Service sobre un catálogo sintético y mide, para cada cambio y
+suscriptor, el tiempo desde que se confirma el cambio hasta que el
+suscriptor recibe un aviso con esa versión o una posterior.
+
+Termina con código 1 si algún suscriptor no recibe algún cambio o si la
+latencia p99 supera el límite.
+
+Uso: python -m benchmarks.bench_eventos [--suscriptores 500] [--cambios 50]
+     [--pausa-ms 20] [--reposo 2] [--limite-ms 250] [--salida resultados.json]
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from benchmarks.bench_catalogo import generar_catalogo, percentil
+
+def escuchar(flujo, recibidos, listo):
+    """
+    Consume el flujo de un suscriptor anotando cuándo llega cada versión
+    
+    Args:
+        flujo: Generador devuelto por Centro_Eventos.suscribir
+        recibidos: Lista donde anotar (versión, instante)
+        listo: Evento que se activa al quedar suscrito
+    """
+    next(flujo)
+    listo.set()
+    for fragmento in flujo:
+        ahora = time.perf_counter()
+        for evento in fragmento.split(b"\n\n"):
+            if evento.startswith(b"id: "):
+                recibidos.append((int(evento[4:evento.index(b"\n")]), ahora))
+
+def main():
+    """Mide la latencia de entrega e imprime el resultado"""
+    parser = argparse.ArgumentParser(description="Latencia de entrega de avisos con muchos suscriptores")
+    parser.add_argument("--suscriptores", type=int, default=500, help="Número de suscriptores")
+    parser.add_argument("--cambios", type=int, default=50, help="Número de cambios")
+    parser.add_argument("--pausa-ms", type=float, default=20.0, help="Pausa entre cambios")
+    parser.add_argument("--reposo", type=float, default=2.0, help="Segundos de reposo para medir la CPU sin cambios")
+    parser.add_argument("--productos", type=int, default=1000, help="Número de productos del catálogo")
+    parser.add_argument("--limite-ms", type=float, default=250.0, help="Latencia p99 máxima aceptada")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+    
+    from persistence.Conexion import Conexion
+    from persistence.Registro_Cambios import Registro_Cambios
+    from domain.service.Producto_Service import Producto_Service
+    from web.Centro_Eventos import Centro_Eventos
+    
+    with tempfile.TemporaryDirectory(prefix="bench_eventos_") as data_dir:
+        Conexion.DATA_DIR = data_dir
+        generar_catalogo(data_dir, args.productos, 12)
+        if Conexion.BACKEND == 'sqlite':
+            from persistence.Conexion_SQLite import Conexion_SQLite
+            Conexion_SQLite.migrar_desde_json()
+        productos = Producto_Service.listar_productos()
+        
+        # Instante en que se confirma cada cambio, justo después de avisar al centro
+        confirmaciones = []
+        Registro_Cambios.observar(lambda: confirmaciones.append(time.perf_counter()))
+        
+        recibidos = [[] for _ in range(args.suscriptores)]
+        hilos = []
+        for lista in recibidos:
+            listo = threading.Event()
+            hilo = threading.Thread(target=escuchar, args=(Centro_Eventos.suscribir(), lista, listo), daemon=True)
+            hilo.start()
+            listo.wait()
+            hilos.append(hilo)
+        
+        cpu = time.process_time()
+        time.sleep(args.reposo)
+        cpu_reposo = (time.process_time() - cpu) / args.reposo * 100
+        
+        enviados = {}
+        escrituras = []
+        for i in range(args.cambios):
+            producto = productos[i % len(productos)]
+            inicio = time.perf_counter()
+            if not Producto_Service.actualizar_producto(
+                producto.id, f"{producto.nombre} ({i})", producto.descripcion, producto.precio, producto.categoria_id
+            ):
+                print(f"No se pudo actualizar el producto {producto.id}", file=sys.stderr)
+                return 1
+            escrituras.append(time.perf_counter() - inicio)
+            enviados[Registro_Cambios.version()] = confirmaciones[-1]
+            time.sleep(args.pausa_ms / 1000)
+        
+        # Margen para los últimos avisos antes de cerrar los flujos
+        ultima = max(enviados)
+        fin = time.monotonic() + 5
+        while time.monotonic() < fin and not all(lista and lista[-1][0] >= ultima for lista in recibidos):
+            time.sleep(0.01)
+        Centro_Eventos.cerrar()
+        for hilo in hilos:
+            hilo.join(1)
+    
+    latencias = []
+    perdidos = 0
+    for lista in recibidos:
+        for version, confirmado in enviados.items():
+            recibido = next((instante for recibida, instante in lista if recibida >= version), None)
+            if recibido is None:
+                perdidos += 1
+            else:
+                latencias.append(recibido - confirmado)
+    latencias.sort()
+    
+    informe = {
+        'suscriptores': args.suscriptores,
+        'cambios': args.cambios,
+        'cpu_reposo_pct': cpu_reposo,
+        'escritura_p50_ms': percentil(sorted(escrituras), 50) * 1000,
+        'entregas': len(latencias),
+        'perdidos': perdidos,
+        'p50_ms': percentil(latencias, 50) * 1000 if latencias else None,
+        'p99_ms': percentil(latencias, 99) * 1000 if latencias else None,
+        'max_ms': latencias[-1] * 1000 if latencias else None,
+        'limite_ms': args.limite_ms
+    }
+    
+    print(f"{args.suscriptores} suscriptores, {args.cambios} cambios: CPU en reposo {cpu_reposo:.1f} %, "
+          f"escritura p50 {informe['escritura_p50_ms']:.2f} ms", file=sys.stderr)
+    if latencias:
+        print(f"entrega p50 {informe['p50_ms']:.2f} ms, p99 {informe['p99_ms']:.2f} ms, "
+              f"máx {informe['max_ms']:.2f} ms, {perdidos} perdidos", file=sys.stderr)
+    
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump(informe, file, indent=4, ensure_ascii=False)
+    
+    correcto = not perdidos and latencias and informe['p99_ms'] <= args.limite_ms
+    if not correcto:
+        print(f"FALLO: se esperaba entregar todos los cambios con p99 <= {args.limite_ms} ms", file=sys.stderr)
+    return 0 if correcto else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
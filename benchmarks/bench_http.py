@@ -0,0 +1,131 @@
+"""
+Generador de carga HTTP para el servidor de producción
+
+Lanza peticiones concurrentes contra un servidor en marcha durante un
+tiempo fijo, repartidas entre varias rutas, e informa del rendimiento, la
+latencia p50/p99 y los errores por ruta.
+
+Uso: python Main.py serve --workers 4 --sin-registro &
+     python -m benchmarks.bench_http [--url http://127.0.0.1:8000]
+     [--rutas /menu,/productos] [--concurrencia 16] [--duracion 10]
+     [--salida resultados.json]
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+RUTAS = ("/", "/menu", "/productos", "/categorias", "/api/menu")
+
+def percentil(tiempos, p):
+    """Obtiene el percentil p (0-100) de una lista ordenada de tiempos"""
+    return tiempos[min(len(tiempos) - 1, round(p / 100 * (len(tiempos) - 1)))]
+
+def generar_carga(url, rutas, concurrencia, duracion):
+    """
+    Ejecuta la carga y recoge los tiempos de cada petición
+    
+    Args:
+        url: URL base del servidor
+        rutas: Rutas a pedir, en rotación
+        concurrencia: Número de clientes simultáneos
+        duracion: Segundos de carga
+        
+    Returns:
+        dict: ruta -> {'tiempos': [...], 'errores': n}
+    """
+    destino = urlsplit(url)
+    resultados = {ruta: {'tiempos': [], 'errores': 0} for ruta in rutas}
+    lock = threading.Lock()
+    fin = time.monotonic() + duracion
+    
+    def cliente(desfase):
+        propios = {ruta: ([], [0]) for ruta in rutas}
+        i = desfase
+        while time.monotonic() < fin:
+            ruta = rutas[i % len(rutas)]
+            i += 1
+            tiempos, errores = propios[ruta]
+            inicio = time.perf_counter()
+            try:
+                conexion = http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=30)
+                conexion.request("GET", ruta)
+                respuesta = conexion.getresponse()
+                respuesta.read()
+                conexion.close()
+                if respuesta.status >= 400:
+                    errores[0] += 1
+                    continue
+            except OSError:
+                errores[0] += 1
+                continue
+            tiempos.append(time.perf_counter() - inicio)
+        
+        with lock:
+            for ruta, (tiempos, errores) in propios.items():
+                resultados[ruta]['tiempos'].extend(tiempos)
+                resultados[ruta]['errores'] += errores[0]
+    
+    hilos = [threading.Thread(target=cliente, args=(n,)) for n in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados
+
+def resumir(resultados, duracion):
+    """Calcula rendimiento y percentiles por ruta y en total"""
+    resumen = []
+    todos = []
+    for ruta, datos in resultados.items():
+        tiempos = sorted(datos['tiempos'])
+        todos.extend(tiempos)
+        resumen.append({
+            'ruta': ruta,
+            'peticiones': len(tiempos),
+            'errores': datos['errores'],
+            'peticiones_por_segundo': len(tiempos) / duracion,
+            'p50_ms': percentil(tiempos, 50) * 1000 if tiempos else None,
+            'p99_ms': percentil(tiempos, 99) * 1000 if tiempos else None
+        })
+    
+    todos.sort()
+    total = {
+        'ruta': "total",
+        'peticiones': len(todos),
+        'errores': sum(r['errores'] for r in resumen),
+        'peticiones_por_segundo': len(todos) / duracion,
+        'p50_ms': percentil(todos, 50) * 1000 if todos else None,
+        'p99_ms': percentil(todos, 99) * 1000 if todos else None
+    }
+    return resumen + [total]
+
+def main():
+    """Ejecuta la carga contra el servidor indicado e imprime el resultado"""
+    parser = argparse.ArgumentParser(description="Generador de carga HTTP")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base del servidor")
+    parser.add_argument("--rutas", default=",".join(RUTAS), help="Rutas separadas por comas")
+    parser.add_argument("--concurrencia", type=int, default=16, help="Clientes simultáneos")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+    
+    rutas = [ruta for ruta in args.rutas.split(",") if ruta]
+    resumen = resumir(generar_carga(args.url, rutas, args.concurrencia, args.duracion), args.duracion)
+    
+    print(f"{'ruta':<20} {'peticiones':>10} {'errores':>8} {'pet/s':>9} {'p50 ms':>9} {'p99 ms':>9}", file=sys.stderr)
+    for r in resumen:
+        p50 = f"{r['p50_ms']:9.2f}" if r['p50_ms'] is not None else f"{'-':>9}"
+        p99 = f"{r['p99_ms']:9.2f}" if r['p99_ms'] is not None else f"{'-':>9}"
+        print(f"{r['ruta']:<20} {r['peticiones']:>10} {r['errores']:>8} {r['peticiones_por_segundo']:9.1f} {p50} {p99}", file=sys.stderr)
+    
+    if args.salida:
+        informe = {'url': args.url, 'concurrencia': args.concurrencia, 'duracion_s': args.duracion, 'resultados': resumen}
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump(informe, file, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Microbenchmark de la deserialización de modelos
+
+Compara el modelo con __slots__ y from_rows frente a un modelo equivalente
+basado en __dict__ construido fila a fila con from_dict, midiendo tiempo y
+memoria asignada.
+
+Uso: python -m benchmarks.bench_modelos [filas]
+"""
+import sys
+import time
+import tracemalloc
+from domain.model.Producto import Producto
+
+class Producto_Dict:
+    """Modelo de producto con __dict__, equivalente al anterior a __slots__"""
+    
+    def __init__(self, id=None, nombre="", descripcion="", precio=0.0, categoria_id=None, nombre_categoria=None):
+        self.id = id
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.precio = precio
+        self.categoria_id = categoria_id
+        self.nombre_categoria = nombre_categoria
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Crea una instancia desde un diccionario"""
+        return cls(
+            id=data.get('id'),
+            nombre=data.get('nombre', ''),
+            descripcion=data.get('descripcion', ''),
+            precio=data.get('precio', 0.0),
+            categoria_id=data.get('categoria_id'),
+            nombre_categoria=data.get('nombre_categoria')
+        )
+
+def generar_filas(cantidad, categorias=12):
+    """
+    Genera filas sintéticas con la forma de productos.json
+    
+    Los nombres de categoría se construyen por fila, como ocurre al parsear
+    JSON, para que no compartan el objeto cadena.
+    """
+    return [
+        {
+            'id': i,
+            'nombre': f"Producto {i}",
+            'descripcion': f"Descripción del producto {i}",
+            'precio': 1000 + i % 500,
+            'categoria_id': i % categorias + 1,
+            'nombre_categoria': "".join(["Categoría ", str(i % categorias + 1)])
+        }
+        for i in range(1, cantidad + 1)
+    ]
+
+def medir(nombre, funcion, filas):
+    """
+    Mide el tiempo y la memoria asignada por una función de deserialización
+    
+    Returns:
+        dict: Resultado con el tiempo en segundos y los bytes retenidos
+    """
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion(filas)
+    duracion = time.perf_counter() - inicio
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    # Repetición sin tracemalloc, que distorsiona los tiempos
+    inicio = time.perf_counter()
+    funcion(filas)
+    duracion = min(duracion, time.perf_counter() - inicio)
+    
+    del resultado
+    return {'nombre': nombre, 'segundos': duracion, 'bytes': memoria}
+
+def main():
+    """Ejecuta el microbenchmark e imprime la comparación"""
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    filas = generar_filas(cantidad)
+    
+    resultados = [
+        medir("dict + from_dict", lambda rows: [Producto_Dict.from_dict(r) for r in rows], filas),
+        medir("__slots__ + from_dict", lambda rows: [Producto.from_dict(r) for r in rows], filas),
+        medir("__slots__ + from_rows", Producto.from_rows, filas)
+    ]
+    
+    base = resultados[0]
+    print(f"{cantidad} filas")
+    for r in resultados:
+        print(
+            f"{r['nombre']:<24} {r['segundos'] * 1000:8.1f} ms ({base['segundos'] / r['segundos']:.2f}x)  "
+            f"{r['bytes'] / 1024 / 1024:8.1f} MiB ({r['bytes'] / base['bytes']:.0%})"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark de la carga en frío: JSON frente a instantánea binaria
+
+Genera un catálogo sintético y mide, descartando las cachés en cada
+repetición, la lectura de productos.json con Conexion.load_json y la carga
+completa del repositorio (lectura más construcción de objetos e índices),
+primero desde el JSON y después desde la instantánea binaria.
+
+Uso: python -m benchmarks.bench_snapshot [--productos 100000]
+     [--repeticiones 5] [--salida resultados.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from benchmarks.bench_catalogo import generar_catalogo
+
+def medir(funcion, repeticiones, preparar):
+    """
+    Mide una función varias veces
+    
+    Args:
+        funcion: Función a medir
+        repeticiones: Número de mediciones
+        preparar: Función que se ejecuta sin medir antes de cada repetición
+        
+    Returns:
+        float: Mediana en milisegundos
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+def main():
+    """Compara los tiempos de carga de ambos formatos"""
+    parser = argparse.ArgumentParser(description="Carga en frío desde JSON y desde la instantánea binaria")
+    parser.add_argument("--productos", type=int, default=100000, help="Número de productos")
+    parser.add_argument("--categorias", type=int, default=12, help="Número de categorías")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones de cada medición")
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+    
+    from persistence.Conexion import Conexion
+    from persistence.Producto_Repositorio import Producto_Repositorio
+    
+    with tempfile.TemporaryDirectory(prefix="bench_snapshot_") as data_dir:
+        Conexion.DATA_DIR = data_dir
+        generar_catalogo(data_dir, args.productos, args.categorias)
+        archivo = Producto_Repositorio.PRODUCTOS_FILE
+        ruta = Conexion.get_file_path(archivo)
+        
+        def cargar_archivo():
+            Conexion.load_json(archivo)
+        
+        def cargar_repositorio():
+            Producto_Repositorio.listar_productos()
+        
+        def descartar():
+            # Liberar los datos anteriores queda fuera de la medición
+            Conexion.invalidar_cache()
+            Producto_Repositorio._datos = None
+            Producto_Repositorio._por_id = {}
+            Producto_Repositorio._por_categoria = {}
+        
+        resultados = {}
+        for formato, activo in (("json", False), ("snapshot", True)):
+            Conexion.SNAPSHOT_ACTIVO = activo
+            if activo:
+                descartar()
+                cargar_archivo()  # Genera la instantánea
+            resultados[formato] = {
+                'load_json_ms': medir(cargar_archivo, args.repeticiones, descartar),
+                'repositorio_ms': medir(cargar_repositorio, args.repeticiones, descartar)
+            }
+        
+        tamanos = {
+            'json_bytes': os.path.getsize(ruta),
+            'snapshot_bytes': os.path.getsize(ruta + Conexion.SNAPSHOT_SUFIJO)
+        }
+    
+    informe = {
+        'productos': args.productos,
+        'resultados': resultados,
+        'tamanos': tamanos,
+        'aceleracion': {
+            clave: resultados['json'][clave] / resultados['snapshot'][clave]
+            for clave in resultados['json']
+        }
+    }
+    
+    print(f"{args.productos} productos: JSON {tamanos['json_bytes'] / 1024 / 1024:.1f} MiB, "
+          f"instantánea {tamanos['snapshot_bytes'] / 1024 / 1024:.1f} MiB", file=sys.stderr)
+    for clave in resultados['json']:
+        print(f"{clave:<16} JSON {resultados['json'][clave]:9.1f} ms   instantánea "
+              f"{resultados['snapshot'][clave]:9.1f} ms   ({informe['aceleracion'][clave]:.1f}x)", file=sys.stderr)
+    
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as file:
+            json.dump(informe, file, indent=4, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,20 @@
 """
 Modelo para las categorías del menú
 """
+from operator import itemgetter
 
 class Categoria:
     """Modelo para las categorías del menú"""
     
+    __slots__ = ('id', 'nombre', 'descripcion')
+    
+    _CAMPOS = itemgetter(*__slots__)
+    
     def __init__(self, id=None, nombre="", descripcion=""):
         self.id = id
         self.nombre = nombre
         self.descripcion = descripcion
     
-    
     @classmethod
     def from_dict(cls, data):
         """Crea una instancia desde un diccionario"""
@@ -20,6 +24,36 @@ class Categoria:
             descripcion=data.get('descripcion', '')
         )
     
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Crea instancias en bloque desde una lista de diccionarios
+        
+        Args:
+            rows (list): Lista de diccionarios
+            
+        Returns:
+            list: Lista de objetos Categoria
+        """
+        campos = cls._CAMPOS
+        nuevo = object.__new__
+        categorias = []
+        
+        for row in rows:
+            try:
+                id, nombre, descripcion = campos(row)
+            except KeyError:
+                categorias.append(cls.from_dict(row))
+                continue
+            
+            categoria = nuevo(cls)
+            categoria.id = id
+            categoria.nombre = nombre
+            categoria.descripcion = descripcion
+            categorias.append(categoria)
+        
+        return categorias
+    
     def to_dict(self):
         """Convierte la instancia a un diccionario"""
         return {
@@ -1,17 +1,26 @@
 """
 Modelo para los productos del menú
 """
+import sys
+from operator import itemgetter
 
 class Producto:
     """Modelo para los productos del menú"""
     
+    # Sin __dict__ por instancia: el catálogo completo vive en memoria
+    __slots__ = ('id', 'nombre', 'descripcion', 'precio', 'categoria_id', 'nombre_categoria')
+    
+    # nombre_categoria se lee aparte: puede faltar si se resuelve al leer
+    _CAMPOS = itemgetter(*__slots__[:-1])
+    
     def __init__(self, id=None, nombre="", descripcion="", precio=0.0, categoria_id=None, nombre_categoria=None):
         self.id = id
         self.nombre = nombre
         self.descripcion = descripcion
         self.precio = precio
         self.categoria_id = categoria_id
-        self.nombre_categoria = nombre_categoria
+        # Todos los productos de una categoría comparten la misma cadena
+        self.nombre_categoria = sys.intern(nombre_categoria) if isinstance(nombre_categoria, str) else nombre_categoria
     
     @classmethod
     def from_dict(cls, data):
@@ -25,6 +34,49 @@ class Producto:
             nombre_categoria=data.get('nombre_categoria')
         )
     
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Crea instancias en bloque desde una lista de diccionarios
+        
+        Evita la llamada a __init__ y las búsquedas con valor por defecto
+        cuando el registro tiene todos los campos; si falta alguno se usa
+        from_dict para ese registro. El nombre de la categoría es opcional.
+        
+        Args:
+            rows (list): Lista de diccionarios
+            
+        Returns:
+            list: Lista de objetos Producto
+        """
+        campos = cls._CAMPOS
+        nuevo = object.__new__
+        nombres_categoria = {}
+        productos = []
+        
+        for row in rows:
+            try:
+                id, nombre, descripcion, precio, categoria_id = campos(row)
+            except KeyError:
+                productos.append(cls.from_dict(row))
+                continue
+            
+            producto = nuevo(cls)
+            producto.id = id
+            producto.nombre = nombre
+            producto.descripcion = descripcion
+            producto.precio = precio
+            producto.categoria_id = categoria_id
+            
+            nombre_categoria = row.get('nombre_categoria')
+            nombre_interno = nombres_categoria.get(nombre_categoria)
+            if nombre_interno is None and isinstance(nombre_categoria, str):
+                nombre_interno = nombres_categoria[nombre_categoria] = sys.intern(nombre_categoria)
+            producto.nombre_categoria = nombre_interno
+            productos.append(producto)
+        
+        return productos
+    
     def to_dict(self):
         """Convierte la instancia a un diccionario"""
         return {
@@ -0,0 +1,543 @@
+"""
+Catálogo de productos publicado en memoria compartida entre procesos
+"""
+import os
+import atexit
+import struct
+import hashlib
+import threading
+from multiprocessing import shared_memory, resource_tracker
+from persistence.Conexion import Conexion
+
+class Producto_Compartido:
+    """
+    Vista de solo lectura de un producto guardado en memoria compartida
+    
+    Los campos se leen del segmento en cada acceso, sin copiar el registro;
+    ofrece los mismos atributos y to_dict() que Producto.
+    """
+    
+    __slots__ = ('_vista', '_posicion')
+    
+    def __init__(self, vista, posicion):
+        self._vista = vista
+        self._posicion = posicion
+    
+    def _registro(self):
+        return self._vista._registro(self._posicion)
+    
+    @property
+    def id(self):
+        return self._registro()[0]
+    
+    @property
+    def nombre(self):
+        return self._vista._cadena(self._registro()[3])
+    
+    @property
+    def descripcion(self):
+        return self._vista._cadena(self._registro()[4])
+    
+    @property
+    def precio(self):
+        registro = self._registro()
+        return int(registro[1]) if registro[6] & Vista_Catalogo.PRECIO_ENTERO else registro[1]
+    
+    @property
+    def categoria_id(self):
+        registro = self._registro()
+        return None if registro[6] & Vista_Catalogo.SIN_CATEGORIA else registro[2]
+    
+    @property
+    def nombre_categoria(self):
+        registro = self._registro()
+        nombres = self._vista.nombres_categoria
+        if nombres and not registro[6] & Vista_Catalogo.SIN_CATEGORIA:
+            nombre = nombres.get(registro[2])
+            if nombre is not None:
+                return nombre
+        return self._vista._cadena(registro[5])
+    
+    def to_dict(self):
+        """Convierte la vista a un diccionario"""
+        return {
+            'id': self.id,
+            'nombre': self.nombre,
+            'descripcion': self.descripcion,
+            'precio': self.precio,
+            'categoria_id': self.categoria_id,
+            'nombre_categoria': self.nombre_categoria
+        }
+    
+    def __str__(self):
+        return f"Producto(id={self.id}, nombre={self.nombre}, precio={self.precio})"
+
+class Vista_Catalogo:
+    """
+    Una generación del catálogo publicada en un segmento de memoria compartida
+    
+    Formato del segmento: cabecera, registros de tamaño fijo (id, precio,
+    categoria_id, índices de nombre, descripción y nombre de categoría en la
+    tabla de cadenas y banderas), desplazamientos de la tabla de cadenas y
+    cadenas en UTF-8. Las cadenas repetidas se guardan una sola vez.
+    """
+    
+    MAGIA = b'RCAT'
+    VERSION = 1
+    # Magia, versión, generación, registros, cadenas y firma del almacenamiento
+    # con la que se publicó: (mtime_ns, tamaño, inodo) del archivo y del diario
+    CABECERA = struct.Struct('<4sHxxQQQqqqqqq')
+    REGISTRO = struct.Struct('<qdqIIIB')
+    DESPLAZAMIENTO = struct.Struct('<I')
+    
+    # Banderas del registro
+    PRECIO_ENTERO = 1
+    SIN_CATEGORIA = 2
+    SIN_CADENA = 0xFFFFFFFF
+    
+    def __init__(self, segmento):
+        """
+        Abre una generación a partir de su segmento
+        
+        Args:
+            segmento: SharedMemory con el catálogo
+        """
+        self._segmento = segmento
+        self._buffer = segmento.buf
+        magia, version, self.generacion, self._total, cadenas, *firma = Vista_Catalogo.CABECERA.unpack_from(self._buffer)
+        if magia != Vista_Catalogo.MAGIA or version != Vista_Catalogo.VERSION:
+            raise ValueError("El segmento no contiene un catálogo de esta versión")
+        self.firma = Vista_Catalogo._firma_desde_enteros(firma)
+        self._inicio_desplazamientos = Vista_Catalogo.CABECERA.size + self._total * Vista_Catalogo.REGISTRO.size
+        self._inicio_cadenas = self._inicio_desplazamientos + (cadenas + 1) * Vista_Catalogo.DESPLAZAMIENTO.size
+        # Nombres de categoría resueltos al leer, que sustituyen a los guardados
+        self.nombres_categoria = None
+        # Registros de los que se publicó, solo en el proceso que la publicó
+        self.origen = None
+    
+    @staticmethod
+    def _firma_a_enteros(firma):
+        """Convierte la firma del almacenamiento en seis enteros (-1 si falta)"""
+        enteros = []
+        for parte in (firma or (None, None)):
+            enteros.extend(parte if parte is not None else (-1, -1, -1))
+        return enteros
+    
+    @staticmethod
+    def _firma_desde_enteros(enteros):
+        """Reconstruye la firma del almacenamiento a partir de seis enteros"""
+        partes = tuple(None if enteros[i] == -1 else tuple(enteros[i:i + 3]) for i in (0, 3))
+        return None if partes == (None, None) else partes
+    
+    @staticmethod
+    def serializar(generacion, data, firma):
+        """
+        Codifica los registros de una colección en el formato del segmento
+        
+        Args:
+            generacion: Número de generación
+            data (list): Registros como diccionarios
+            firma: Firma del almacenamiento del que proceden los datos
+            
+        Returns:
+            bytearray: Contenido del segmento
+            
+        Raises:
+            ValueError: Si algún registro no se puede guardar en el formato
+                del segmento sin alterar sus valores
+        """
+        indices = {}
+        cadenas = []
+        
+        def indice(cadena):
+            if cadena is None:
+                return Vista_Catalogo.SIN_CADENA
+            posicion = indices.get(cadena)
+            if posicion is None:
+                posicion = indices[cadena] = len(cadenas)
+                cadenas.append(str(cadena).encode('utf-8'))
+            return posicion
+        
+        registros = []
+        for fila in data:
+            Vista_Catalogo._comprobar(fila)
+            precio = fila.get('precio', 0.0)
+            categoria_id = fila.get('categoria_id')
+            banderas = (Vista_Catalogo.PRECIO_ENTERO if isinstance(precio, int) else 0) | (Vista_Catalogo.SIN_CATEGORIA if categoria_id is None else 0)
+            try:
+                registros.append(Vista_Catalogo.REGISTRO.pack(
+                    fila.get('id'),
+                    float(precio),
+                    categoria_id or 0,
+                    indice(fila.get('nombre', '')),
+                    indice(fila.get('descripcion', '')),
+                    indice(fila.get('nombre_categoria')),
+                    banderas
+                ))
+            except struct.error as e:
+                raise ValueError(f"el registro {fila.get('id')!r} no cabe en el segmento: {e}") from e
+        
+        desplazamientos = [0]
+        for cadena in cadenas:
+            desplazamientos.append(desplazamientos[-1] + len(cadena))
+        
+        contenido = bytearray(Vista_Catalogo.CABECERA.pack(
+            Vista_Catalogo.MAGIA, Vista_Catalogo.VERSION, generacion, len(registros), len(cadenas),
+            *Vista_Catalogo._firma_a_enteros(firma)
+        ))
+        contenido += b"".join(registros)
+        contenido += struct.pack(f'<{len(desplazamientos)}I', *desplazamientos)
+        contenido += b"".join(cadenas)
+        return contenido
+    
+    @staticmethod
+    def _comprobar(fila):
+        """
+        Comprueba que los campos de un registro tengan los tipos del formato
+        
+        Los registros antiguos pueden no tenerlos: sin id, con categoria_id
+        como texto o con un precio que no es un número.
+        
+        Args:
+            fila (dict): Registro como diccionario
+            
+        Raises:
+            ValueError: Si algún campo no tiene el tipo esperado
+        """
+        id = fila.get('id')
+        if type(id) is not int:
+            raise ValueError(f"el registro {id!r} no tiene un id entero")
+        categoria_id = fila.get('categoria_id')
+        if categoria_id is not None and type(categoria_id) is not int:
+            raise ValueError(f"el registro {id} tiene un categoria_id no entero: {categoria_id!r}")
+        if type(fila.get('precio', 0.0)) not in (int, float):
+            raise ValueError(f"el registro {id} tiene un precio no numérico: {fila.get('precio')!r}")
+        for campo in ('nombre', 'descripcion', 'nombre_categoria'):
+            if not isinstance(fila.get(campo), (str, type(None))):
+                raise ValueError(f"el registro {id} tiene un {campo} que no es texto")
+    
+    def _registro(self, posicion):
+        """Lee el registro en una posición"""
+        return Vista_Catalogo.REGISTRO.unpack_from(self._buffer, Vista_Catalogo.CABECERA.size + posicion * Vista_Catalogo.REGISTRO.size)
+    
+    def _cadena(self, indice):
+        """Lee una cadena de la tabla de cadenas"""
+        if indice == Vista_Catalogo.SIN_CADENA:
+            return None
+        posicion = self._inicio_desplazamientos + indice * Vista_Catalogo.DESPLAZAMIENTO.size
+        inicio, fin = struct.unpack_from('<II', self._buffer, posicion)
+        return str(self._buffer[self._inicio_cadenas + inicio:self._inicio_cadenas + fin], 'utf-8')
+    
+    def entradas(self):
+        """
+        Recorre los productos junto con las claves de los índices
+        
+        Returns:
+            generator: Tuplas (Producto_Compartido, id, categoria_id)
+        """
+        fin = Vista_Catalogo.CABECERA.size + self._total * Vista_Catalogo.REGISTRO.size
+        registros = Vista_Catalogo.REGISTRO.iter_unpack(self._buffer[Vista_Catalogo.CABECERA.size:fin])
+        for posicion, registro in enumerate(registros):
+            categoria_id = None if registro[6] & Vista_Catalogo.SIN_CATEGORIA else registro[2]
+            yield Producto_Compartido(self, posicion), registro[0], categoria_id
+    
+    def __len__(self):
+        return self._total
+    
+    def __iter__(self):
+        return (Producto_Compartido(self, posicion) for posicion in range(self._total))
+
+class Catalogo_Compartido:
+    """
+    Publica y abre el catálogo de productos en memoria compartida
+    
+    Cada escritura completa del catálogo a través de Conexion publica una
+    generación nueva en su propio segmento y después actualiza el número de
+    generación en un segmento de control; los lectores pasan a la nueva
+    generación en su siguiente acceso y las vistas de la anterior siguen
+    siendo válidas mientras se usen. En el modo diario solo se publica al
+    compactar: los cambios anexados al diario no invalidan la generación
+    publicada y los lectores los aplican por su cuenta con
+    Conexion.leer_diario. El almacenamiento sigue siendo la fuente de verdad:
+    si cambia por otra vía, la siguiente lectura vuelve a publicarlo. Una
+    colección con registros que no caben en el formato no se publica y se
+    lee del almacenamiento como sin memoria compartida.
+    
+    El proceso que crea el segmento de control de una colección elimina sus
+    segmentos al terminar.
+    """
+    
+    # Colecciones que se publican cuando Conexion.MEMORIA_COMPARTIDA_ACTIVA está activo
+    COLECCIONES = ("productos.json",)
+    
+    _CONTROL = struct.Struct('<4sHxxQ')  # Magia, versión y generación actual
+    _MAGIA_CONTROL = b'RCTL'
+    
+    _controles = {}     # file_name -> SharedMemory de control
+    _vistas = {}        # file_name -> Vista_Catalogo de la última generación abierta
+    _no_publicables = {}    # file_name -> firma del almacenamiento que no se pudo publicar
+    _creados = {}       # prefijo -> PID del proceso que creó el segmento de control
+    _atexit_registrado = False
+    _lock = threading.RLock()
+    
+    @staticmethod
+    def _prefijo(file_name):
+        """Prefijo de los segmentos de una colección, único por directorio de datos"""
+        ruta = os.path.realpath(Conexion.get_file_path(file_name))
+        return "rc_" + hashlib.sha1(ruta.encode('utf-8')).hexdigest()[:12]
+    
+    @staticmethod
+    def _abrir_segmento(nombre, crear=False, tamano=0):
+        """
+        Abre o crea un segmento sin que el resource_tracker lo elimine al
+        terminar el proceso, ya que los segmentos sobreviven a cada proceso
+        """
+        try:
+            return shared_memory.SharedMemory(name=nombre, create=crear, size=tamano, track=False)
+        except TypeError:  # Python < 3.13
+            segmento = shared_memory.SharedMemory(name=nombre, create=crear, size=tamano)
+            resource_tracker.unregister(segmento._name, "shared_memory")
+            return segmento
+    
+    @staticmethod
+    def _control(file_name, crear=False):
+        """Obtiene el segmento de control de una colección, o None si no existe"""
+        control = Catalogo_Compartido._controles.get(file_name)
+        if control is not None:
+            return control
+        
+        nombre = Catalogo_Compartido._prefijo(file_name) + "_c"
+        try:
+            control = Catalogo_Compartido._abrir_segmento(nombre)
+        except FileNotFoundError:
+            if not crear:
+                return None
+            try:
+                control = Catalogo_Compartido._abrir_segmento(nombre, True, Catalogo_Compartido._CONTROL.size)
+                Catalogo_Compartido._CONTROL.pack_into(control.buf, 0, Catalogo_Compartido._MAGIA_CONTROL, Vista_Catalogo.VERSION, 0)
+                Catalogo_Compartido._creados[Catalogo_Compartido._prefijo(file_name)] = os.getpid()
+                if not Catalogo_Compartido._atexit_registrado:
+                    atexit.register(Catalogo_Compartido._liberar_al_salir)
+                    Catalogo_Compartido._atexit_registrado = True
+            except FileExistsError:
+                control = Catalogo_Compartido._abrir_segmento(nombre)
+        
+        Catalogo_Compartido._controles[file_name] = control
+        return control
+    
+    @staticmethod
+    def _generacion(control):
+        """Lee la generación publicada en un segmento de control"""
+        magia, version, generacion = Catalogo_Compartido._CONTROL.unpack_from(control.buf)
+        if magia != Catalogo_Compartido._MAGIA_CONTROL or version != Vista_Catalogo.VERSION:
+            return 0
+        return generacion
+    
+    @staticmethod
+    def publicar(file_name, data):
+        """
+        Publica una generación nueva de una colección
+        
+        Debe llamarse con el bloqueo exclusivo de la colección tomado, para
+        que la firma guardada corresponda a los datos publicados.
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            data (list): Registros como diccionarios
+            
+        Returns:
+            Vista_Catalogo: Vista de la generación publicada, o None si algún
+            registro no cabe en el formato del segmento
+        """
+        with Catalogo_Compartido._lock:
+            control = Catalogo_Compartido._control(file_name, crear=True)
+            anterior = Catalogo_Compartido._generacion(control)
+            generacion = anterior + 1
+            firma = Catalogo_Compartido._firma_almacenamiento(file_name)
+            prefijo = Catalogo_Compartido._prefijo(file_name)
+            try:
+                contenido = Vista_Catalogo.serializar(generacion, data, firma)
+            except ValueError as e:
+                if Catalogo_Compartido._no_publicables.get(file_name, ()) != firma:
+                    print(f"No se publica {file_name} en memoria compartida: {e}")
+                Catalogo_Compartido._no_publicables[file_name] = firma
+                # Una generación sin segmento retira la anterior, que ya no está al día
+                struct.pack_into('<Q', control.buf, Catalogo_Compartido._CONTROL.size - 8, generacion)
+                if anterior:
+                    Catalogo_Compartido._eliminar_segmento(f"{prefijo}_{anterior}")
+                return None
+            Catalogo_Compartido._no_publicables.pop(file_name, None)
+            
+            try:
+                segmento = Catalogo_Compartido._abrir_segmento(f"{prefijo}_{generacion}", True, len(contenido))
+            except FileExistsError:
+                # Resto de un proceso interrumpido antes de actualizar el control
+                Catalogo_Compartido._eliminar_segmento(f"{prefijo}_{generacion}")
+                segmento = Catalogo_Compartido._abrir_segmento(f"{prefijo}_{generacion}", True, len(contenido))
+            segmento.buf[:len(contenido)] = contenido
+            
+            # El cambio de generación es una única escritura de 8 bytes
+            struct.pack_into('<Q', control.buf, Catalogo_Compartido._CONTROL.size - 8, generacion)
+            if anterior:
+                Catalogo_Compartido._eliminar_segmento(f"{prefijo}_{anterior}")
+            
+            vista = Vista_Catalogo(segmento)
+            vista.origen = data
+            Catalogo_Compartido._vistas[file_name] = vista
+            return vista
+    
+    @staticmethod
+    def publicada(file_name):
+        """
+        Obtiene la última generación abierta o publicada por este proceso
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            
+        Returns:
+            Vista_Catalogo: Vista, o None si no hay ninguna
+        """
+        return Catalogo_Compartido._vistas.get(file_name)
+    
+    @staticmethod
+    def _eliminar_segmento(nombre):
+        """Elimina el nombre de un segmento; quien lo tenga abierto puede seguir usándolo"""
+        try:
+            segmento = Catalogo_Compartido._abrir_segmento(nombre)
+        except FileNotFoundError:
+            return
+        segmento.close()
+        if not hasattr(segmento, '_track'):
+            # Antes de Python 3.13 unlink() también lo quita del resource_tracker
+            resource_tracker.register(segmento._name, "shared_memory")
+        try:
+            segmento.unlink()
+        except FileNotFoundError:
+            pass
+    
+    @staticmethod
+    def _firma_almacenamiento(file_name):
+        """Firma actual del almacenamiento de una colección (None con SQLite)"""
+        if Conexion.BACKEND == 'sqlite':
+            return None
+        return Conexion._firma_coleccion(file_name)
+    
+    @staticmethod
+    def _vigente(publicada, actual):
+        """
+        Indica si una generación corresponde todavía al almacenamiento
+        
+        Solo se admite que el diario haya crecido: el archivo no cambió y el
+        diario es el mismo que al publicar, o se creó después.
+        
+        Args:
+            publicada: Firma del almacenamiento con la que se publicó
+            actual: Firma actual del almacenamiento
+            
+        Returns:
+            bool: True si la generación sigue siendo válida
+        """
+        if publicada == actual:
+            return True
+        if publicada is None or actual is None or publicada[0] != actual[0] or actual[1] is None:
+            return False
+        return publicada[1] is None or (publicada[1][2] == actual[1][2] and publicada[1][1] <= actual[1][1])
+    
+    @staticmethod
+    def vista(file_name):
+        """
+        Obtiene la vista de la generación actual de una colección
+        
+        Si todavía no hay nada publicado, o el almacenamiento cambió por otra
+        vía desde la última publicación, se carga y se publica. Los cambios
+        anexados al diario después de publicar no se incluyen.
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            
+        Returns:
+            Vista_Catalogo: Vista de la generación actual, o None si la
+            colección no se puede publicar y debe leerse con Conexion.cargar
+        """
+        vista = Catalogo_Compartido._vista_publicada(file_name)
+        firma = Catalogo_Compartido._firma_almacenamiento(file_name)
+        if vista is not None and Catalogo_Compartido._vigente(vista.firma, firma):
+            return vista
+        # Se vuelve a intentar solo cuando cambia el almacenamiento
+        if Catalogo_Compartido._no_publicables.get(file_name, ()) == firma:
+            return None
+        
+        with Conexion.bloqueo_exclusivo(file_name), Catalogo_Compartido._lock:
+            vista = Catalogo_Compartido._vista_publicada(file_name)
+            if vista is not None and Catalogo_Compartido._vigente(vista.firma, Catalogo_Compartido._firma_almacenamiento(file_name)):
+                return vista
+            return Catalogo_Compartido.publicar(file_name, Conexion.cargar(file_name))
+    
+    @staticmethod
+    def _vista_publicada(file_name):
+        """Abre la última generación publicada, o devuelve None si no hay ninguna"""
+        control = Catalogo_Compartido._control(file_name)
+        if control is None:
+            return None
+        
+        # La generación puede cambiar mientras se abre: se reintenta con la nueva
+        for _ in range(10):
+            generacion = Catalogo_Compartido._generacion(control)
+            if generacion == 0:
+                return None
+            vista = Catalogo_Compartido._vistas.get(file_name)
+            if vista is not None and vista.generacion == generacion:
+                return vista
+            
+            with Catalogo_Compartido._lock:
+                try:
+                    segmento = Catalogo_Compartido._abrir_segmento(f"{Catalogo_Compartido._prefijo(file_name)}_{generacion}")
+                except FileNotFoundError:
+                    continue
+                vista = Vista_Catalogo(segmento)
+                Catalogo_Compartido._vistas[file_name] = vista
+                return vista
+        return None
+    
+    @staticmethod
+    def liberar(file_name):
+        """
+        Elimina los segmentos de una colección
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+        """
+        with Catalogo_Compartido._lock:
+            control = Catalogo_Compartido._controles.pop(file_name, None)
+            if control is not None:
+                control.close()
+            Catalogo_Compartido._vistas.pop(file_name, None)
+            prefijo = Catalogo_Compartido._prefijo(file_name)
+            Catalogo_Compartido._creados.pop(prefijo, None)
+            Catalogo_Compartido._eliminar_segmentos(prefijo)
+    
+    @staticmethod
+    def _eliminar_segmentos(prefijo):
+        """Elimina el segmento de control con un prefijo y el de su generación actual"""
+        try:
+            control = Catalogo_Compartido._abrir_segmento(prefijo + "_c")
+        except FileNotFoundError:
+            return
+        generacion = Catalogo_Compartido._generacion(control)
+        control.close()
+        Catalogo_Compartido._eliminar_segmento(f"{prefijo}_{generacion}")
+        Catalogo_Compartido._eliminar_segmento(prefijo + "_c")
+    
+    @staticmethod
+    def _liberar_al_salir():
+        """
+        Elimina al terminar el proceso los segmentos de las colecciones cuyo
+        control creó, aunque el directorio de datos haya cambiado después
+        
+        Los procesos hijos heredan la lista pero no son sus creadores.
+        """
+        with Catalogo_Compartido._lock:
+            for prefijo, pid in list(Catalogo_Compartido._creados.items()):
+                if pid == os.getpid():
+                    Catalogo_Compartido._eliminar_segmentos(prefijo)
+            Catalogo_Compartido._creados.clear()
@@ -1,7 +1,11 @@
 """
 Repositorio para la persistencia de categorías en JSON
 """
+import threading
+from contextlib import contextmanager
 from persistence.Conexion import Conexion
+from persistence.Instrumentacion import Instrumentacion
+from persistence.Registro_Cambios import Registro_Cambios
 from domain.model.Categoria import Categoria
 
 class Categoria_Repositorio:
@@ -10,7 +14,165 @@ class Categoria_Repositorio:
     # Nombre del archivo JSON
     CATEGORIAS_FILE = "categorias.json"
     
+    # Índice en memoria construido a partir de la última carga del archivo
+    _datos = None           # Lista cargada de la que proviene el índice
+    _por_id = {}            # id -> Categoria
+    _max_id = 0
+    _version = 0            # Aumenta con cada recarga o modificación
+    _lock = threading.RLock()
+    
+    @staticmethod
+    def _indices():
+        """
+        Obtiene el índice de categorías por ID, reconstruyéndolo si el archivo cambió
+        
+        Returns:
+            dict: Diccionario id -> Categoria
+        """
+        # Dentro de una transacción el índice ya cargado tiene los cambios pendientes
+        if Conexion.en_transaccion() and Categoria_Repositorio._datos is not None:
+            return Categoria_Repositorio._por_id
+        
+        data = Conexion.cargar(Categoria_Repositorio.CATEGORIAS_FILE)
+        if data is not Categoria_Repositorio._datos:
+            with Categoria_Repositorio._lock:
+                if data is not Categoria_Repositorio._datos:
+                    Categoria_Repositorio._reconstruir_indices(data)
+        return Categoria_Repositorio._por_id
+    
+    @staticmethod
+    def _reconstruir_indices(data):
+        """
+        Reconstruye el índice en memoria a partir de los datos cargados
+        
+        Args:
+            data (list): Lista de diccionarios leída del archivo JSON
+        """
+        por_id = {categoria.id: categoria for categoria in Categoria.from_rows(data)}
+        
+        Categoria_Repositorio._por_id = por_id
+        Categoria_Repositorio._max_id = max(por_id) if por_id else 0
+        Categoria_Repositorio._datos = data
+        Categoria_Repositorio._version += 1
+    
+    @staticmethod
+    def _volcar_indices():
+        """
+        Serializa el contenido actual del índice
+        
+        Los registros obtenidos pasan a ser el origen del índice, ya que son
+        los que se guardan.
+        
+        Returns:
+            list: Registros como diccionarios
+        """
+        # Con la escritura diferida se llama desde el hilo de fondo
+        with Categoria_Repositorio._lock:
+            data = [cat.to_dict() for cat in Categoria_Repositorio._por_id.values()]
+            Categoria_Repositorio._datos = data
+        return data
+    
+    @staticmethod
+    def _guardar_indices():
+        """
+        Persiste el contenido actual del índice
+        
+        Dentro de una transacción la serialización se aplaza hasta confirmarla.
+        
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        if Conexion.guardar_diferido(Categoria_Repositorio.CATEGORIAS_FILE, Categoria_Repositorio._volcar_indices):
+            return True
+        
+        # Forzar la recarga desde el archivo en la siguiente lectura
+        Categoria_Repositorio._datos = None
+        return False
+    
+    @staticmethod
+    def _persistir(modificados=(), eliminados=()):
+        """
+        Persiste los cambios hechos sobre el índice
+        
+        Los cambios se anotan en el registro de cambios, que se escribe junto
+        con la colección.
+        
+        Args:
+            modificados: IDs creados o actualizados
+            eliminados: IDs eliminados
+            
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        Categoria_Repositorio._version += 1
+        escribir = lambda: Categoria_Repositorio._escribir(modificados, eliminados)
+        if Registro_Cambios.persistir('categorias', modificados, eliminados, escribir):
+            return True
+        
+        # Forzar la recarga desde el archivo en la siguiente lectura
+        Categoria_Repositorio._datos = None
+        return False
+    
     @staticmethod
+    def _escribir(modificados, eliminados):
+        """
+        Escribe en el almacenamiento los registros afectados por un cambio
+        
+        Si el backend admite escrituras por registro solo se guardan los
+        registros afectados; en otro caso se reescribe el archivo completo.
+        
+        Args:
+            modificados: IDs creados o actualizados
+            eliminados: IDs eliminados
+            
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        if not Conexion.escritura_por_registro():
+            return Categoria_Repositorio._guardar_indices()
+        
+        por_id = Categoria_Repositorio._por_id
+        cambios = [{'op': 'upsert', 'datos': por_id[id].to_dict()} for id in modificados]
+        cambios += [{'op': 'delete', 'id': id} for id in eliminados]
+        return Conexion.registrar(Categoria_Repositorio.CATEGORIAS_FILE, cambios)
+    
+    @staticmethod
+    @contextmanager
+    def bloqueo():
+        """
+        Bloqueo exclusivo de la colección, entre procesos y entre hilos
+        
+        Mientras se tiene, ningún otro hilo modifica ni reconstruye el índice.
+        Al tomarlo se comprueba que el índice esté al día con el almacenamiento.
+        """
+        with Conexion.bloqueo_exclusivo(Categoria_Repositorio.CATEGORIAS_FILE), Categoria_Repositorio._lock:
+            Categoria_Repositorio._indices()
+            yield
+    
+    @staticmethod
+    def descartar_cambios():
+        """
+        Descarta el índice en memoria, con los cambios que no se hayan guardado
+        
+        La siguiente lectura lo reconstruye desde el almacenamiento.
+        """
+        with Categoria_Repositorio._lock:
+            Categoria_Repositorio._datos = None
+    
+    @staticmethod
+    def version():
+        """
+        Obtiene la versión de los datos en memoria
+        
+        Returns:
+            int: Número que cambia cada vez que las categorías se modifican o se
+            recargan desde el almacenamiento
+        """
+        Categoria_Repositorio._indices()
+        return Categoria_Repositorio._version
+    
+    @staticmethod
+    @Instrumentacion.medido('repositorio')
     def listar_categorias():
         """
         Carga las categorías desde el archivo JSON
@@ -18,10 +180,10 @@ class Categoria_Repositorio:
         Returns:
             list: Lista de objetos Categoria
         """
-        data = Conexion.load_json(Categoria_Repositorio.CATEGORIAS_FILE)
-        return [Categoria.from_dict(cat_data) for cat_data in data]
+        return list(Categoria_Repositorio._indices().values())
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def guardar_categorias(categorias):
         """
         Guarda las categorías en el archivo JSON
@@ -33,7 +195,7 @@ class Categoria_Repositorio:
             bool: True si se guardó correctamente
         """
         data = [cat.to_dict() for cat in categorias]
-        return Conexion.save_json(Categoria_Repositorio.CATEGORIAS_FILE, data)
+        return Conexion.guardar(Categoria_Repositorio.CATEGORIAS_FILE, data)
     
     @staticmethod
     def obtener_siguiente_id():
@@ -43,12 +205,11 @@ class Categoria_Repositorio:
         Returns:
             int: Siguiente ID
         """
-        categorias = Categoria_Repositorio.listar_categorias()
-        if not categorias:
-            return 1
-        return max(cat.id for cat in categorias) + 1
+        Categoria_Repositorio._indices()
+        return Categoria_Repositorio._max_id + 1
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def buscar_por_id(id):
         """
         Busca una categoría por su ID
@@ -59,13 +220,10 @@ class Categoria_Repositorio:
         Returns:
             Categoria: Objeto Categoria o None
         """
-        categorias = Categoria_Repositorio.listar_categorias()
-        for categoria in categorias:
-            if categoria.id == id:
-                return categoria
-        return None
+        return Categoria_Repositorio._indices().get(id)
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def crear(nombre, descripcion):
         """
         Crea una nueva categoría
@@ -75,23 +233,26 @@ class Categoria_Repositorio:
             descripcion: Descripción de la categoría
             
         Returns:
-            int: ID de la categoría creada
+            int: ID de la categoría creada, o -1 si no se pudo guardar
         """
-        categorias = Categoria_Repositorio.listar_categorias()
-        
-        # Generar nuevo ID
-        nuevo_id = Categoria_Repositorio.obtener_siguiente_id()
-        
-        # Crear nueva categoría
-        nueva_categoria = Categoria(nuevo_id, nombre, descripcion)
-        categorias.append(nueva_categoria)
-        
-        # Guardar cambios
-        Categoria_Repositorio.guardar_categorias(categorias)
-        
-        return nuevo_id
+        with Conexion.bloqueo_exclusivo(Categoria_Repositorio.CATEGORIAS_FILE), Categoria_Repositorio._lock:
+            categorias = Categoria_Repositorio._indices()
+            
+            # Generar nuevo ID
+            nuevo_id = Categoria_Repositorio._max_id + 1
+            
+            # Crear nueva categoría
+            categorias[nuevo_id] = Categoria(nuevo_id, nombre, descripcion)
+            Categoria_Repositorio._max_id = nuevo_id
+            
+            # Guardar cambios
+            if not Categoria_Repositorio._persistir(modificados=[nuevo_id]):
+                return -1
+            
+            return nuevo_id
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def actualizar(id, nombre, descripcion):
         """
         Actualiza una categoría
@@ -104,17 +265,17 @@ class Categoria_Repositorio:
         Returns:
             bool: True si se actualizó correctamente
         """
-        categorias = Categoria_Repositorio.listar_categorias()
-        
-        for i, categoria in enumerate(categorias):
-            if categoria.id == id:
-                categorias[i].nombre = nombre
-                categorias[i].descripcion = descripcion
-                return Categoria_Repositorio.guardar_categorias(categorias)
-        
-        return False
+        with Conexion.bloqueo_exclusivo(Categoria_Repositorio.CATEGORIAS_FILE), Categoria_Repositorio._lock:
+            categoria = Categoria_Repositorio._indices().get(id)
+            if categoria is None:
+                return False
+            
+            categoria.nombre = nombre
+            categoria.descripcion = descripcion
+            return Categoria_Repositorio._persistir(modificados=[id])
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def eliminar(id):
         """
         Elimina una categoría
@@ -125,10 +286,12 @@ class Categoria_Repositorio:
         Returns:
             bool: True si se eliminó correctamente
         """
-        categorias = Categoria_Repositorio.listar_categorias()
-        categorias_filtradas = [c for c in categorias if c.id != id]
-        
-        if len(categorias_filtradas) < len(categorias):
-            return Categoria_Repositorio.guardar_categorias(categorias_filtradas)
-        
-        return False
+        with Conexion.bloqueo_exclusivo(Categoria_Repositorio.CATEGORIAS_FILE), Categoria_Repositorio._lock:
+            categorias = Categoria_Repositorio._indices()
+            if categorias.pop(id, None) is None:
+                return False
+            
+            if id == Categoria_Repositorio._max_id:
+                Categoria_Repositorio._max_id = max(categorias) if categorias else 0
+            
+            return Categoria_Repositorio._persistir(eliminados=[id])
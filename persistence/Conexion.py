@@ -1,17 +1,105 @@
 """
 Clase de conexión para la persistencia en archivos JSON
 """
+import gc
 import os
+import sys
 import json
+import time
+import struct
+import marshal
+import atexit
+import threading
+from contextlib import contextmanager
+from persistence.Instrumentacion import Instrumentacion
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se sincronizan los hilos del proceso
+    fcntl = None
 
 class Conexion:
     """Maneja la conexión a los archivos JSON"""
     
+    # Directorio de datos; por defecto "data" en la raíz del proyecto
+    DATA_DIR = os.environ.get('RESTAURANTE_DATA_DIR')
+    _DATA_DIR_DEFECTO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+    _data_dir_creado = None  # Último directorio creado, para no repetir makedirs
+    
+    # Backend de almacenamiento: "json" (por defecto) o "sqlite"
+    BACKEND = os.environ.get('RESTAURANTE_BACKEND', 'json')
+    
+    # Modo diario: los cambios se anexan a "<archivo>.journal" en lugar de
+    # reescribir el archivo completo, y se compactan al superar el umbral
+    JOURNAL_ACTIVO = os.environ.get('RESTAURANTE_JOURNAL', '') == '1'
+    JOURNAL_SUFIJO = ".journal"
+    UMBRAL_COMPACTACION = 256 * 1024  # bytes
+    
+    # Instantánea binaria: copia en formato marshal de cada archivo JSON,
+    # guardada junto a él como "<archivo>.snap", que se lee en su lugar
+    # mientras el JSON no cambie. Si falta, está desfasada o es de otra
+    # versión se lee el JSON y se vuelve a generar
+    SNAPSHOT_ACTIVO = os.environ.get('RESTAURANTE_SNAPSHOT', '') == '1'
+    SNAPSHOT_SUFIJO = ".snap"
+    SNAPSHOT_VERSION = 1
+    _SNAPSHOT_MAGIA = b'RSNP'
+    # Magia, versión del formato, versión de Python (marshal depende de
+    # ella) y firma del JSON del que se obtuvo: mtime_ns, tamaño e inodo
+    _SNAPSHOT_CABECERA = struct.Struct('<4sHBBqQQ')
+    
+    # Catálogo en memoria compartida: cada escritura completa de las
+    # colecciones de Catalogo_Compartido.COLECCIONES (en el modo diario, cada
+    # compactación) publica una generación nueva, que los repositorios de
+    # todos los procesos leen sin copiarla
+    MEMORIA_COMPARTIDA_ACTIVA = os.environ.get('RESTAURANTE_MEMORIA_COMPARTIDA', '') == '1'
+    
+    # Escritura diferida: las escrituras se anotan en memoria y un hilo de
+    # fondo las agrupa y escribe cada colección cuando lleva
+    # RETARDO_ESCRITURA_MS sin cambios, o como mucho RETARDO_MAXIMO_MS después
+    # del primer cambio sin escribir. Lo pendiente se escribe también al
+    # terminar el proceso. Con varios procesos que escriben conviene
+    # combinarla con el modo diario, que escribe solo los registros cambiados
+    ESCRITURA_DIFERIDA_ACTIVA = os.environ.get('RESTAURANTE_ESCRITURA_DIFERIDA', '') == '1'
+    RETARDO_ESCRITURA_MS = float(os.environ.get('RESTAURANTE_RETARDO_ESCRITURA_MS', '200'))
+    RETARDO_MAXIMO_MS = float(os.environ.get('RESTAURANTE_RETARDO_MAXIMO_MS', '2000'))
+    
+    # Bloqueo de escritura entre hilos; entre procesos se usa fcntl sobre
+    # "<archivo>.lock", con bloqueos compartidos para las lecturas
+    _escritura_lock = threading.RLock()
+    _bloqueos = threading.local()
+    
+    # Transacción del hilo actual: file_name -> [datos o proveedor, cambios]
+    # pendientes de escribir al confirmarla
+    _transaccion = threading.local()
+    
+    # Escrituras diferidas pendientes, con el mismo formato que las de una
+    # transacción, y (primer cambio, último cambio) sin escribir de cada
+    # colección en segundos de time.monotonic()
+    _diferidas = {}
+    _sucias_desde = {}
+    _diferidas_cond = threading.Condition()
+    _escritor = None
+    _detener_escritor = False
+    _atexit_registrado = False
+    _estadisticas_diferidas = {'escrituras': 0, 'errores': 0, 'ultima_escritura': 0.0, 'duracion_ultima': 0.0}
+    _compactando = set()
+    _posiciones = {}    # file_name -> (datos, {id: posición}) para aplicar cambios
+    _superpuestas = {}  # file_name -> (datos, cambios diferidos ya aplicados sobre ellos)
+    
+    # Caché de colecciones ya parseadas: file_name -> (firma, datos)
+    _cache = {}
+    _cache_lock = threading.Lock()
+    _cache_hits = 0
+    _cache_misses = 0
+    
     @staticmethod
     def get_data_dir():
         """Obtiene la ruta del directorio de datos"""
-        data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
-        os.makedirs(data_dir, exist_ok=True)
+        data_dir = Conexion.DATA_DIR or Conexion._DATA_DIR_DEFECTO
+        if data_dir != Conexion._data_dir_creado:
+            # El directorio se crea con el primer acceso, no al importar
+            os.makedirs(data_dir, exist_ok=True)
+            Conexion._data_dir_creado = data_dir
         return data_dir
     
     @staticmethod
@@ -19,29 +107,1220 @@ class Conexion:
         """Obtiene la ruta completa de un archivo en el directorio de datos"""
         return os.path.join(Conexion.get_data_dir(), file_name)
     
+    @staticmethod
+    def _sqlite():
+        """Obtiene la clase del backend SQLite (importada bajo demanda)"""
+        from persistence.Conexion_SQLite import Conexion_SQLite
+        return Conexion_SQLite
+    
+    @staticmethod
+    def _publicar(file_name, data):
+        """
+        Publica una colección en memoria compartida si el modo está activo
+        
+        Debe llamarse con el bloqueo exclusivo de la colección tomado. Un
+        fallo no afecta a la escritura: los lectores detectan que la
+        generación publicada no corresponde al almacenamiento y la rehacen.
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            data (list): Registros como diccionarios
+        """
+        if not Conexion.MEMORIA_COMPARTIDA_ACTIVA:
+            return
+        from persistence.Catalogo_Compartido import Catalogo_Compartido
+        if file_name not in Catalogo_Compartido.COLECCIONES:
+            return
+        try:
+            Catalogo_Compartido.publicar(file_name, data)
+        except Exception as e:
+            print(f"Error al publicar {file_name} en memoria compartida: {e}")
+    
+    @staticmethod
+    @Instrumentacion.medido('almacenamiento')
+    def cargar(file_name):
+        """
+        Carga una colección desde el backend configurado
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            
+        Returns:
+            list: Registros como diccionarios; el resultado es compartido y
+            no debe modificarse
+        """
+        if Conexion._diferidas and file_name in Conexion._diferidas:
+            return Conexion._cargar_con_diferidas(file_name)
+        return Conexion._cargar_almacenado(file_name)
+    
+    @staticmethod
+    def _cargar_almacenado(file_name):
+        """Carga una colección tal como está en el backend configurado"""
+        if Conexion.BACKEND == 'sqlite':
+            return Conexion._sqlite().cargar(file_name)
+        return Conexion.load_json(file_name)
+    
+    @staticmethod
+    def _cargar_con_diferidas(file_name):
+        """
+        Carga una colección incluyendo sus escrituras diferidas sin escribir
+        
+        La colección completa pendiente, o la almacenada si solo hay cambios
+        por registro, es la base sobre la que se aplican en el lugar los
+        cambios pendientes. Se recuerda cuántos se aplicaron a cada base para
+        que las lecturas siguientes devuelvan la misma lista sin repetirlos;
+        si la base cambia se aplican todos de nuevo, en orden, y queda el
+        último cambio de cada registro. Así los repositorios que reconstruyen
+        sus índices no pierden lo que aún no se ha escrito.
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            
+        Returns:
+            list: Registros como diccionarios
+        """
+        cond = Conexion._diferidas_cond
+        while True:
+            pendiente = Conexion._diferidas.get(file_name)
+            if pendiente is None:
+                return Conexion._cargar_almacenado(file_name)
+            
+            datos = pendiente[0]
+            if callable(datos):
+                # Se resuelve fuera del bloqueo: el proveedor toma el de su repositorio
+                resuelto = datos()
+                with cond:
+                    if pendiente[0] is datos:
+                        pendiente[0] = resuelto
+                continue
+            
+            # Leer el almacenamiento puede esperar a una escritura en curso
+            base = datos if datos is not None else Conexion._cargar_almacenado(file_name)
+            with cond:
+                if Conexion._diferidas.get(file_name) is not pendiente or pendiente[0] is not datos:
+                    continue
+                cambios = pendiente[1]
+                aplicados = Conexion._superpuestas.get(file_name)
+                desde = aplicados[1] if aplicados is not None and aplicados[0] is base else 0
+                if desde < len(cambios):
+                    Conexion._aplicar_cambios(file_name, base, cambios[desde:])
+                    Conexion._superpuestas[file_name] = (base, len(cambios))
+                return base
+    
+    @staticmethod
+    @Instrumentacion.medido('almacenamiento')
+    def guardar(file_name, data):
+        """
+        Guarda una colección completa en el backend configurado
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            data (list): Registros como diccionarios
+            
+        Returns:
+            bool: True si se guardó (o quedó pendiente) correctamente
+        """
+        if Conexion._aplazar(file_name, data, None):
+            return True
+        return Conexion._guardar_ahora(file_name, data)
+    
+    @staticmethod
+    def _guardar_ahora(file_name, data):
+        """Guarda una colección completa sin aplazar la escritura"""
+        if Conexion.BACKEND == 'sqlite':
+            with Conexion.bloqueo_exclusivo(file_name):
+                if not Conexion._sqlite().guardar(file_name, data):
+                    return False
+                Conexion._publicar(file_name, data)
+            return True
+        return Conexion.save_json(file_name, data)
+    
+    @staticmethod
+    @Instrumentacion.medido('almacenamiento')
+    def registrar(file_name, cambios):
+        """
+        Guarda cambios de registros individuales en el backend configurado
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            cambios (list): Cambios con el formato del diario
+            
+        Returns:
+            bool: True si se guardaron (o quedaron pendientes) correctamente
+        """
+        if Conexion._aplazar(file_name, None, cambios):
+            return True
+        return Conexion._registrar_ahora(file_name, cambios)
+    
+    @staticmethod
+    def _registrar_ahora(file_name, cambios):
+        """Guarda cambios de registros individuales sin aplazar la escritura"""
+        if Conexion.BACKEND == 'sqlite':
+            with Conexion.bloqueo_exclusivo(file_name):
+                if not Conexion._sqlite().registrar(file_name, cambios):
+                    return False
+                if Conexion.MEMORIA_COMPARTIDA_ACTIVA:
+                    Conexion._publicar(file_name, Conexion._sqlite().cargar(file_name))
+            return True
+        return Conexion.registrar_cambios(file_name, cambios)
+    
+    @staticmethod
+    def guardar_diferido(file_name, proveedor):
+        """
+        Guarda una colección completa obtenida de una función
+        
+        Dentro de una transacción la función se llama una sola vez, al
+        confirmarla, por muchas veces que se guarde la colección; con la
+        escritura diferida, una sola vez por escritura. En otro caso se llama
+        y se guarda en el momento.
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            proveedor: Función sin argumentos que devuelve la lista de registros
+            
+        Returns:
+            bool: True si se guardó (o quedó pendiente) correctamente
+        """
+        if Conexion._aplazar(file_name, proveedor, None):
+            return True
+        return Conexion._guardar_ahora(file_name, proveedor())
+    
+    @staticmethod
+    def _aplazar(file_name, datos, cambios):
+        """
+        Anota una escritura en la transacción del hilo actual o, con la
+        escritura diferida activa, en las pendientes del hilo de fondo
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            datos: Lista de registros o función que la devuelve, si se guarda
+                la colección completa
+            cambios (list): Cambios por registro, si no se guarda completa
+            
+        Returns:
+            bool: True si la escritura quedó anotada
+        """
+        pendientes = Conexion._pendientes()
+        if pendientes is not None:
+            Conexion._anotar(pendientes, file_name, datos, cambios)
+            return True
+        
+        if not Conexion.ESCRITURA_DIFERIDA_ACTIVA:
+            return False
+        
+        with Conexion._diferidas_cond:
+            Conexion._anotar(Conexion._diferidas, file_name, datos, cambios)
+            ahora = time.monotonic()
+            primera = Conexion._sucias_desde.get(file_name, (ahora,))[0]
+            Conexion._sucias_desde[file_name] = (primera, ahora)
+            Conexion._iniciar_escritor()
+            Conexion._diferidas_cond.notify_all()
+        return True
+    
+    @staticmethod
+    def _anotar(pendientes, file_name, datos, cambios):
+        """Añade una escritura a unos cambios pendientes"""
+        if datos is not None:
+            # La colección completa reemplaza cualquier cambio anterior
+            pendientes[file_name] = [datos, []]
+        else:
+            pendientes.setdefault(file_name, [None, []])[1].extend(cambios)
+    
+    @staticmethod
+    def _iniciar_escritor():
+        """Arranca el hilo de la escritura diferida si no está en marcha"""
+        escritor = Conexion._escritor
+        if escritor is not None and escritor.is_alive():
+            return
+        
+        Conexion._detener_escritor = False
+        Conexion._escritor = threading.Thread(target=Conexion._bucle_escritor, name="escritura-diferida", daemon=True)
+        Conexion._escritor.start()
+        if not Conexion._atexit_registrado:
+            atexit.register(Conexion.detener_escritura_diferida)
+            Conexion._atexit_registrado = True
+    
+    @staticmethod
+    def _vencimiento(primera, ultima):
+        """Momento en que debe escribirse una colección con cambios pendientes"""
+        return min(ultima + Conexion.RETARDO_ESCRITURA_MS / 1000, primera + Conexion.RETARDO_MAXIMO_MS / 1000)
+    
+    @staticmethod
+    def _bucle_escritor():
+        """Bucle del hilo de la escritura diferida"""
+        cond = Conexion._diferidas_cond
+        while True:
+            with cond:
+                if Conexion._detener_escritor:
+                    return
+                ahora = time.monotonic()
+                plazos = {file_name: Conexion._vencimiento(*tiempos) for file_name, tiempos in Conexion._sucias_desde.items()}
+                vencidas = [file_name for file_name, plazo in plazos.items() if plazo <= ahora]
+                if not vencidas:
+                    cond.wait(min(plazos.values()) - ahora if plazos else None)
+                    continue
+            
+            for file_name in vencidas:
+                Conexion._volcar(file_name)
+    
+    @staticmethod
+    def _volcar(file_name):
+        """
+        Escribe las escrituras diferidas de una colección
+        
+        Si falla, lo pendiente se vuelve a anotar, por detrás de lo que se
+        haya anotado entretanto, y se reintenta tras RETARDO_ESCRITURA_MS.
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            
+        Returns:
+            bool: True si se escribió correctamente o no había nada pendiente
+        """
+        cond = Conexion._diferidas_cond
+        with Conexion.bloqueo_exclusivo(file_name):
+            with cond:
+                entrada = Conexion._diferidas.pop(file_name, None)
+                Conexion._sucias_desde.pop(file_name, None)
+                Conexion._superpuestas.pop(file_name, None)
+            if entrada is None:
+                return True
+            
+            inicio = time.perf_counter()
+            datos, cambios = entrada
+            try:
+                if callable(datos):
+                    datos = datos()
+                correcto = datos is None or Conexion._guardar_ahora(file_name, datos)
+                if correcto and cambios:
+                    correcto = Conexion._registrar_ahora(file_name, Conexion._ultimo_por_registro(cambios))
+            except Exception as e:
+                print(f"Error en la escritura diferida de {file_name}: {e}")
+                correcto = False
+            
+            with cond:
+                estadisticas = Conexion._estadisticas_diferidas
+                if correcto:
+                    estadisticas['escrituras'] += 1
+                    estadisticas['ultima_escritura'] = time.time()
+                    estadisticas['duracion_ultima'] = time.perf_counter() - inicio
+                    return True
+                
+                estadisticas['errores'] += 1
+                nueva = Conexion._diferidas.get(file_name)
+                if nueva is None:
+                    Conexion._diferidas[file_name] = [datos, cambios]
+                elif nueva[0] is None:
+                    nueva[0] = datos
+                    nueva[1][:0] = cambios
+                    Conexion._superpuestas.pop(file_name, None)
+                ahora = time.monotonic()
+                Conexion._sucias_desde[file_name] = (ahora, ahora)
+                return False
+    
+    @staticmethod
+    def _ultimo_por_registro(cambios):
+        """
+        Reduce una secuencia de cambios al último de cada registro
+        
+        Args:
+            cambios (list): Cambios con el formato del diario
+            
+        Returns:
+            list: Cambios equivalentes, uno por ID
+        """
+        ultimos = {}
+        for cambio in cambios:
+            id = cambio.get('id') if cambio.get('op') == 'delete' else cambio.get('datos', {}).get('id')
+            ultimos.pop(id, None)
+            ultimos[id] = cambio
+        return list(ultimos.values())
+    
+    @staticmethod
+    def volcar_pendientes():
+        """
+        Escribe en el momento todas las escrituras diferidas pendientes
+        
+        Returns:
+            bool: True si se escribieron todas
+        """
+        with Conexion._diferidas_cond:
+            file_names = list(Conexion._diferidas)
+        return all([Conexion._volcar(file_name) for file_name in file_names])
+    
+    @staticmethod
+    def detener_escritura_diferida():
+        """
+        Detiene el hilo de la escritura diferida y escribe lo pendiente
+        
+        Se llama al terminar el proceso; vuelve a arrancar con la siguiente
+        escritura diferida.
+        
+        Returns:
+            bool: True si se escribió todo lo pendiente
+        """
+        with Conexion._diferidas_cond:
+            escritor = Conexion._escritor
+            Conexion._detener_escritor = True
+            Conexion._diferidas_cond.notify_all()
+        if escritor is not None and escritor is not threading.current_thread():
+            escritor.join()
+        return Conexion.volcar_pendientes()
+    
+    @staticmethod
+    def estado_escritura_diferida():
+        """
+        Obtiene el estado de la escritura diferida
+        
+        Returns:
+            dict: Colecciones con cambios sin escribir ('pendientes'),
+            segundos desde el cambio sin escribir más antiguo ('antiguedad'),
+            escrituras y errores acumulados, y momento (time.time) y duración
+            en segundos de la última escritura
+        """
+        with Conexion._diferidas_cond:
+            ahora = time.monotonic()
+            estado = dict(Conexion._estadisticas_diferidas)
+            estado['pendientes'] = len(Conexion._diferidas)
+            estado['antiguedad'] = max((ahora - primera for primera, _ in Conexion._sucias_desde.values()), default=0.0)
+        return estado
+    
+    @staticmethod
+    def _tras_fork():
+        """En un proceso hijo, las escrituras diferidas del padre no le corresponden"""
+        Conexion._diferidas_cond = threading.Condition()
+        Conexion._diferidas = {}
+        Conexion._sucias_desde = {}
+        Conexion._superpuestas = {}
+        Conexion._escritor = None
+    
+    @staticmethod
+    def escritura_pendiente(file_name):
+        """
+        Indica si una colección tiene escrituras diferidas sin escribir
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            
+        Returns:
+            bool: True si hay cambios anotados que aún no están en el almacenamiento
+        """
+        return file_name in Conexion._diferidas
+    
+    @staticmethod
+    def _pendientes():
+        """Obtiene los cambios pendientes de la transacción del hilo actual, o None"""
+        return getattr(Conexion._transaccion, 'pendientes', None)
+    
+    @staticmethod
+    def en_transaccion():
+        """
+        Indica si el hilo actual tiene una transacción abierta
+        
+        Returns:
+            bool: True si hay una transacción abierta
+        """
+        return Conexion._pendientes() is not None
+    
+    @staticmethod
+    def iniciar_transaccion():
+        """
+        Abre una transacción en el hilo actual
+        
+        Mientras está abierta, guardar, registrar y guardar_diferido no
+        escriben: acumulan los cambios de cada colección hasta confirmar o
+        descartar la transacción. Quien la abre debe tener tomado el bloqueo
+        exclusivo de las colecciones que va a modificar.
+        
+        Returns:
+            bool: True si se abrió, False si ya había una abierta
+        """
+        if Conexion.en_transaccion():
+            return False
+        Conexion._transaccion.pendientes = {}
+        return True
+    
+    @staticmethod
+    def descartar_transaccion():
+        """Cierra la transacción del hilo actual sin escribir sus cambios"""
+        Conexion._transaccion.pendientes = None
+    
+    @staticmethod
+    def confirmar_transaccion():
+        """
+        Cierra la transacción del hilo actual escribiendo sus cambios
+        
+        Cada colección modificada se escribe una sola vez, de forma atómica:
+        completa si se guardó entera, o como un único grupo de cambios si solo
+        se registraron cambios por registro. Si una escritura falla, las
+        colecciones ya escritas se restauran a su contenido anterior.
+        
+        Returns:
+            bool: True si se escribieron todos los cambios
+        """
+        pendientes = Conexion._pendientes()
+        Conexion.descartar_transaccion()
+        if not pendientes:
+            return True
+        
+        escritas = []
+        ultima = len(pendientes) - 1
+        for i, (file_name, (datos, cambios)) in enumerate(pendientes.items()):
+            if callable(datos):
+                datos = datos()
+            # Tras la última escritura no queda nada que pueda fallar, y las
+            # escrituras diferidas solo se anotan
+            if i < ultima and not Conexion.ESCRITURA_DIFERIDA_ACTIVA:
+                escritas.append((file_name, Conexion._punto_restauracion(file_name, datos, cambios)))
+            
+            correcto = datos is None or Conexion.guardar(file_name, datos)
+            if correcto and cambios:
+                correcto = Conexion.registrar(file_name, Conexion._ultimo_por_registro(cambios))
+            
+            if not correcto:
+                # La colección que falló no llegó a escribirse; las anteriores sí
+                for escrita, restaurar in escritas[:i]:
+                    if not restaurar():
+                        print(f"Error al restaurar {escrita} tras una transacción fallida")
+                return False
+        
+        return True
+    
+    @staticmethod
+    def _punto_restauracion(file_name, datos, cambios):
+        """
+        Prepara cómo deshacer la escritura de una colección
+        
+        No se copia la colección: guardar la reemplaza sin modificar la
+        lista anterior, que basta con conservar; registrar en el diario solo
+        lo alarga, así que basta con su tamaño; y con SQLite se conservan
+        los registros que van a cambiar.
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            datos: Lista de registros, si se va a guardar completa
+            cambios (list): Cambios por registro que se van a registrar
+            
+        Returns:
+            callable: Función sin argumentos que restaura la colección y
+            devuelve True si lo consiguió
+        """
+        if datos is not None:
+            anteriores = Conexion.cargar(file_name)
+            return lambda: Conexion.guardar(file_name, anteriores)
+        
+        if Conexion.BACKEND == 'sqlite':
+            # Se restauran con los cambios inversos
+            data = Conexion.cargar(file_name)
+            posiciones = Conexion._posiciones.get(file_name)
+            if posiciones is None or posiciones[0] is not data:
+                posiciones = (data, {registro.get('id'): i for i, registro in enumerate(data)})
+                Conexion._posiciones[file_name] = posiciones
+            inversos = []
+            for cambio in Conexion._ultimo_por_registro(cambios):
+                id = cambio.get('id') if cambio.get('op') == 'delete' else cambio.get('datos', {}).get('id')
+                posicion = posiciones[1].get(id)
+                inversos.append({'op': 'delete', 'id': id} if posicion is None else {'op': 'upsert', 'datos': data[posicion]})
+            return lambda: Conexion.registrar(file_name, inversos)
+        
+        journal_path = Conexion.get_file_path(file_name) + Conexion.JOURNAL_SUFIJO
+        firma = Conexion._firma(journal_path)
+        
+        def restaurar():
+            try:
+                with Conexion.bloqueo_exclusivo(file_name):
+                    if firma is None:
+                        if os.path.exists(journal_path):
+                            os.remove(journal_path)
+                    else:
+                        os.truncate(journal_path, firma[1])
+            except OSError as e:
+                print(f"Error al restaurar el diario de {file_name}: {e}")
+                return False
+            finally:
+                # La caché tiene aplicados los cambios deshechos
+                Conexion.invalidar_cache(file_name)
+            return True
+        return restaurar
+    
+    @staticmethod
+    def escritura_por_registro():
+        """
+        Indica si el backend configurado admite escrituras por registro
+        
+        Returns:
+            bool: True con SQLite o con el modo diario activo
+        """
+        return Conexion.BACKEND == 'sqlite' or Conexion.JOURNAL_ACTIVO
+    
+    @staticmethod
+    @contextmanager
+    def _bloqueo_archivo(file_name, exclusivo):
+        """
+        Toma un bloqueo fcntl sobre el archivo de bloqueo de una colección
+        
+        Es reentrante dentro del mismo hilo: si ya se tiene un bloqueo
+        suficiente no se vuelve a pedir, y uno compartido se eleva a
+        exclusivo mientras dure el bloque.
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+            exclusivo: True para escritura, False para lectura
+        """
+        if fcntl is None:
+            yield
+            return
+        
+        tenidos = getattr(Conexion._bloqueos, 'tenidos', None)
+        if tenidos is None:
+            tenidos = Conexion._bloqueos.tenidos = {}
+        
+        actual = tenidos.get(file_name)
+        if actual is not None:
+            fd, exclusivo_actual = actual
+            if exclusivo_actual or not exclusivo:
+                yield
+                return
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            tenidos[file_name] = (fd, True)
+            try:
+                yield
+            finally:
+                tenidos[file_name] = (fd, False)
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            return
+        
+        fd = os.open(Conexion.get_file_path(file_name) + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+            tenidos[file_name] = (fd, exclusivo)
+            try:
+                yield
+            finally:
+                del tenidos[file_name]
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+    
+    @staticmethod
+    @contextmanager
+    def bloqueo_exclusivo(file_name):
+        """
+        Bloqueo para ciclos de lectura-modificación-escritura de una colección
+        
+        Excluye a otros hilos y a otros procesos que usen el mismo directorio
+        de datos. Es reentrante dentro del mismo hilo.
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+        """
+        with Conexion._escritura_lock:
+            with Conexion._bloqueo_archivo(file_name, True):
+                yield
+    
+    @staticmethod
+    @contextmanager
+    def bloqueo_compartido(file_name):
+        """
+        Bloqueo de lectura de una colección, compatible con otros lectores
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+        """
+        with Conexion._bloqueo_archivo(file_name, False):
+            yield
+    
+    @staticmethod
+    def _escribir_temporal(file_path, data):
+        """
+        Escribe datos JSON en un archivo temporal junto al archivo final
+        
+        Args:
+            file_path: Ruta del archivo que se va a reemplazar
+            data: Datos a serializar
+            
+        Returns:
+            str: Ruta del archivo temporal, ya volcado a disco
+        """
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file, indent=4, ensure_ascii=False)
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return temp_path
+    
+    @staticmethod
+    def _firma(file_path):
+        """
+        Obtiene la firma de un archivo para validar la caché
+        
+        Args:
+            file_path: Ruta completa del archivo
+            
+        Returns:
+            tuple: (mtime_ns, tamaño, inodo) o None si el archivo no existe
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    
+    @staticmethod
+    def _identidad(file):
+        """
+        Identifica el archivo abierto en el sistema de archivos
+        
+        Args:
+            file: Archivo abierto
+            
+        Returns:
+            tuple: (dispositivo, inodo)
+        """
+        stat = os.fstat(file.fileno())
+        return (stat.st_dev, stat.st_ino)
+    
+    @staticmethod
+    def _firma_coleccion(file_name):
+        """
+        Obtiene la firma conjunta del archivo y de su diario
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+            
+        Returns:
+            tuple: (firma del archivo, firma del diario) o None si no existe ninguno
+        """
+        file_path = Conexion.get_file_path(file_name)
+        firma = Conexion._firma(file_path)
+        firma_journal = Conexion._firma(file_path + Conexion.JOURNAL_SUFIJO)
+        if firma is None and firma_journal is None:
+            return None
+        return (firma, firma_journal)
+    
     @staticmethod
     def load_json(file_name):
-        """Carga datos desde un archivo JSON"""
+        """
+        Carga datos desde un archivo JSON
+        
+        Los datos parseados se guardan en caché y se reutilizan mientras la
+        firma del archivo (mtime, tamaño e inodo) no cambie. El resultado es
+        compartido entre llamadas, por lo que no debe modificarse. Si existe
+        un diario de cambios se aplica sobre los datos del archivo.
+        """
         file_path = Conexion.get_file_path(file_name)
+        firma = Conexion._firma_coleccion(file_name)
         
-        try:
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    return json.load(file)
+        if firma is None:
             return []
+        
+        entrada = Conexion._cache.get(file_name)
+        if entrada is not None and entrada[0] == firma:
+            with Conexion._cache_lock:
+                Conexion._cache_hits += 1
+            return entrada[1]
+        
+        inicio = time.perf_counter()
+        try:
+            if firma[1] is None:
+                # El archivo se reemplaza siempre por renombrado atómico
+                data = Conexion._leer_base(file_path)
+            else:
+                # Archivo y diario deben leerse sin una compactación de por medio
+                with Conexion.bloqueo_compartido(file_name):
+                    firma = Conexion._firma_coleccion(file_name)
+                    data = []
+                    if firma[0] is not None:
+                        data = Conexion._leer_base(file_path)
+                    if firma[1] is not None:
+                        Conexion._aplicar_journal(file_path + Conexion.JOURNAL_SUFIJO, data)
         except Exception as e:
             print(f"Error al cargar datos desde {file_name}: {e}")
             return []
+        
+        with Conexion._cache_lock:
+            Conexion._cache_misses += 1
+            Conexion._cache[file_name] = (firma, data)
+        
+        if Instrumentacion.ACTIVA:
+            Instrumentacion.observar('almacenamiento', 'Conexion.load_json', time.perf_counter() - inicio)
+            Conexion._contar_io('lectura', file_name, sum(f[1] for f in firma if f is not None), len(data))
+        return data
+    
+    @staticmethod
+    def _contar_io(operacion, file_name, tamano, filas):
+        """
+        Suma a las métricas los bytes y registros leídos o escritos
+        
+        Args:
+            operacion: "lectura", "escritura" o "diario"
+            file_name: Nombre del archivo
+            tamano: Bytes leídos o escritos
+            filas: Registros leídos o escritos
+        """
+        Instrumentacion.contar('restaurante_almacenamiento_bytes_total', tamano, operacion=operacion, archivo=file_name)
+        Instrumentacion.contar('restaurante_almacenamiento_filas_total', filas, operacion=operacion, archivo=file_name)
+    
+    @staticmethod
+    def _leer_base(file_path):
+        """
+        Lee un archivo JSON, desde su instantánea si está al día
+        
+        Args:
+            file_path: Ruta completa del archivo
+            
+        Returns:
+            list: Datos del archivo; si no había instantánea válida se genera
+        """
+        if Conexion.SNAPSHOT_ACTIVO:
+            data = Conexion._leer_snapshot(file_path)
+            if data is not None:
+                return data
+        
+        with open(file_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+            # Firma del archivo abierto, aunque otro proceso lo reemplace ya
+            stat = os.fstat(file.fileno())
+        
+        if Conexion.SNAPSHOT_ACTIVO:
+            Conexion._escribir_snapshot(file_path, data, (stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return data
+    
+    @staticmethod
+    def _leer_snapshot(file_path):
+        """
+        Lee la instantánea binaria de un archivo JSON
+        
+        Args:
+            file_path: Ruta completa del archivo JSON
+            
+        Returns:
+            list: Datos de la instantánea, o None si no existe, no es de esta
+            versión o no corresponde al contenido actual del JSON
+        """
+        cabecera = Conexion._SNAPSHOT_CABECERA
+        try:
+            with open(file_path + Conexion.SNAPSHOT_SUFIJO, 'rb') as file:
+                contenido = file.read()
+        except OSError:
+            return None
+        
+        if len(contenido) < cabecera.size:
+            return None
+        magia, version, mayor, menor, *firma = cabecera.unpack_from(contenido)
+        if magia != Conexion._SNAPSHOT_MAGIA or version != Conexion.SNAPSHOT_VERSION or (mayor, menor) != sys.version_info[:2]:
+            return None
+        if Conexion._firma(file_path) != tuple(firma):
+            return None
+        
+        # Decodificar crea cientos de miles de objetos de una vez; sin pausar el
+        # recolector de ciclos este los recorrería varias veces sin liberar nada
+        gc_activo = gc.isenabled()
+        gc.disable()
+        try:
+            return marshal.loads(memoryview(contenido)[cabecera.size:])
+        except (EOFError, ValueError, TypeError):
+            return None
+        finally:
+            if gc_activo:
+                gc.enable()
+    
+    @staticmethod
+    def _escribir_snapshot(file_path, data, firma):
+        """
+        Escribe la instantánea binaria de un archivo JSON
+        
+        Las cadenas repetidas (claves y valores como el nombre de categoría)
+        se escriben una sola vez y se comparten al leer. Un fallo no afecta a
+        la escritura del JSON, que sigue siendo la fuente de verdad.
+        
+        Args:
+            file_path: Ruta completa del archivo JSON
+            data (list): Datos del archivo
+            firma: Firma (mtime_ns, tamaño, inodo) del JSON con ese contenido
+        """
+        cadenas = {}
+        filas = [
+            {
+                cadenas.setdefault(clave, clave): cadenas.setdefault(valor, valor) if isinstance(valor, str) else valor
+                for clave, valor in fila.items()
+            } if isinstance(fila, dict) else fila
+            for fila in data
+        ]
+        contenido = Conexion._SNAPSHOT_CABECERA.pack(
+            Conexion._SNAPSHOT_MAGIA, Conexion.SNAPSHOT_VERSION, *sys.version_info[:2], *firma
+        ) + marshal.dumps(filas, 4)
+        
+        snapshot_path = file_path + Conexion.SNAPSHOT_SUFIJO
+        temp_path = f"{snapshot_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(contenido)
+            os.replace(temp_path, snapshot_path)
+        except (OSError, ValueError) as e:
+            print(f"Error al guardar la instantánea de {file_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    @staticmethod
+    def _aplicar_journal(journal_path, data):
+        """
+        Aplica sobre los datos cargados los cambios registrados en un diario
+        
+        Args:
+            journal_path: Ruta completa del diario
+            data (list): Datos del archivo, se modifican en el lugar
+        """
+        posiciones = {registro.get('id'): i for i, registro in enumerate(data)}
+        eliminados = False
+        
+        with open(journal_path, 'r', encoding='utf-8') as file:
+            for linea in file:
+                try:
+                    cambio = json.loads(linea)
+                except ValueError:
+                    # Última línea incompleta por una escritura interrumpida
+                    break
+                eliminados = Conexion._aplicar_cambio(data, posiciones, cambio) or eliminados
+        
+        if eliminados:
+            data[:] = [registro for registro in data if registro is not None]
+    
+    @staticmethod
+    def leer_diario(file_name, inodo, desde):
+        """
+        Lee los cambios anexados al diario de una colección desde una posición
+        
+        Solo se leen líneas completas, así que no hace falta el bloqueo: una
+        escritura en curso se leerá entera la próxima vez.
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+            inodo: Inodo del diario leído hasta ahora, o None si no existía
+            desde: Posición del diario hasta la que ya se leyó
+            
+        Returns:
+            tuple: (cambios, inodo, posición final), o None si el diario ya no
+            es el que se estaba leyendo
+        """
+        try:
+            file = open(Conexion.get_file_path(file_name) + Conexion.JOURNAL_SUFIJO, 'rb')
+        except FileNotFoundError:
+            return ([], None, 0) if inodo is None else None
+        
+        with file:
+            stat = os.fstat(file.fileno())
+            if inodo is None:
+                inodo = stat.st_ino
+            elif stat.st_ino != inodo or stat.st_size < desde:
+                return None
+            if stat.st_size == desde:
+                return [], inodo, desde
+            file.seek(desde)
+            contenido = file.read()
+        
+        # El último elemento es lo que sigue al último salto de línea
+        cambios = []
+        for linea in contenido.split(b"\n")[:-1]:
+            try:
+                cambios.append(json.loads(linea))
+            except ValueError:
+                break
+            desde += len(linea) + 1
+        return cambios, inodo, desde
+    
+    @staticmethod
+    def _aplicar_cambio(data, posiciones, cambio):
+        """
+        Aplica un cambio del diario sobre una lista de registros
+        
+        Los registros eliminados se dejan como None para no desplazar las
+        posiciones; quien llama debe filtrarlos al terminar.
+        
+        Args:
+            data (list): Lista de registros
+            posiciones (dict): Índice id -> posición en la lista
+            cambio (dict): Cambio con la forma {"op": "upsert", "datos": {...}}
+                o {"op": "delete", "id": ...}
+                
+        Returns:
+            bool: True si el cambio eliminó un registro
+        """
+        if cambio.get('op') == 'delete':
+            posicion = posiciones.pop(cambio.get('id'), None)
+            if posicion is not None:
+                data[posicion] = None
+                return True
+            return False
+        
+        registro = cambio.get('datos', {})
+        posicion = posiciones.get(registro.get('id'))
+        if posicion is None:
+            posiciones[registro.get('id')] = len(data)
+            data.append(registro)
+        else:
+            data[posicion] = registro
+        return False
+    
+    @staticmethod
+    def _aplicar_cambios(file_name, data, cambios):
+        """
+        Aplica cambios sobre una colección en caché, en el lugar
+        
+        Args:
+            file_name: Nombre del archivo de la colección
+            data (list): Lista de registros en caché
+            cambios (list): Cambios con el formato del diario
+        """
+        posiciones = Conexion._posiciones.get(file_name)
+        if posiciones is None or posiciones[0] is not data:
+            posiciones = (data, {registro.get('id'): i for i, registro in enumerate(data)})
+        
+        eliminados = False
+        for cambio in cambios:
+            eliminados = Conexion._aplicar_cambio(data, posiciones[1], cambio) or eliminados
+        
+        if eliminados:
+            # Las posiciones cambian al quitar los huecos de la lista
+            data[:] = [registro for registro in data if registro is not None]
+            Conexion._posiciones.pop(file_name, None)
+        else:
+            Conexion._posiciones[file_name] = posiciones
     
     @staticmethod
     def save_json(file_name, data):
         """Guarda datos en un archivo JSON"""
         file_path = Conexion.get_file_path(file_name)
+        journal_path = file_path + Conexion.JOURNAL_SUFIJO
         
         try:
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(data, file, indent=4, ensure_ascii=False)
-            return True
+            with Conexion.bloqueo_exclusivo(file_name):
+                # Escribir aparte y renombrar, para que ningún lector vea un archivo a medias
+                temp_path = Conexion._escribir_temporal(file_path, data)
+                os.replace(temp_path, file_path)
+                # El contenido completo reemplaza cualquier diario pendiente
+                if os.path.exists(journal_path):
+                    os.remove(journal_path)
+                firma = Conexion._firma_coleccion(file_name)
+                if Conexion.SNAPSHOT_ACTIVO and firma is not None:
+                    Conexion._escribir_snapshot(file_path, data, firma[0])
+                Conexion._publicar(file_name, data)
         except Exception as e:
             print(f"Error al guardar datos en {file_name}: {e}")
+            Conexion.invalidar_cache(file_name)
+            return False
+        
+        # Los datos recién escritos pasan a ser la versión en caché
+        with Conexion._cache_lock:
+            if firma is None:
+                Conexion._cache.pop(file_name, None)
+            else:
+                Conexion._cache[file_name] = (firma, data)
+        
+        if Instrumentacion.ACTIVA and firma is not None:
+            Conexion._contar_io('escritura', file_name, firma[0][1], len(data))
+        return True
+    
+    @staticmethod
+    def registrar_cambios(file_name, cambios):
+        """
+        Anexa cambios al diario de un archivo sin reescribirlo completo
+        
+        Los cambios también se aplican sobre la versión en caché, de modo que
+        las lecturas siguientes no vuelven a parsear el archivo. Cuando el
+        diario supera UMBRAL_COMPACTACION se compacta en segundo plano.
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+            cambios (list): Cambios con la forma {"op": "upsert", "datos": {...}}
+                o {"op": "delete", "id": ...}
+                
+        Returns:
+            bool: True si se registraron correctamente
+        """
+        journal_path = Conexion.get_file_path(file_name) + Conexion.JOURNAL_SUFIJO
+        lineas = "".join(json.dumps(cambio, ensure_ascii=False) + "\n" for cambio in cambios)
+        
+        try:
+            with Conexion.bloqueo_exclusivo(file_name):
+                firma_previa = Conexion._firma_coleccion(file_name)
+                with open(journal_path, 'a', encoding='utf-8') as file:
+                    file.write(lineas)
+                    file.flush()
+                    os.fsync(file.fileno())
+                firma = Conexion._firma_coleccion(file_name)
+                tamano = firma[1][1]
+                
+                # La generación publicada en memoria compartida sigue valiendo:
+                # los lectores aplican lo anexado con leer_diario
+                with Conexion._cache_lock:
+                    entrada = Conexion._cache.get(file_name)
+                    if entrada is not None and entrada[0] == firma_previa:
+                        Conexion._aplicar_cambios(file_name, entrada[1], cambios)
+                        Conexion._cache[file_name] = (firma, entrada[1])
+                    else:
+                        Conexion._cache.pop(file_name, None)
+        except Exception as e:
+            print(f"Error al registrar cambios en {file_name}: {e}")
+            Conexion.invalidar_cache(file_name)
             return False
+        
+        if Instrumentacion.ACTIVA:
+            Conexion._contar_io('diario', file_name, len(lineas.encode('utf-8')), len(cambios))
+        
+        if tamano > Conexion.UMBRAL_COMPACTACION:
+            Conexion._programar_compactacion(file_name)
+        return True
+    
+    @staticmethod
+    def _programar_compactacion(file_name):
+        """
+        Lanza la compactación de un archivo en un hilo de fondo
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+        """
+        with Conexion._escritura_lock:
+            if file_name in Conexion._compactando:
+                return
+            Conexion._compactando.add(file_name)
+        
+        hilo = threading.Thread(target=Conexion.compactar, args=(file_name,))
+        hilo.start()
+    
+    @staticmethod
+    def compactar(file_name):
+        """
+        Integra el diario de un archivo en el propio archivo
+        
+        El volcado completo se escribe sin bloquear a los escritores; los
+        cambios anexados mientras tanto se conservan en un diario nuevo.
+        Reaplicar un diario ya integrado es inocuo, así que una interrupción
+        entre ambos pasos no pierde datos.
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+            
+        Returns:
+            bool: True si se compactó correctamente
+        """
+        file_path = Conexion.get_file_path(file_name)
+        journal_path = file_path + Conexion.JOURNAL_SUFIJO
+        temp_path = None
+        
+        try:
+            with Conexion.bloqueo_exclusivo(file_name):
+                data = Conexion.load_json(file_name)
+                copia = list(data)
+                firma = Conexion._firma_coleccion(file_name)
+                if firma is None or firma[1] is None:
+                    return True
+                desplazamiento = firma[1][1]
+                with open(journal_path, 'rb') as file:
+                    identidad = Conexion._identidad(file)
+                    integrado = file.read(desplazamiento)
+            
+            temp_path = Conexion._escribir_temporal(file_path, copia)
+            
+            with Conexion.bloqueo_exclusivo(file_name):
+                # La versión en caché sigue al día si solo este proceso anexó cambios
+                entrada = Conexion._cache.get(file_name)
+                al_dia = entrada is not None and entrada[1] is data and entrada[0] == Conexion._firma_coleccion(file_name)
+                
+                # Otro proceso pudo compactar o reescribir el archivo entretanto;
+                # un diario nuevo puede reutilizar el inodo, así que además
+                # debe empezar por lo integrado
+                try:
+                    with open(journal_path, 'rb') as file:
+                        vigente = Conexion._identidad(file) == identidad and file.read(desplazamiento) == integrado
+                        pendiente = file.read()
+                except FileNotFoundError:
+                    vigente = False
+                if not vigente:
+                    os.remove(temp_path)
+                    temp_path = None
+                    return False
+                os.replace(temp_path, file_path)
+                temp_path = None
+                if Conexion.SNAPSHOT_ACTIVO:
+                    Conexion._escribir_snapshot(file_path, copia, Conexion._firma(file_path))
+                if pendiente:
+                    with open(journal_path + ".tmp", 'wb') as file:
+                        file.write(pendiente)
+                        file.flush()
+                        os.fsync(file.fileno())
+                    os.replace(journal_path + ".tmp", journal_path)
+                else:
+                    os.remove(journal_path)
+                
+                # Los datos en caché siguen siendo válidos; solo cambia la firma
+                with Conexion._cache_lock:
+                    if al_dia:
+                        Conexion._cache[file_name] = (Conexion._firma_coleccion(file_name), data)
+                    else:
+                        Conexion._cache.pop(file_name, None)
+                # La generación publicada lleva la firma anterior; sin la versión
+                # en caché, el siguiente lector publica desde el archivo
+                if al_dia:
+                    Conexion._publicar(file_name, data)
+            return True
+        except Exception as e:
+            print(f"Error al compactar {file_name}: {e}")
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+            Conexion.invalidar_cache(file_name)
+            return False
+        finally:
+            with Conexion._escritura_lock:
+                Conexion._compactando.discard(file_name)
+    
+    @staticmethod
+    def obtener_firma(file_name):
+        """
+        Obtiene la firma con la que está en caché un archivo
+        
+        Args:
+            file_name: Nombre del archivo en el directorio de datos
+            
+        Returns:
+            tuple: Firma de la versión en caché o None si no está cargado
+        """
+        entrada = Conexion._cache.get(file_name)
+        return entrada[0] if entrada is not None else None
+    
+    @staticmethod
+    def invalidar_cache(file_name=None):
+        """
+        Descarta la caché de un archivo, o de todos si no se indica ninguno
+        
+        Args:
+            file_name: Nombre del archivo a invalidar (opcional)
+        """
+        with Conexion._cache_lock:
+            if file_name is None:
+                Conexion._cache.clear()
+            else:
+                Conexion._cache.pop(file_name, None)
+    
+    @staticmethod
+    def estadisticas_cache():
+        """
+        Obtiene los contadores de uso de la caché
+        
+        Returns:
+            dict: Aciertos, fallos y archivos en caché
+        """
+        with Conexion._cache_lock:
+            return {
+                'hits': Conexion._cache_hits,
+                'misses': Conexion._cache_misses,
+                'archivos': len(Conexion._cache)
+            }
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=Conexion._tras_fork)
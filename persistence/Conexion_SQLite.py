@@ -0,0 +1,385 @@
+"""
+Backend de persistencia en SQLite
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from persistence.Conexion import Conexion
+
+class Conexion_SQLite:
+    """
+    Maneja la conexión a la base de datos SQLite
+    
+    Ofrece las mismas operaciones por colección que Conexion (cargar, guardar
+    y registrar), identificando cada colección por el nombre de su archivo
+    JSON para que los repositorios no dependan del backend.
+    """
+    
+    # Nombre del archivo de base de datos dentro del directorio de datos
+    DB_FILE = "restaurante.db"
+    
+    # Colección -> (tabla, columnas)
+    TABLAS = {
+        "categorias.json": ("categorias", ("id", "nombre", "descripcion")),
+        "productos.json": ("productos", ("id", "nombre", "descripcion", "precio", "categoria_id", "nombre_categoria")),
+        "cambios.json": ("cambios", ("id", "coleccion", "op", "registro"))
+    }
+    
+    # Valores de las columnas NOT NULL cuando el registro no los trae, como
+    # en los archivos JSON antiguos sin descripción
+    VALORES_POR_DEFECTO = {
+        "categorias": {"nombre": "", "descripcion": ""},
+        "productos": {"nombre": "", "descripcion": "", "precio": 0.0}
+    }
+    
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS categorias (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL DEFAULT '',
+            descripcion TEXT NOT NULL DEFAULT ''
+        );
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL DEFAULT '',
+            descripcion TEXT NOT NULL DEFAULT '',
+            precio REAL NOT NULL DEFAULT 0,
+            categoria_id INTEGER,
+            nombre_categoria TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_productos_categoria ON productos (categoria_id);
+        CREATE TABLE IF NOT EXISTS cambios (
+            id INTEGER PRIMARY KEY,
+            coleccion TEXT NOT NULL,
+            op TEXT NOT NULL,
+            registro INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_productos_precio ON productos (precio);
+        CREATE TABLE IF NOT EXISTS versiones (
+            tabla TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+    """
+    
+    # Conexiones abiertas como mucho a la vez en cada proceso; las que
+    # quedan libres se reutilizan en las siguientes operaciones
+    TAMANO_POOL = int(os.environ.get('RESTAURANTE_SQLITE_POOL', '8'))
+    
+    _pool_cond = threading.Condition()
+    _libres = []            # Conexiones abiertas sin usar
+    _abiertas = 0           # Conexiones abiertas, en uso o libres
+    _pool_clave = None      # (PID, ruta de la base de datos) de las conexiones del pool
+    _esquema_listo = None   # (PID, ruta) para el que ya se creó y adaptó el esquema
+    
+    # Caché de colecciones: file_name -> (version, datos)
+    _cache = {}
+    _cache_lock = threading.Lock()
+    
+    @staticmethod
+    def get_db_path():
+        """Obtiene la ruta del archivo de base de datos"""
+        return Conexion.get_file_path(Conexion_SQLite.DB_FILE)
+    
+    @staticmethod
+    @contextmanager
+    def _conexion():
+        """
+        Toma una conexión del pool del proceso, abriéndola si hace falta
+        
+        Si ya hay TAMANO_POOL conexiones en uso se espera a que se libere
+        alguna. La conexión vuelve al pool al salir del bloque.
+        
+        Yields:
+            sqlite3.Connection: Conexión en modo WAL y autocommit
+        """
+        clave = (os.getpid(), Conexion_SQLite.get_db_path())
+        cond = Conexion_SQLite._pool_cond
+        with cond:
+            while True:
+                if Conexion_SQLite._pool_clave != clave:
+                    Conexion_SQLite._vaciar_pool(clave)
+                if Conexion_SQLite._libres:
+                    conexion = Conexion_SQLite._libres.pop()
+                    break
+                if Conexion_SQLite._abiertas < Conexion_SQLite.TAMANO_POOL:
+                    conexion = Conexion_SQLite._abrir(clave)
+                    Conexion_SQLite._abiertas += 1
+                    break
+                cond.wait()
+        
+        try:
+            yield conexion
+        finally:
+            with cond:
+                if Conexion_SQLite._pool_clave == clave:
+                    Conexion_SQLite._libres.append(conexion)
+                    cond.notify()
+                else:
+                    conexion.close()
+    
+    @staticmethod
+    def _vaciar_pool(clave):
+        """
+        Empieza un pool nuevo para otra base de datos o en un proceso hijo
+        
+        Las conexiones heredadas de otro proceso no se cierran: siguen siendo
+        del padre. Debe llamarse con el bloqueo del pool tomado.
+        
+        Args:
+            clave: (PID, ruta de la base de datos) del pool nuevo
+        """
+        anterior = Conexion_SQLite._pool_clave
+        if anterior is not None and anterior[0] == os.getpid():
+            for conexion in Conexion_SQLite._libres:
+                conexion.close()
+        Conexion_SQLite._libres = []
+        Conexion_SQLite._abiertas = 0
+        Conexion_SQLite._pool_clave = clave
+    
+    @staticmethod
+    def _abrir(clave):
+        """
+        Abre una conexión nueva para el pool
+        
+        El esquema se crea y se adapta solo con la primera conexión de cada
+        proceso a cada base de datos. Debe llamarse con el bloqueo del pool tomado.
+        
+        Args:
+            clave: (PID, ruta de la base de datos)
+            
+        Returns:
+            sqlite3.Connection: Conexión en modo WAL y autocommit
+        """
+        # Cada conexión la usa un solo hilo a la vez, aunque no siempre el mismo
+        conexion = sqlite3.connect(clave[1], isolation_level=None, cached_statements=256, check_same_thread=False)
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        if Conexion_SQLite._esquema_listo != clave:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.executescript(Conexion_SQLite.ESQUEMA)
+            Conexion_SQLite._actualizar_esquema(conexion)
+            Conexion_SQLite._esquema_listo = clave
+        return conexion
+    
+    @staticmethod
+    def _valores(tabla, columnas):
+        """
+        Obtiene la función que convierte un registro en los valores de una fila
+        
+        Args:
+            tabla: Nombre de la tabla
+            columnas: Columnas de la tabla, en orden
+            
+        Returns:
+            function: Función registro -> lista de valores, con el valor por
+            defecto en las columnas NOT NULL que falten
+        """
+        por_columna = Conexion_SQLite.VALORES_POR_DEFECTO.get(tabla, {})
+        defectos = [(posicion, por_columna[columna]) for posicion, columna in enumerate(columnas) if columna in por_columna]
+        
+        def valores(registro):
+            fila = [registro.get(columna) for columna in columnas]
+            for posicion, defecto in defectos:
+                if fila[posicion] is None:
+                    fila[posicion] = defecto
+            return fila
+        return valores
+    
+    @staticmethod
+    def _precio_real(conexion):
+        """Indica si la columna precio de productos está declarada REAL"""
+        columnas = {fila[1]: fila[2] for fila in conexion.execute("PRAGMA table_info(productos)")}
+        return columnas.get('precio', '').upper() == 'REAL'
+    
+    @staticmethod
+    def _actualizar_esquema(conexion):
+        """
+        Adapta una base de datos creada con un esquema anterior
+        
+        El precio se declaraba NUMERIC, que guarda 99.0 como el entero 99;
+        la tabla de productos se reconstruye con la declaración actual.
+        
+        Args:
+            conexion: Conexión en autocommit
+        """
+        if Conexion_SQLite._precio_real(conexion):
+            return
+        
+        columnas = ', '.join(Conexion_SQLite.TABLAS["productos.json"][1])
+        sentencias = [sentencia for sentencia in Conexion_SQLite.ESQUEMA.split(';') if ' productos ' in sentencia]
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            # Otro proceso puede haberla reconstruido mientras tanto
+            if not Conexion_SQLite._precio_real(conexion):
+                conexion.execute("ALTER TABLE productos RENAME TO productos_anterior")
+                conexion.execute("DROP INDEX IF EXISTS idx_productos_categoria")
+                conexion.execute("DROP INDEX IF EXISTS idx_productos_precio")
+                for sentencia in sentencias:
+                    conexion.execute(sentencia)
+                conexion.execute(f"INSERT INTO productos ({columnas}) SELECT {columnas} FROM productos_anterior")
+                conexion.execute("DROP TABLE productos_anterior")
+                Conexion_SQLite._incrementar_version(conexion, "productos")
+            conexion.execute("COMMIT")
+        except sqlite3.Error:
+            if conexion.in_transaction:
+                conexion.execute("ROLLBACK")
+            raise
+    
+    @staticmethod
+    def _version(conexion, tabla):
+        """Obtiene la versión actual de una tabla"""
+        fila = conexion.execute("SELECT version FROM versiones WHERE tabla = ?", (tabla,)).fetchone()
+        return fila[0] if fila else 0
+    
+    @staticmethod
+    def _incrementar_version(conexion, tabla):
+        """Incrementa la versión de una tabla dentro de la transacción en curso"""
+        conexion.execute(
+            "INSERT INTO versiones (tabla, version) VALUES (?, 1) "
+            "ON CONFLICT (tabla) DO UPDATE SET version = version + 1",
+            (tabla,)
+        )
+        return Conexion_SQLite._version(conexion, tabla)
+    
+    @staticmethod
+    def cargar(file_name):
+        """
+        Carga una colección desde su tabla
+        
+        Los datos se guardan en caché y se reutilizan mientras la versión de
+        la tabla no cambie. El resultado es compartido y no debe modificarse.
+        
+        Args:
+            file_name: Nombre del archivo JSON de la colección
+            
+        Returns:
+            list: Registros como diccionarios
+        """
+        tabla, columnas = Conexion_SQLite.TABLAS[file_name]
+        
+        try:
+            with Conexion_SQLite._conexion() as conexion:
+                version = Conexion_SQLite._version(conexion, tabla)
+                
+                entrada = Conexion_SQLite._cache.get(file_name)
+                if entrada is not None and entrada[0] == version:
+                    return entrada[1]
+                
+                cursor = conexion.execute(f"SELECT {', '.join(columnas)} FROM {tabla} ORDER BY id")
+                data = [dict(zip(columnas, fila)) for fila in cursor]
+        except sqlite3.Error as e:
+            print(f"Error al cargar datos desde {tabla}: {e}")
+            return []
+        
+        with Conexion_SQLite._cache_lock:
+            Conexion_SQLite._cache[file_name] = (version, data)
+        return data
+    
+    @staticmethod
+    def guardar(file_name, data):
+        """
+        Reemplaza el contenido completo de una tabla
+        
+        Args:
+            file_name: Nombre del archivo JSON de la colección
+            data (list): Registros como diccionarios
+            
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        tabla, columnas = Conexion_SQLite.TABLAS[file_name]
+        insertar = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})"
+        valores = Conexion_SQLite._valores(tabla, columnas)
+        
+        with Conexion_SQLite._conexion() as conexion:
+            try:
+                conexion.execute("BEGIN IMMEDIATE")
+                conexion.execute(f"DELETE FROM {tabla}")
+                conexion.executemany(insertar, (valores(registro) for registro in data))
+                version = Conexion_SQLite._incrementar_version(conexion, tabla)
+                conexion.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conexion.in_transaction:
+                    conexion.execute("ROLLBACK")
+                print(f"Error al guardar datos en {tabla}: {e}")
+                Conexion_SQLite.invalidar_cache(file_name)
+                return False
+        
+        with Conexion_SQLite._cache_lock:
+            Conexion_SQLite._cache[file_name] = (version, data)
+        return True
+    
+    @staticmethod
+    def registrar(file_name, cambios):
+        """
+        Aplica cambios de registros individuales en una sola transacción
+        
+        Args:
+            file_name: Nombre del archivo JSON de la colección
+            cambios (list): Cambios con la forma {"op": "upsert", "datos": {...}}
+                o {"op": "delete", "id": ...}
+                
+        Returns:
+            bool: True si se guardaron correctamente
+        """
+        tabla, columnas = Conexion_SQLite.TABLAS[file_name]
+        insertar = f"INSERT OR REPLACE INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})"
+        eliminar = f"DELETE FROM {tabla} WHERE id = ?"
+        valores = Conexion_SQLite._valores(tabla, columnas)
+        
+        with Conexion_SQLite._conexion() as conexion:
+            try:
+                conexion.execute("BEGIN IMMEDIATE")
+                version_previa = Conexion_SQLite._version(conexion, tabla)
+                for cambio in cambios:
+                    if cambio.get('op') == 'delete':
+                        conexion.execute(eliminar, (cambio.get('id'),))
+                    else:
+                        conexion.execute(insertar, valores(cambio.get('datos', {})))
+                version = Conexion_SQLite._incrementar_version(conexion, tabla)
+                conexion.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conexion.in_transaction:
+                    conexion.execute("ROLLBACK")
+                print(f"Error al guardar cambios en {tabla}: {e}")
+                Conexion_SQLite.invalidar_cache(file_name)
+                return False
+        
+        # Mantener la caché al día si reflejaba la versión anterior
+        with Conexion_SQLite._cache_lock:
+            entrada = Conexion_SQLite._cache.get(file_name)
+            if entrada is not None and entrada[0] == version_previa:
+                Conexion._aplicar_cambios(file_name, entrada[1], cambios)
+                Conexion_SQLite._cache[file_name] = (version, entrada[1])
+            else:
+                Conexion_SQLite._cache.pop(file_name, None)
+        return True
+    
+    @staticmethod
+    def invalidar_cache(file_name=None):
+        """
+        Descarta la caché de una colección, o de todas si no se indica ninguna
+        
+        Args:
+            file_name: Nombre del archivo JSON de la colección (opcional)
+        """
+        with Conexion_SQLite._cache_lock:
+            if file_name is None:
+                Conexion_SQLite._cache.clear()
+            else:
+                Conexion_SQLite._cache.pop(file_name, None)
+    
+    @staticmethod
+    def migrar_desde_json():
+        """
+        Importa a la base de datos el contenido de los archivos JSON
+        
+        Returns:
+            dict: Número de registros importados por tabla
+        """
+        resultado = {}
+        for file_name, (tabla, _) in Conexion_SQLite.TABLAS.items():
+            data = Conexion.load_json(file_name)
+            if not Conexion_SQLite.guardar(file_name, data):
+                raise RuntimeError(f"No se pudo migrar {file_name}")
+            resultado[tabla] = len(data)
+        return resultado
@@ -0,0 +1,410 @@
+"""
+Índice invertido para la búsqueda de productos por texto
+"""
+import gc
+import re
+import heapq
+import unicodedata
+from bisect import bisect_left, insort
+
+class Indice_Busqueda:
+    """
+    Índice invertido sobre nombre, descripción y nombre de categoría
+    
+    Los términos se guardan sin tildes y en minúsculas. Cada término de la
+    consulta se busca como prefijo, lo que permite autocompletar mientras se
+    escribe, y las coincidencias exactas puntúan más que las parciales.
+    
+    Al construir el índice se calcula, para cada prefijo de cada término,
+    la mejor puntuación de cada producto que lo contiene, agrupada por nivel
+    de puntuación con los IDs ordenados, y se mantiene al indexar. Una
+    consulta no puntúa nada: toma los niveles de cada término, recorre sus
+    combinaciones de mayor a menor suma y se detiene al reunir los
+    resultados pedidos.
+    """
+    
+    # Peso de cada campo en la puntuación
+    PESOS = (('nombre', 3), ('nombre_categoria', 2), ('descripcion', 1))
+    
+    # Cambios en un mismo nivel a partir de los cuales se rehace la lista
+    # en lugar de insertar o quitar los IDs uno a uno
+    CAMBIOS_POR_NIVEL = 8
+    
+    _TOKEN = re.compile(r'\w+')
+    _DIACRITICOS = re.compile('[\u0300-\u036f]')
+    
+    def __init__(self, productos=()):
+        """
+        Inicializa el índice
+        
+        Args:
+            productos: Productos con los que construir el índice (opcional)
+        """
+        self._terminos_por_id = {}  # id -> {término: peso} del producto
+        self._prefijos = {}         # prefijo -> {puntos: [ids ordenados]}
+        
+        # Indexar crea cientos de miles de objetos de una vez; sin pausar el
+        # recolector de ciclos este los recorrería varias veces sin liberar nada
+        gc_activo = gc.isenabled()
+        gc.disable()
+        try:
+            self._construir(productos)
+        finally:
+            if gc_activo:
+                gc.enable()
+    
+    def _construir(self, productos):
+        """
+        Calcula los términos de cada producto y los niveles de cada prefijo
+        
+        Args:
+            productos: Productos con los que construir el índice
+        """
+        # Primero los postings de cada término; los nombres de categoría se
+        # repiten en muchos productos y se tokenizan una sola vez
+        postings = {}               # término -> {id: peso}
+        terminos_categoria = {}
+        for producto in productos:
+            pesos = Indice_Busqueda._pesos(producto, terminos_categoria)
+            self._terminos_por_id[producto.id] = pesos
+            for termino, peso in pesos.items():
+                ids = postings.get(termino)
+                if ids is None:
+                    postings[termino] = {producto.id: peso}
+                else:
+                    ids[producto.id] = peso
+        
+        por_peso = {termino: Indice_Busqueda._niveles(ids) for termino, ids in postings.items()}
+        vocabulario = sorted(postings)
+        
+        # Después los niveles de cada prefijo. Los términos que empiezan por un
+        # prefijo son un tramo del vocabulario ordenado, que empieza en el
+        # primer término que lo genera; con un solo término basta copiar sus
+        # niveles, lo habitual en los prefijos largos
+        for inicio, termino in enumerate(vocabulario):
+            for fin in range(1, len(termino) + 1):
+                prefijo = termino[:fin]
+                if prefijo in self._prefijos:
+                    continue
+                siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+                tramo = vocabulario[inicio:bisect_left(vocabulario, siguiente, inicio)]
+                if len(tramo) == 1:
+                    factor = 2 if termino == prefijo else 1
+                    self._prefijos[prefijo] = {peso * factor: list(ids) for peso, ids in por_peso[termino].items()}
+                    continue
+                
+                # La mejor puntuación de cada producto, de los niveles más altos
+                # a los más bajos y con operaciones de conjuntos
+                candidatos = {}
+                for coincidente in tramo:
+                    factor = 2 if coincidente == prefijo else 1
+                    for peso, ids in por_peso[coincidente].items():
+                        candidatos.setdefault(peso * factor, []).append(ids)
+                niveles = self._prefijos[prefijo] = {}
+                asignados = set()
+                for puntos in sorted(candidatos, reverse=True):
+                    ids = set().union(*candidatos[puntos])
+                    ids -= asignados
+                    if ids:
+                        niveles[puntos] = sorted(ids)
+                        asignados |= ids
+    
+    @staticmethod
+    def _niveles(puntuaciones):
+        """
+        Agrupa los productos por puntuación
+        
+        Args:
+            puntuaciones (dict): id -> puntos
+            
+        Returns:
+            dict: puntos -> [ids ordenados]
+        """
+        distintas = set(puntuaciones.values())
+        if len(distintas) == 1:
+            niveles = {distintas.pop(): list(puntuaciones)}
+        else:
+            niveles = {}
+            for id, puntos in puntuaciones.items():
+                ids = niveles.get(puntos)
+                if ids is None:
+                    niveles[puntos] = [id]
+                else:
+                    ids.append(id)
+        # Los productos suelen llegar ordenados por ID y ordenar es lineal
+        for ids in niveles.values():
+            ids.sort()
+        return niveles
+    
+    @staticmethod
+    def normalizar(texto):
+        """
+        Quita tildes y pasa a minúsculas un texto
+        
+        Args:
+            texto: Texto a normalizar
+            
+        Returns:
+            str: Texto normalizado
+        """
+        if not texto:
+            return ''
+        texto = texto.casefold()
+        if texto.isascii():
+            return texto
+        return Indice_Busqueda._DIACRITICOS.sub('', unicodedata.normalize('NFKD', texto))
+    
+    @staticmethod
+    def tokenizar(texto):
+        """
+        Divide un texto en términos normalizados
+        
+        Args:
+            texto: Texto a dividir
+            
+        Returns:
+            list: Lista de términos
+        """
+        return Indice_Busqueda._TOKEN.findall(Indice_Busqueda.normalizar(texto))
+    
+    @staticmethod
+    def _pesos(producto, terminos_categoria=None):
+        """
+        Obtiene los términos de un producto con su peso
+        
+        Args:
+            producto: Objeto Producto
+            terminos_categoria: Términos ya calculados de cada nombre de
+                categoría (opcional)
+                
+        Returns:
+            dict: término -> suma de los pesos de los campos que lo contienen
+        """
+        pesos = {}
+        for campo, peso in Indice_Busqueda.PESOS:
+            texto = getattr(producto, campo)
+            if not isinstance(texto, str):
+                continue
+            if campo == 'nombre_categoria' and terminos_categoria is not None:
+                terminos = terminos_categoria.get(texto)
+                if terminos is None:
+                    terminos = terminos_categoria[texto] = Indice_Busqueda.tokenizar(texto)
+            else:
+                terminos = Indice_Busqueda.tokenizar(texto)
+            for termino in terminos:
+                pesos[termino] = pesos.get(termino, 0) + peso
+        return pesos
+    
+    @staticmethod
+    def _puntos(pesos, prefijos=None):
+        """
+        Obtiene la puntuación de un producto para cada prefijo de sus términos
+        
+        Un término completo puntúa el doble de su peso y un prefijo, su peso;
+        si varios términos comparten un prefijo cuenta el mejor.
+        
+        Args:
+            pesos (dict): término -> peso del producto
+            prefijos (set): Prefijos a los que limitarse, junto con todos sus
+                prefijos (opcional)
+                
+        Returns:
+            dict: prefijo -> puntos
+        """
+        puntos = {}
+        for termino, peso in pesos.items():
+            for fin in range(1, len(termino) + 1):
+                prefijo = termino[:fin]
+                if prefijos is not None and prefijo not in prefijos:
+                    break
+                valor = peso * 2 if fin == len(termino) else peso
+                if valor > puntos.get(prefijo, 0):
+                    puntos[prefijo] = valor
+        return puntos
+    
+    def agregar(self, producto):
+        """
+        Indexa un producto
+        
+        Args:
+            producto: Objeto Producto
+        """
+        self.actualizar_lote([producto])
+    
+    def quitar(self, id):
+        """
+        Quita un producto del índice
+        
+        Args:
+            id: ID del producto
+        """
+        self.actualizar_lote((), [id])
+    
+    def actualizar(self, producto):
+        """
+        Vuelve a indexar un producto modificado
+        
+        Args:
+            producto: Objeto Producto
+        """
+        self.actualizar_lote([producto])
+    
+    def actualizar_lote(self, productos, eliminados=()):
+        """
+        Vuelve a indexar varios productos y quita otros
+        
+        Solo se tocan los niveles en los que la puntuación de un producto
+        cambia: modificar un campo que no se indexa no cuesta nada, y
+        cambiar el nombre de categoría de muchos productos rehace cada nivel
+        afectado una sola vez. Si un producto se repite cuenta la última
+        versión.
+        
+        Args:
+            productos: Productos creados o modificados
+            eliminados: IDs de los productos eliminados
+        """
+        salen = {}      # (prefijo, puntos) -> IDs que dejan ese nivel
+        entran = {}     # (prefijo, puntos) -> IDs que entran en ese nivel
+        terminos_categoria = {}
+        productos = {producto.id: producto for producto in productos}.values()
+        
+        for id in eliminados:
+            pesos = self._terminos_por_id.pop(id, None)
+            if pesos is not None:
+                Indice_Busqueda._anotar(salen, Indice_Busqueda._puntos(pesos).items(), id)
+        
+        for producto in productos:
+            anteriores = self._terminos_por_id.get(producto.id)
+            pesos = self._terminos_por_id[producto.id] = Indice_Busqueda._pesos(producto, terminos_categoria)
+            if pesos == anteriores:
+                continue
+            if anteriores is None:
+                Indice_Busqueda._anotar(entran, Indice_Busqueda._puntos(pesos).items(), producto.id)
+            else:
+                # Solo pueden cambiar de nivel los prefijos de los términos que cambiaron
+                cambiados = [t for t in anteriores.keys() | pesos.keys() if anteriores.get(t) != pesos.get(t)]
+                afectados = {termino[:fin] for termino in cambiados for fin in range(1, len(termino) + 1)}
+                previos = Indice_Busqueda._puntos(anteriores, afectados).items()
+                puntos = Indice_Busqueda._puntos(pesos, afectados).items()
+                Indice_Busqueda._anotar(salen, previos - puntos, producto.id)
+                Indice_Busqueda._anotar(entran, puntos - previos, producto.id)
+        
+        for prefijo, puntos in salen.keys() | entran.keys():
+            self._cambiar_nivel(prefijo, puntos, salen.get((prefijo, puntos), ()), entran.get((prefijo, puntos), ()))
+    
+    @staticmethod
+    def _anotar(cambios, claves, id):
+        """Anota un ID en el conjunto de cada nivel (prefijo, puntos)"""
+        for clave in claves:
+            ids = cambios.get(clave)
+            if ids is None:
+                cambios[clave] = {id}
+            else:
+                ids.add(id)
+    
+    def _cambiar_nivel(self, prefijo, puntos, salen, entran):
+        """
+        Quita y añade IDs en un nivel de puntuación de un prefijo
+        
+        Args:
+            prefijo: Prefijo del nivel
+            puntos: Puntuación del nivel
+            salen (set): IDs que dejan el nivel
+            entran (set): IDs que entran en el nivel
+        """
+        niveles = self._prefijos.get(prefijo)
+        if niveles is None:
+            niveles = self._prefijos[prefijo] = {}
+        ids = niveles.get(puntos, [])
+        
+        if len(salen) + len(entran) < Indice_Busqueda.CAMBIOS_POR_NIVEL:
+            for id in salen:
+                posicion = bisect_left(ids, id)
+                if posicion < len(ids) and ids[posicion] == id:
+                    del ids[posicion]
+            for id in entran:
+                insort(ids, id)
+        else:
+            # Ordenar dos tramos ya ordenados es lineal
+            ids = [id for id in ids if id not in salen] if salen else ids
+            ids = ids + sorted(entran)
+            ids.sort()
+        
+        if ids:
+            niveles[puntos] = ids
+        else:
+            niveles.pop(puntos, None)
+            if not niveles:
+                del self._prefijos[prefijo]
+    
+    @staticmethod
+    def _tiene(ids, id):
+        """Comprueba si un ID está en una lista ordenada"""
+        posicion = bisect_left(ids, id)
+        return posicion < len(ids) and ids[posicion] == id
+    
+    @staticmethod
+    def _coincidencias(niveles, combinacion):
+        """
+        Genera en orden los IDs con una puntuación concreta para cada término
+        
+        Args:
+            niveles: Niveles de cada término de la consulta
+            combinacion: Puntuación de cada término
+            
+        Yields:
+            IDs de menor a mayor
+        """
+        listas = [niveles_termino[puntos] for niveles_termino, puntos in zip(niveles, combinacion)]
+        # Se recorre el nivel más corto y se buscan sus IDs en los demás
+        listas.sort(key=len)
+        ids, resto = listas[0], listas[1:]
+        for id in ids:
+            if all(Indice_Busqueda._tiene(otros, id) for otros in resto):
+                yield id
+    
+    def buscar(self, texto, limite=20):
+        """
+        Busca productos que contengan todos los términos de un texto
+        
+        Args:
+            texto: Texto de la consulta
+            limite: Número máximo de resultados
+            
+        Returns:
+            list: IDs de los productos, de mayor a menor puntuación
+        """
+        terminos = list(dict.fromkeys(Indice_Busqueda.tokenizar(texto)))
+        if not terminos or limite <= 0:
+            return []
+        
+        niveles = [self._prefijos.get(termino) for termino in terminos]
+        if not all(niveles):
+            return []
+        puntuaciones = [sorted(niveles_termino, reverse=True) for niveles_termino in niveles]
+        
+        # Combinaciones de niveles, de mayor a menor suma, sin generarlas todas
+        inicial = (0,) * len(puntuaciones)
+        pendientes = [(-sum(puntos[0] for puntos in puntuaciones), inicial)]
+        vistas = {inicial}
+        resultado = []
+        while pendientes:
+            total = pendientes[0][0]
+            combinaciones = []
+            while pendientes and pendientes[0][0] == total:
+                _, posiciones = heapq.heappop(pendientes)
+                combinaciones.append(tuple(puntos[i] for puntos, i in zip(puntuaciones, posiciones)))
+                for termino, i in enumerate(posiciones):
+                    if i + 1 < len(puntuaciones[termino]):
+                        siguiente = posiciones[:termino] + (i + 1,) + posiciones[termino + 1:]
+                        if siguiente not in vistas:
+                            vistas.add(siguiente)
+                            suma = total + puntuaciones[termino][i] - puntuaciones[termino][i + 1]
+                            heapq.heappush(pendientes, (suma, siguiente))
+            
+            # Con la misma puntuación, primero los IDs menores
+            for id in heapq.merge(*(Indice_Busqueda._coincidencias(niveles, c) for c in combinaciones)):
+                resultado.append(id)
+                if len(resultado) == limite:
+                    return resultado
+        return resultado
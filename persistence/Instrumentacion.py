@@ -0,0 +1,189 @@
+"""
+Medición de tiempos por capa y exportación de métricas
+"""
+import os
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+class Instrumentacion:
+    """
+    Histogramas de duración por capa y contadores de almacenamiento
+    
+    Las capas medidas son almacenamiento, repositorio, servicio, plantilla y
+    petición. Con la instrumentación desactivada cada punto de medida se
+    reduce a comprobar ACTIVA antes de llamar a la función original.
+    """
+    
+    # Peticiones más lentas que este umbral (en milisegundos) se registran
+    # en el log con el desglose por capa; 0 lo desactiva
+    UMBRAL_LENTO_MS = float(os.environ.get('RESTAURANTE_UMBRAL_LENTO_MS', '0') or 0)
+    
+    # Activa las mediciones (también se activan si hay umbral de peticiones lentas)
+    ACTIVA = os.environ.get('RESTAURANTE_METRICAS', '') == '1' or UMBRAL_LENTO_MS > 0
+    
+    # Límites superiores de los intervalos de los histogramas, en segundos
+    LIMITES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    # Descripción de los contadores conocidos
+    AYUDA = {
+        'restaurante_almacenamiento_bytes_total': "Bytes leídos o escritos en el almacenamiento",
+        'restaurante_almacenamiento_filas_total': "Registros leídos o escritos en el almacenamiento",
+        'restaurante_peticiones_total': "Peticiones atendidas por ruta y código de estado"
+    }
+    
+    _histogramas = {}   # (capa, operacion) -> [conteo por intervalo..., suma]
+    _contadores = {}    # (nombre, etiquetas) -> valor
+    _lock = threading.Lock()
+    _local = threading.local()  # Desglose por capa de la petición en curso
+    
+    @staticmethod
+    def medido(capa):
+        """
+        Decorador que mide la duración de cada llamada a una función
+        
+        La operación se identifica por el nombre calificado de la función,
+        por ejemplo "Producto_Repositorio.listar_productos".
+        
+        Args:
+            capa: Capa a la que pertenece la función
+            
+        Returns:
+            function: Decorador
+        """
+        def decorador(funcion):
+            operacion = funcion.__qualname__
+            
+            @wraps(funcion)
+            def medida(*args, **kwargs):
+                if not Instrumentacion.ACTIVA:
+                    return funcion(*args, **kwargs)
+                inicio = time.perf_counter()
+                try:
+                    return funcion(*args, **kwargs)
+                finally:
+                    Instrumentacion.observar(capa, operacion, time.perf_counter() - inicio)
+            
+            return medida
+        
+        return decorador
+    
+    @staticmethod
+    def observar(capa, operacion, duracion):
+        """
+        Registra la duración de una operación
+        
+        Args:
+            capa: Capa de la operación
+            operacion: Nombre de la operación
+            duracion: Duración en segundos
+        """
+        indice = bisect_left(Instrumentacion.LIMITES, duracion)
+        clave = (capa, operacion)
+        with Instrumentacion._lock:
+            histograma = Instrumentacion._histogramas.get(clave)
+            if histograma is None:
+                histograma = Instrumentacion._histogramas[clave] = [0] * (len(Instrumentacion.LIMITES) + 1) + [0.0]
+            histograma[indice] += 1
+            histograma[-1] += duracion
+        
+        # Las capas anidadas se solapan: el tiempo de cada capa incluye el de las inferiores
+        desglose = getattr(Instrumentacion._local, 'desglose', None)
+        if desglose is not None:
+            llamadas, total = desglose.get(capa, (0, 0.0))
+            desglose[capa] = (llamadas + 1, total + duracion)
+    
+    @staticmethod
+    def contar(nombre, valor=1, **etiquetas):
+        """
+        Suma un valor a un contador
+        
+        Args:
+            nombre: Nombre de la métrica
+            valor: Cantidad a sumar
+            **etiquetas: Etiquetas de la serie
+        """
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with Instrumentacion._lock:
+            Instrumentacion._contadores[clave] = Instrumentacion._contadores.get(clave, 0) + valor
+    
+    @staticmethod
+    def iniciar_peticion():
+        """Empieza a acumular el desglose por capa de la petición del hilo actual"""
+        Instrumentacion._local.desglose = {}
+    
+    @staticmethod
+    def terminar_peticion():
+        """
+        Deja de acumular el desglose de la petición del hilo actual
+        
+        Returns:
+            dict: capa -> (llamadas, segundos), o None si no se había iniciado
+        """
+        desglose = getattr(Instrumentacion._local, 'desglose', None)
+        Instrumentacion._local.desglose = None
+        return desglose
+    
+    @staticmethod
+    def reiniciar():
+        """Descarta todas las mediciones acumuladas"""
+        with Instrumentacion._lock:
+            Instrumentacion._histogramas.clear()
+            Instrumentacion._contadores.clear()
+    
+    @staticmethod
+    def _etiquetas(pares):
+        """Formatea las etiquetas de una serie en el formato de texto de Prometheus"""
+        if not pares:
+            return ""
+        texto = ",".join(
+            '{}="{}"'.format(nombre, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for nombre, valor in pares
+        )
+        return "{" + texto + "}"
+    
+    @staticmethod
+    def exportar(adicionales=()):
+        """
+        Exporta las métricas en el formato de texto de Prometheus
+        
+        Args:
+            adicionales: Métricas ajenas a la instrumentación, como tuplas
+                (nombre, tipo, ayuda, [(etiquetas, valor), ...])
+                
+        Returns:
+            str: Texto de la exposición
+        """
+        with Instrumentacion._lock:
+            histogramas = {clave: list(valores) for clave, valores in Instrumentacion._histogramas.items()}
+            contadores = dict(Instrumentacion._contadores)
+        
+        etiquetas = Instrumentacion._etiquetas
+        lineas = [
+            "# HELP restaurante_duracion_segundos Duración de las operaciones por capa",
+            "# TYPE restaurante_duracion_segundos histogram"
+        ]
+        for (capa, operacion), valores in sorted(histogramas.items()):
+            pares = (('capa', capa), ('operacion', operacion))
+            acumulado = 0
+            for limite, conteo in zip(Instrumentacion.LIMITES + ('+Inf',), valores):
+                acumulado += conteo
+                lineas.append(f"restaurante_duracion_segundos_bucket{etiquetas(pares + (('le', limite),))} {acumulado}")
+            lineas.append(f"restaurante_duracion_segundos_sum{etiquetas(pares)} {valores[-1]}")
+            lineas.append(f"restaurante_duracion_segundos_count{etiquetas(pares)} {acumulado}")
+        
+        por_nombre = {}
+        for (nombre, pares), valor in contadores.items():
+            por_nombre.setdefault(nombre, []).append((pares, valor))
+        metricas = [(nombre, 'counter', Instrumentacion.AYUDA.get(nombre), series) for nombre, series in sorted(por_nombre.items())]
+        metricas += [(nombre, tipo, ayuda, [(tuple(sorted(e.items())), v) for e, v in series]) for nombre, tipo, ayuda, series in adicionales]
+        
+        for nombre, tipo, ayuda, series in metricas:
+            if ayuda:
+                lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for pares, valor in sorted(series):
+                lineas.append(f"{nombre}{etiquetas(pares)} {valor}")
+        
+        return "\n".join(lineas) + "\n"
@@ -1,7 +1,17 @@
 """
 Repositorio para la persistencia de productos en JSON
 """
+import os
+import threading
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
 from persistence.Conexion import Conexion
+from persistence.Instrumentacion import Instrumentacion
+from persistence.Registro_Cambios import Registro_Cambios
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Indice_Busqueda import Indice_Busqueda
+from persistence.Catalogo_Compartido import Catalogo_Compartido, Vista_Catalogo
 from domain.model.Producto import Producto
 
 class Producto_Repositorio:
@@ -10,7 +20,443 @@ class Producto_Repositorio:
     # Nombre del archivo JSON
     PRODUCTOS_FILE = "productos.json"
     
+    # Si está activo, los productos solo guardan categoria_id y el nombre de
+    # la categoría se resuelve al leer; renombrar una categoría no reescribe
+    # el archivo de productos
+    UNIR_CATEGORIA_AL_LEER = os.environ.get('RESTAURANTE_UNIR_CATEGORIA', '') == '1'
+    
+    # Índices en memoria construidos a partir de la última carga del archivo
+    _datos = None           # Lista cargada (o Vista_Catalogo) de la que provienen los índices
+    _por_id = {}            # id -> Producto, o Producto_Compartido en memoria compartida
+    _por_categoria = {}     # categoria_id -> {id: None}, en orden de inserción
+    _busqueda = None        # Indice_Busqueda, construido con la primera búsqueda
+    _cambios_busqueda = []  # IDs modificados durante cada construcción en curso del índice de búsqueda
+    _por_precio = None      # Lista ordenada de (precio, id), construida bajo demanda
+    _precio_indexado = {}   # id -> precio con el que figura en _por_precio
+    _orden_ids = None       # IDs de _por_id en su orden, para paginar; se descarta al quitar alguno
+    _orden_categoria = {}   # categoria_id -> IDs de _por_categoria[categoria_id] en su orden
+    _max_id = 0
+    _version = 0            # Aumenta con cada recarga o modificación
+    _version_categorias = None  # Versión de categorías con la que se resolvieron los nombres
+    _nombres_categoria = {}     # categoria_id -> nombre resuelto, compartido con las vistas
+    _diario = None          # (inodo, posición) del diario ya aplicado sobre la Vista_Catalogo de _datos
+    _lock = threading.RLock()
+    
+    @staticmethod
+    def _indices():
+        """
+        Obtiene el índice de productos por ID, reconstruyéndolo si el archivo cambió
+        
+        Returns:
+            dict: Diccionario id -> Producto
+        """
+        # Dentro de una transacción los índices ya cargados tienen los cambios pendientes
+        if Conexion.en_transaccion() and Producto_Repositorio._datos is not None:
+            return Producto_Repositorio._por_id
+        
+        data = None
+        if Conexion.MEMORIA_COMPARTIDA_ACTIVA:
+            # Sin vista si algún registro no cabe en la memoria compartida
+            data = Catalogo_Compartido.vista(Producto_Repositorio.PRODUCTOS_FILE)
+        if data is None:
+            data = Conexion.cargar(Producto_Repositorio.PRODUCTOS_FILE)
+        if data is not Producto_Repositorio._datos:
+            with Producto_Repositorio._lock:
+                datos = Producto_Repositorio._datos
+                # Una generación publicada por este proceso a partir de los índices no los cambia
+                if isinstance(data, Vista_Catalogo) and datos is not None and data.origen is datos:
+                    Producto_Repositorio._adoptar(data)
+                elif data is not datos:
+                    Producto_Repositorio._reconstruir_indices(data)
+        
+        # Cambios anexados al diario después de publicar la generación
+        if Producto_Repositorio._diario is not None and not Conexion.escritura_pendiente(Producto_Repositorio.PRODUCTOS_FILE):
+            Producto_Repositorio._aplicar_diario(data)
+        
+        if Producto_Repositorio.UNIR_CATEGORIA_AL_LEER:
+            Producto_Repositorio._unir_categorias()
+        return Producto_Repositorio._por_id
+    
+    @staticmethod
+    def _unir_categorias():
+        """
+        Resuelve el nombre de categoría de los productos si las categorías cambiaron
+        
+        Solo se tocan los productos de las categorías cuyo nombre cambió desde
+        la última resolución, que tras recargar los índices son todas. Los
+        productos sin categoría conocida conservan el nombre que traían del
+        archivo, para seguir leyendo archivos antiguos.
+        """
+        version = Categoria_Repositorio.version()
+        if version == Producto_Repositorio._version_categorias:
+            return
+        
+        # Las categorías se leen antes de tomar el bloqueo de productos
+        nombres = {c.id: c.nombre for c in Categoria_Repositorio.listar_categorias()}
+        with Producto_Repositorio._lock:
+            if version == Producto_Repositorio._version_categorias:
+                return
+            
+            # Las vistas de memoria compartida resuelven el nombre a través de este diccionario
+            resueltos = Producto_Repositorio._nombres_categoria
+            if isinstance(Producto_Repositorio._datos, Vista_Catalogo):
+                Producto_Repositorio._datos.nombres_categoria = resueltos
+            
+            por_id = Producto_Repositorio._por_id
+            modificados = []
+            for categoria_id in resueltos.keys() | nombres.keys():
+                nombre = nombres.get(categoria_id)
+                if resueltos.get(categoria_id) == nombre:
+                    continue
+                if nombre is None:
+                    del resueltos[categoria_id]
+                else:
+                    resueltos[categoria_id] = nombre
+                
+                ids = list(Producto_Repositorio._por_categoria.get(categoria_id, ()))
+                for id in ids:
+                    producto = por_id[id]
+                    if nombre is not None and isinstance(producto, Producto):
+                        producto.nombre_categoria = nombre
+                modificados += ids
+            
+            Producto_Repositorio._actualizar_busqueda(modificados, ())
+            Producto_Repositorio._version_categorias = version
+            if modificados:
+                Producto_Repositorio._version += 1
+    
+    @staticmethod
+    def _reconstruir_indices(data):
+        """
+        Reconstruye los índices en memoria a partir de los datos cargados
+        
+        Args:
+            data: Lista de diccionarios leída del archivo JSON, o
+                Vista_Catalogo, cuyos productos se indexan sin copiarlos
+        """
+        por_id = {}
+        por_categoria = {}
+        
+        if isinstance(data, Vista_Catalogo):
+            entradas = data.entradas()
+        else:
+            entradas = ((producto, producto.id, producto.categoria_id) for producto in Producto.from_rows(data))
+        
+        for producto, id, categoria_id in entradas:
+            por_id[id] = producto
+            por_categoria.setdefault(categoria_id, {})[id] = None
+        
+        Producto_Repositorio._por_id = por_id
+        Producto_Repositorio._por_categoria = por_categoria
+        Producto_Repositorio._busqueda = None
+        Producto_Repositorio._por_precio = None
+        Producto_Repositorio._descartar_orden()
+        Producto_Repositorio._max_id = max(por_id) if por_id else 0
+        Producto_Repositorio._datos = data
+        Producto_Repositorio._diario = Producto_Repositorio._posicion_diario(data)
+        Producto_Repositorio._version_categorias = None
+        Producto_Repositorio._nombres_categoria = {}
+        Producto_Repositorio._version += 1
+    
+    @staticmethod
+    def _posicion_diario(data):
+        """
+        Obtiene hasta dónde incluye el diario una generación de memoria compartida
+        
+        Args:
+            data: Datos de los que provienen los índices
+            
+        Returns:
+            tuple: (inodo, posición) del diario al publicarla, o None si los
+            datos no son una Vista_Catalogo de un archivo JSON
+        """
+        if not isinstance(data, Vista_Catalogo) or data.firma is None:
+            return None
+        firma_journal = data.firma[1]
+        return (None, 0) if firma_journal is None else (firma_journal[2], firma_journal[1])
+    
+    @staticmethod
+    def _adoptar(vista):
+        """
+        Pasa a leer de una generación con el mismo contenido que los índices
+        
+        Los índices se conservan tal cual, con los de búsqueda y precio.
+        Debe llamarse con el bloqueo del repositorio tomado.
+        
+        Args:
+            vista: Vista_Catalogo publicada a partir de los índices
+        """
+        vista.nombres_categoria = Producto_Repositorio._nombres_categoria
+        Producto_Repositorio._datos = vista
+        Producto_Repositorio._diario = Producto_Repositorio._posicion_diario(vista)
+    
+    @staticmethod
+    def _aplicar_diario(vista):
+        """
+        Aplica sobre los índices los cambios anexados al diario
+        
+        La generación de memoria compartida solo se publica de nuevo al
+        compactar; los cambios registrados desde entonces, por este o por
+        otros procesos, se leen del diario y se aplican como las escrituras
+        propias. Los que ya figuran en los índices se omiten.
+        
+        Args:
+            vista: Vista_Catalogo de la que provienen los índices
+        """
+        inodo, posicion = Producto_Repositorio._diario
+        leido = Conexion.leer_diario(Producto_Repositorio.PRODUCTOS_FILE, inodo, posicion)
+        # Un diario reemplazado acompaña a un archivo nuevo, que la siguiente lectura publica
+        if leido is None or (leido[1], leido[2]) == (inodo, posicion):
+            return
+        
+        with Producto_Repositorio._lock:
+            if Producto_Repositorio._datos is not vista or Producto_Repositorio._diario != (inodo, posicion):
+                return
+            por_id = Producto_Repositorio._por_id
+            por_categoria = Producto_Repositorio._por_categoria
+            nombres = Producto_Repositorio._nombres_categoria
+            modificados = {}
+            eliminados = {}
+            
+            for cambio in leido[0]:
+                if cambio.get('op') == 'delete':
+                    producto = por_id.pop(cambio.get('id'), None)
+                    if producto is not None:
+                        por_categoria.get(producto.categoria_id, {}).pop(producto.id, None)
+                        Producto_Repositorio._descartar_orden()
+                        eliminados[producto.id] = None
+                    continue
+                
+                registro = cambio.get('datos', {})
+                anterior = por_id.get(registro.get('id'))
+                if anterior is not None and Producto_Repositorio._serializar(anterior) == registro:
+                    continue
+                producto = Producto.from_dict(registro)
+                if producto.categoria_id in nombres:
+                    producto.nombre_categoria = nombres[producto.categoria_id]
+                if anterior is not None and anterior.categoria_id != producto.categoria_id:
+                    por_categoria.get(anterior.categoria_id, {}).pop(producto.id, None)
+                    Producto_Repositorio._orden_categoria.pop(anterior.categoria_id, None)
+                por_categoria.setdefault(producto.categoria_id, {})[producto.id] = None
+                por_id[producto.id] = producto
+                modificados[producto.id] = None
+            
+            Producto_Repositorio._diario = (leido[1], leido[2])
+            modificados = [id for id in modificados if id in por_id]
+            eliminados = [id for id in eliminados if id not in por_id]
+            if not modificados and not eliminados:
+                return
+            
+            if modificados:
+                Producto_Repositorio._max_id = max(Producto_Repositorio._max_id, max(modificados))
+            if Producto_Repositorio._max_id in eliminados:
+                Producto_Repositorio._max_id = max(por_id) if por_id else 0
+            Producto_Repositorio._version += 1
+            Producto_Repositorio._actualizar_indices_secundarios(modificados, eliminados)
+    
+    @staticmethod
+    def _editable(id):
+        """
+        Obtiene un producto que se puede modificar
+        
+        Las vistas de memoria compartida son de solo lectura: se sustituyen
+        en el índice por una copia antes de modificarlas. Debe llamarse con
+        el bloqueo del repositorio tomado.
+        
+        Args:
+            id: ID del producto
+            
+        Returns:
+            Producto: Objeto Producto o None si no existe
+        """
+        productos = Producto_Repositorio._por_id
+        producto = productos.get(id)
+        if producto is not None and not isinstance(producto, Producto):
+            producto = productos[id] = Producto.from_dict(producto.to_dict())
+        return producto
+    
+    @staticmethod
+    def _serializar(producto):
+        """
+        Convierte un producto al diccionario que se guarda
+        
+        Args:
+            producto: Objeto Producto
+            
+        Returns:
+            dict: Registro del producto, sin nombre de categoría si este se
+            resuelve al leer
+        """
+        datos = producto.to_dict()
+        if Producto_Repositorio.UNIR_CATEGORIA_AL_LEER:
+            del datos['nombre_categoria']
+        return datos
+    
     @staticmethod
+    def _volcar_indices():
+        """
+        Serializa el contenido actual de los índices
+        
+        Los registros obtenidos pasan a ser el origen de los índices, ya que son
+        los que se guardan.
+        
+        Returns:
+            list: Registros como diccionarios
+        """
+        # Con la escritura diferida se llama desde el hilo de fondo
+        with Producto_Repositorio._lock:
+            data = [Producto_Repositorio._serializar(prod) for prod in Producto_Repositorio._por_id.values()]
+            Producto_Repositorio._datos = data
+        return data
+    
+    @staticmethod
+    def _guardar_indices():
+        """
+        Persiste el contenido actual de los índices
+        
+        Dentro de una transacción la serialización se aplaza hasta confirmarla.
+        
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        if Conexion.guardar_diferido(Producto_Repositorio.PRODUCTOS_FILE, Producto_Repositorio._volcar_indices):
+            return True
+        
+        # Forzar la recarga desde el archivo en la siguiente lectura
+        Producto_Repositorio._datos = None
+        return False
+    
+    @staticmethod
+    def _actualizar_indices_secundarios(modificados, eliminados):
+        """
+        Refleja cambios en los índices que se construyen bajo demanda
+        
+        Args:
+            modificados: IDs creados o actualizados
+            eliminados: IDs eliminados
+        """
+        Producto_Repositorio._actualizar_busqueda(modificados, eliminados)
+        
+        por_precio = Producto_Repositorio._por_precio
+        if por_precio is not None:
+            precio_indexado = Producto_Repositorio._precio_indexado
+            for id in list(eliminados) + list(modificados):
+                if id in precio_indexado:
+                    del por_precio[bisect_left(por_precio, (precio_indexado.pop(id), id))]
+            for id in modificados:
+                precio = Producto_Repositorio._por_id[id].precio
+                insort(por_precio, (precio, id))
+                precio_indexado[id] = precio
+    
+    @staticmethod
+    def _actualizar_busqueda(modificados, eliminados):
+        """
+        Refleja cambios en el índice de búsqueda, construido o en construcción
+        
+        Args:
+            modificados: IDs creados o actualizados
+            eliminados: IDs eliminados
+        """
+        for cambios in Producto_Repositorio._cambios_busqueda:
+            cambios.update(eliminados)
+            cambios.update(modificados)
+        
+        busqueda = Producto_Repositorio._busqueda
+        if busqueda is not None:
+            por_id = Producto_Repositorio._por_id
+            busqueda.actualizar_lote([por_id[id] for id in modificados], eliminados)
+    
+    @staticmethod
+    def _persistir(modificados=(), eliminados=()):
+        """
+        Persiste los cambios hechos sobre los índices
+        
+        Los cambios se anotan en el registro de cambios, que se escribe junto
+        con la colección.
+        
+        Args:
+            modificados: IDs creados o actualizados
+            eliminados: IDs eliminados
+            
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        Producto_Repositorio._version += 1
+        Producto_Repositorio._actualizar_indices_secundarios(modificados, eliminados)
+        escribir = lambda: Producto_Repositorio._escribir(modificados, eliminados)
+        publicada = Catalogo_Compartido.publicada(Producto_Repositorio.PRODUCTOS_FILE)
+        if Registro_Cambios.persistir('productos', modificados, eliminados, escribir):
+            # Con SQLite la escritura publica el catálogo leído de la base de
+            # datos, que ya tiene el contenido de los índices
+            nueva = Catalogo_Compartido.publicada(Producto_Repositorio.PRODUCTOS_FILE)
+            if nueva is not publicada and nueva is not None and nueva.origen is not None:
+                Producto_Repositorio._datos = nueva.origen
+            return True
+        
+        # Forzar la recarga desde el archivo en la siguiente lectura
+        Producto_Repositorio._datos = None
+        return False
+    
+    @staticmethod
+    def _escribir(modificados, eliminados):
+        """
+        Escribe en el almacenamiento los registros afectados por un cambio
+        
+        Si el backend admite escrituras por registro solo se guardan los
+        registros afectados; en otro caso se reescribe el archivo completo.
+        
+        Args:
+            modificados: IDs creados o actualizados
+            eliminados: IDs eliminados
+            
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        if not Conexion.escritura_por_registro():
+            return Producto_Repositorio._guardar_indices()
+        
+        por_id = Producto_Repositorio._por_id
+        cambios = [{'op': 'upsert', 'datos': Producto_Repositorio._serializar(por_id[id])} for id in modificados]
+        cambios += [{'op': 'delete', 'id': id} for id in eliminados]
+        return Conexion.registrar(Producto_Repositorio.PRODUCTOS_FILE, cambios)
+    
+    @staticmethod
+    @contextmanager
+    def bloqueo():
+        """
+        Bloqueo exclusivo de la colección, entre procesos y entre hilos
+        
+        Mientras se tiene, ningún otro hilo modifica ni reconstruye los índices.
+        Al tomarlo se comprueba que los índices estén al día con el almacenamiento.
+        """
+        with Conexion.bloqueo_exclusivo(Producto_Repositorio.PRODUCTOS_FILE), Producto_Repositorio._lock:
+            Producto_Repositorio._indices()
+            yield
+    
+    @staticmethod
+    def descartar_cambios():
+        """
+        Descarta los índices en memoria, con los cambios que no se hayan guardado
+        
+        La siguiente lectura los reconstruye desde el almacenamiento.
+        """
+        with Producto_Repositorio._lock:
+            Producto_Repositorio._datos = None
+    
+    @staticmethod
+    def version():
+        """
+        Obtiene la versión de los datos en memoria
+        
+        Returns:
+            int: Número que cambia cada vez que los productos se modifican o se
+            recargan desde el almacenamiento
+        """
+        Producto_Repositorio._indices()
+        return Producto_Repositorio._version
+    
+    @staticmethod
+    @Instrumentacion.medido('repositorio')
     def listar_productos():
         """
         Carga los productos desde el archivo JSON
@@ -18,10 +464,10 @@ class Producto_Repositorio:
         Returns:
             list: Lista de objetos Producto
         """
-        data = Conexion.load_json(Producto_Repositorio.PRODUCTOS_FILE)
-        return [Producto.from_dict(prod_data) for prod_data in data]
+        return list(Producto_Repositorio._indices().values())
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def guardar_productos(productos):
         """
         Guarda los productos en el archivo JSON
@@ -32,8 +478,8 @@ class Producto_Repositorio:
         Returns:
             bool: True si se guardó correctamente
         """
-        data = [prod.to_dict() for prod in productos]
-        return Conexion.save_json(Producto_Repositorio.PRODUCTOS_FILE, data)
+        data = [Producto_Repositorio._serializar(prod) for prod in productos]
+        return Conexion.guardar(Producto_Repositorio.PRODUCTOS_FILE, data)
     
     @staticmethod
     def obtener_siguiente_id():
@@ -43,12 +489,11 @@ class Producto_Repositorio:
         Returns:
             int: Siguiente ID
         """
-        productos = Producto_Repositorio.listar_productos()
-        if not productos:
-            return 1
-        return max(prod.id for prod in productos) + 1
+        Producto_Repositorio._indices()
+        return Producto_Repositorio._max_id + 1
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def buscar_por_id(id):
         """
         Busca un producto por su ID
@@ -59,13 +504,10 @@ class Producto_Repositorio:
         Returns:
             Producto: Objeto Producto o None
         """
-        productos = Producto_Repositorio.listar_productos()
-        for producto in productos:
-            if producto.id == id:
-                return producto
-        return None
+        return Producto_Repositorio._indices().get(id)
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def crear(nombre, descripcion, precio, categoria_id, nombre_categoria):
         """
         Crea un nuevo producto
@@ -78,30 +520,69 @@ class Producto_Repositorio:
             nombre_categoria: Nombre de la categoría
             
         Returns:
-            int: ID del producto creado
+            int: ID del producto creado, o -1 si no se pudo guardar
         """
-        productos = Producto_Repositorio.listar_productos()
-        
-        # Generar nuevo ID
-        nuevo_id = Producto_Repositorio.obtener_siguiente_id()
-        
-        # Crear nuevo producto
-        nuevo_producto = Producto(
-            nuevo_id, 
-            nombre, 
-            descripcion, 
-            precio, 
-            categoria_id, 
-            nombre_categoria
-        )
-        productos.append(nuevo_producto)
-        
-        # Guardar cambios
-        Producto_Repositorio.guardar_productos(productos)
+        with Conexion.bloqueo_exclusivo(Producto_Repositorio.PRODUCTOS_FILE), Producto_Repositorio._lock:
+            productos = Producto_Repositorio._indices()
+            
+            # Generar nuevo ID
+            nuevo_id = Producto_Repositorio._max_id + 1
+            
+            # Crear nuevo producto
+            nuevo_producto = Producto(
+                nuevo_id,
+                nombre,
+                descripcion,
+                precio,
+                categoria_id,
+                nombre_categoria
+            )
+            productos[nuevo_id] = nuevo_producto
+            Producto_Repositorio._por_categoria.setdefault(categoria_id, {})[nuevo_id] = None
+            Producto_Repositorio._max_id = nuevo_id
+            
+            # Guardar cambios
+            if not Producto_Repositorio._persistir(modificados=[nuevo_id]):
+                return -1
+            
+            return nuevo_id
+    
+    @staticmethod
+    @Instrumentacion.medido('repositorio')
+    def crear_lote(productos):
+        """
+        Crea varios productos con una sola escritura
         
-        return nuevo_id
+        Args:
+            productos (list): Tuplas (nombre, descripcion, precio, categoria_id,
+                nombre_categoria)
+                
+        Returns:
+            list: IDs asignados, en el mismo orden, o lista vacía si falló
+        """
+        with Conexion.bloqueo_exclusivo(Producto_Repositorio.PRODUCTOS_FILE), Producto_Repositorio._lock:
+            indices = Producto_Repositorio._indices()
+            por_categoria = Producto_Repositorio._por_categoria
+            ids = []
+            
+            # Los IDs se asignan en un bloque consecutivo
+            for nuevo_id, datos in enumerate(productos, Producto_Repositorio._max_id + 1):
+                nuevo_producto = Producto(nuevo_id, *datos)
+                indices[nuevo_id] = nuevo_producto
+                por_categoria.setdefault(nuevo_producto.categoria_id, {})[nuevo_id] = None
+                ids.append(nuevo_id)
+            
+            if not ids:
+                return ids
+            
+            Producto_Repositorio._max_id = ids[-1]
+            if not Producto_Repositorio._persistir(modificados=ids):
+                return []
+            
+            return ids
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def actualizar(id, nombre, descripcion, precio, categoria_id, nombre_categoria):
         """
         Actualiza un producto
@@ -117,20 +598,27 @@ class Producto_Repositorio:
         Returns:
             bool: True si se actualizó correctamente
         """
-        productos = Producto_Repositorio.listar_productos()
-        
-        for i, producto in enumerate(productos):
-            if producto.id == id:
-                productos[i].nombre = nombre
-                productos[i].descripcion = descripcion
-                productos[i].precio = precio
-                productos[i].categoria_id = categoria_id
-                productos[i].nombre_categoria = nombre_categoria
-                return Producto_Repositorio.guardar_productos(productos)
-        
-        return False
+        with Conexion.bloqueo_exclusivo(Producto_Repositorio.PRODUCTOS_FILE), Producto_Repositorio._lock:
+            Producto_Repositorio._indices()
+            producto = Producto_Repositorio._editable(id)
+            if producto is None:
+                return False
+            
+            if producto.categoria_id != categoria_id:
+                por_categoria = Producto_Repositorio._por_categoria
+                por_categoria.get(producto.categoria_id, {}).pop(id, None)
+                por_categoria.setdefault(categoria_id, {})[id] = None
+                Producto_Repositorio._orden_categoria.pop(producto.categoria_id, None)
+            
+            producto.nombre = nombre
+            producto.descripcion = descripcion
+            producto.precio = precio
+            producto.categoria_id = categoria_id
+            producto.nombre_categoria = nombre_categoria
+            return Producto_Repositorio._persistir(modificados=[id])
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def eliminar(id):
         """
         Elimina un producto
@@ -141,15 +629,21 @@ class Producto_Repositorio:
         Returns:
             bool: True si se eliminó correctamente
         """
-        productos = Producto_Repositorio.listar_productos()
-        productos_filtrados = [p for p in productos if p.id != id]
-        
-        if len(productos_filtrados) < len(productos):
-            return Producto_Repositorio.guardar_productos(productos_filtrados)
-        
-        return False
+        with Conexion.bloqueo_exclusivo(Producto_Repositorio.PRODUCTOS_FILE), Producto_Repositorio._lock:
+            productos = Producto_Repositorio._indices()
+            producto = productos.pop(id, None)
+            if producto is None:
+                return False
+            
+            Producto_Repositorio._por_categoria.get(producto.categoria_id, {}).pop(id, None)
+            Producto_Repositorio._descartar_orden()
+            if id == Producto_Repositorio._max_id:
+                Producto_Repositorio._max_id = max(productos) if productos else 0
+            
+            return Producto_Repositorio._persistir(eliminados=[id])
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
     def listar_por_categoria(categoria_id):
         """
         Lista productos de una categoría específica
@@ -160,14 +654,208 @@ class Producto_Repositorio:
         Returns:
             list: Lista de productos de esa categoría
         """
-        productos = Producto_Repositorio.listar_productos()
-        return [p for p in productos if p.categoria_id == categoria_id]
+        productos = Producto_Repositorio._indices()
+        ids = Producto_Repositorio._por_categoria.get(categoria_id, {})
+        return [productos[id] for id in list(ids)]
     
     @staticmethod
+    @Instrumentacion.medido('repositorio')
+    def contar_por_categoria(categoria_id):
+        """
+        Cuenta los productos de una categoría
+        
+        Args:
+            categoria_id: ID de la categoría
+            
+        Returns:
+            int: Número de productos de esa categoría
+        """
+        Producto_Repositorio._indices()
+        return len(Producto_Repositorio._por_categoria.get(categoria_id, ()))
+    
+    @staticmethod
+    @Instrumentacion.medido('repositorio')
+    def conteos_por_categoria():
+        """
+        Cuenta los productos de cada categoría
+        
+        Returns:
+            dict: Diccionario categoria_id -> número de productos, solo con
+            las categorías que tienen alguno
+        """
+        Producto_Repositorio._indices()
+        with Producto_Repositorio._lock:
+            por_categoria = Producto_Repositorio._por_categoria
+            return {categoria_id: len(ids) for categoria_id, ids in por_categoria.items() if ids}
+    
+    @staticmethod
+    @Instrumentacion.medido('repositorio')
+    def listar_pagina(desplazamiento=0, limite=None, categoria_id=None):
+        """
+        Lista una página de productos sin construir la lista completa
+        
+        Args:
+            desplazamiento: Número de productos a omitir
+            limite: Número máximo de productos a devolver (None para todos)
+            categoria_id: ID de la categoría para filtrar (opcional)
+            
+        Returns:
+            tuple: (lista de productos de la página, total de productos)
+        """
+        Producto_Repositorio._indices()
+        with Producto_Repositorio._lock:
+            productos = Producto_Repositorio._por_id
+            ids = Producto_Repositorio._orden(categoria_id)
+            fin = None if limite is None else desplazamiento + limite
+            return [productos[id] for id in ids[desplazamiento:fin]], len(ids)
+    
+    @staticmethod
+    def _orden(categoria_id=None):
+        """
+        Obtiene los IDs de los productos, o de los de una categoría, en el orden de los índices
+        
+        La lista se construye con la primera página que la necesita y después
+        solo se completa con los productos añadidos al final; quitar un
+        producto de un índice la descarta. Debe llamarse con el bloqueo del
+        repositorio tomado.
+        
+        Args:
+            categoria_id: ID de la categoría (opcional)
+            
+        Returns:
+            list: IDs en el mismo orden que el índice
+        """
+        if categoria_id is None:
+            origen = Producto_Repositorio._por_id
+            ids = Producto_Repositorio._orden_ids
+        else:
+            origen = Producto_Repositorio._por_categoria.get(categoria_id, {})
+            ids = Producto_Repositorio._orden_categoria.get(categoria_id)
+        
+        if ids is None:
+            ids = list(origen)
+            if categoria_id is None:
+                Producto_Repositorio._orden_ids = ids
+            else:
+                Producto_Repositorio._orden_categoria[categoria_id] = ids
+        elif len(ids) < len(origen):
+            nuevos = list(islice(reversed(origen), len(origen) - len(ids)))
+            nuevos.reverse()
+            ids += nuevos
+        return ids
+    
+    @staticmethod
+    def _descartar_orden():
+        """Descarta las listas de IDs para paginar tras quitar productos de los índices"""
+        Producto_Repositorio._orden_ids = None
+        Producto_Repositorio._orden_categoria = {}
+    
+    @staticmethod
+    def _indice_precios():
+        """
+        Obtiene el índice ordenado por precio, construyéndolo si hace falta
+        
+        Debe llamarse con el bloqueo del repositorio tomado.
+        
+        Returns:
+            list: Lista ordenada de tuplas (precio, id)
+        """
+        if Producto_Repositorio._por_precio is None:
+            precios = {id: p.precio for id, p in Producto_Repositorio._por_id.items()}
+            Producto_Repositorio._precio_indexado = precios
+            Producto_Repositorio._por_precio = sorted((precio, id) for id, precio in precios.items())
+        return Producto_Repositorio._por_precio
+    
+    @staticmethod
+    @Instrumentacion.medido('repositorio')
+    def listar_por_rango_precio(minimo=None, maximo=None, categoria_id=None, orden='asc'):
+        """
+        Lista productos dentro de un rango de precios, ordenados por precio
+        
+        Args:
+            minimo: Precio mínimo, inclusive (opcional)
+            maximo: Precio máximo, inclusive (opcional)
+            categoria_id: ID de la categoría para filtrar (opcional)
+            orden: "asc" o "desc"
+            
+        Returns:
+            list: Lista de productos ordenada por precio y, a igual precio, por ID
+        """
+        Producto_Repositorio._indices()
+        with Producto_Repositorio._lock:
+            por_precio = Producto_Repositorio._indice_precios()
+            inicio = 0 if minimo is None else bisect_left(por_precio, (minimo,))
+            fin = len(por_precio) if maximo is None else bisect_right(por_precio, (maximo, float('inf')))
+            rango = por_precio[inicio:fin]
+            productos = Producto_Repositorio._por_id
+        
+        if orden == 'desc':
+            rango.reverse()
+        
+        if categoria_id is None:
+            return [productos[id] for _, id in rango]
+        return [productos[id] for _, id in rango if productos[id].categoria_id == categoria_id]
+    
+    @staticmethod
+    @Instrumentacion.medido('repositorio')
+    def buscar(texto, limite=20):
+        """
+        Busca productos por texto en nombre, descripción y categoría
+        
+        Args:
+            texto: Texto a buscar; cada palabra se compara como prefijo
+            limite: Número máximo de resultados
+            
+        Returns:
+            list: Lista de productos, de más a menos relevante
+        """
+        while True:
+            Producto_Repositorio._indices()
+            with Producto_Repositorio._lock:
+                busqueda = Producto_Repositorio._busqueda
+                if busqueda is not None:
+                    productos = Producto_Repositorio._por_id
+                    return [productos[id] for id in busqueda.buscar(texto, limite)]
+            Producto_Repositorio._construir_busqueda()
+    
+    @staticmethod
+    def _construir_busqueda():
+        """
+        Construye el índice de búsqueda sin retener el bloqueo del repositorio
+        
+        Se indexa una copia de la lista de productos y, al terminar, se
+        vuelven a indexar los que cambiaron entretanto. Si los índices se
+        recargaron mientras tanto, el índice construido se descarta.
+        """
+        cambios = set()
+        with Producto_Repositorio._lock:
+            if Producto_Repositorio._busqueda is not None:
+                return
+            por_id = Producto_Repositorio._por_id
+            productos = list(por_id.values())
+            Producto_Repositorio._cambios_busqueda.append(cambios)
+        
+        try:
+            busqueda = Indice_Busqueda(productos)
+        finally:
+            with Producto_Repositorio._lock:
+                Producto_Repositorio._cambios_busqueda.remove(cambios)
+        
+        with Producto_Repositorio._lock:
+            if Producto_Repositorio._busqueda is not None or Producto_Repositorio._por_id is not por_id:
+                return
+            busqueda.actualizar_lote([por_id[id] for id in cambios if id in por_id], [id for id in cambios if id not in por_id])
+            Producto_Repositorio._busqueda = busqueda
+    
+    @staticmethod
+    @Instrumentacion.medido('repositorio')
     def actualizar_nombre_categoria(categoria_id, nuevo_nombre):
         """
         Actualiza el nombre de la categoría en todos los productos que pertenecen a ella
         
+        Si el nombre se resuelve al leer no hay nada que escribir: los
+        productos toman el nuevo nombre en la siguiente lectura.
+        
         Args:
             categoria_id: ID de la categoría
             nuevo_nombre: Nuevo nombre de la categoría
@@ -175,15 +863,17 @@ class Producto_Repositorio:
         Returns:
             bool: True si se actualizó correctamente
         """
-        productos = Producto_Repositorio.listar_productos()
-        modificado = False
-        
-        for producto in productos:
-            if producto.categoria_id == categoria_id:
-                producto.nombre_categoria = nuevo_nombre
-                modificado = True
-        
-        if modificado:
-            return Producto_Repositorio.guardar_productos(productos)
+        if Producto_Repositorio.UNIR_CATEGORIA_AL_LEER:
+            return True
         
-        return True  # No había productos que actualizar
+        with Conexion.bloqueo_exclusivo(Producto_Repositorio.PRODUCTOS_FILE), Producto_Repositorio._lock:
+            Producto_Repositorio._indices()
+            ids = list(Producto_Repositorio._por_categoria.get(categoria_id, {}))
+            
+            for id in ids:
+                Producto_Repositorio._editable(id).nombre_categoria = nuevo_nombre
+            
+            if ids:
+                return Producto_Repositorio._persistir(modificados=ids)
+            
+            return True  # No había productos que actualizar
@@ -0,0 +1,245 @@
+"""
+Registro de cambios de las colecciones, para la sincronización incremental
+"""
+import os
+import threading
+from contextlib import contextmanager
+from persistence.Conexion import Conexion
+
+class Registro_Cambios:
+    """
+    Registro acotado de las creaciones, actualizaciones y eliminaciones
+    
+    Cada cambio de un registro de una colección recibe una versión de una
+    secuencia global y creciente, y se guarda como un registro más en
+    "cambios.json" (o en la tabla "cambios" con SQLite): {"id": versión,
+    "coleccion": ..., "op": "upsert" | "delete", "registro": id}. La versión
+    de una colección es la de su último cambio. Se conservan los LIMITE
+    cambios más recientes y, aunque sea más antiguo, el último de cada
+    colección, para no perder su versión.
+    
+    Los cambios se escriben siempre por registros: con JSON se anexan al
+    diario de "cambios.json" aunque el modo diario no esté activo para las
+    colecciones, en lugar de reescribir el registro completo en cada escritura.
+    """
+    
+    # Nombre del archivo JSON
+    CAMBIOS_FILE = "cambios.json"
+    
+    # Número de cambios que se conservan
+    LIMITE = int(os.environ.get('RESTAURANTE_LIMITE_CAMBIOS', '1000'))
+    
+    # Registro en memoria construido a partir de la última carga del archivo
+    _datos = None           # Lista cargada de la que proviene el registro
+    _entradas = []          # Cambios en orden de versión
+    _lock = threading.RLock()
+    
+    # Funciones a las que se avisa después de confirmar cambios
+    _observadores = []
+    
+    @staticmethod
+    def _indices():
+        """
+        Obtiene los cambios, recargándolos si el archivo cambió
+        
+        Returns:
+            list: Cambios en orden de versión
+        """
+        # Dentro de una transacción los cambios ya cargados incluyen los pendientes
+        if Conexion.en_transaccion() and Registro_Cambios._datos is not None:
+            return Registro_Cambios._entradas
+        
+        data = Conexion.cargar(Registro_Cambios.CAMBIOS_FILE)
+        if data is not Registro_Cambios._datos:
+            with Registro_Cambios._lock:
+                if data is not Registro_Cambios._datos:
+                    Registro_Cambios._entradas = sorted(data, key=lambda cambio: cambio.get('id', 0))
+                    Registro_Cambios._datos = data
+        return Registro_Cambios._entradas
+    
+    @staticmethod
+    @contextmanager
+    def bloqueo():
+        """
+        Bloqueo exclusivo del registro, entre procesos y entre hilos
+        
+        Al tomarlo se comprueba que el registro esté al día con el almacenamiento.
+        """
+        with Conexion.bloqueo_exclusivo(Registro_Cambios.CAMBIOS_FILE), Registro_Cambios._lock:
+            Registro_Cambios._indices()
+            yield
+    
+    @staticmethod
+    def descartar_cambios():
+        """
+        Descarta el registro en memoria, con los cambios que no se hayan guardado
+        
+        La siguiente lectura lo reconstruye desde el almacenamiento.
+        """
+        with Registro_Cambios._lock:
+            Registro_Cambios._datos = None
+    
+    @staticmethod
+    def _anotar(coleccion, modificados, eliminados):
+        """
+        Añade cambios al registro en memoria y los persiste
+        
+        Debe llamarse con el bloqueo del registro tomado.
+        
+        Args:
+            coleccion: Nombre de la colección
+            modificados: IDs creados o actualizados
+            eliminados: IDs eliminados
+            
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        entradas = Registro_Cambios._indices()
+        version = entradas[-1]['id'] if entradas else 0
+        nuevas = []
+        for op, ids in (('upsert', modificados), ('delete', eliminados)):
+            for id in ids:
+                version += 1
+                nuevas.append({'id': version, 'coleccion': coleccion, 'op': op, 'registro': id})
+        entradas.extend(nuevas)
+        
+        # Los cambios más antiguos salen del registro, salvo el último de cada colección
+        eliminadas = []
+        exceso = len(entradas) - Registro_Cambios.LIMITE
+        if exceso > 0:
+            ultimas = {cambio['coleccion']: cambio['id'] for cambio in entradas}
+            conservadas = set(ultimas.values())
+            antiguas = entradas[:exceso]
+            eliminadas = [cambio['id'] for cambio in antiguas if cambio['id'] not in conservadas]
+            entradas[:exceso] = [cambio for cambio in antiguas if cambio['id'] in conservadas]
+        
+        cambios = [{'op': 'upsert', 'datos': cambio} for cambio in nuevas]
+        cambios += [{'op': 'delete', 'id': id} for id in eliminadas]
+        return Conexion.registrar(Registro_Cambios.CAMBIOS_FILE, cambios)
+    
+    @staticmethod
+    def persistir(coleccion, modificados, eliminados, escribir):
+        """
+        Escribe los cambios de una colección junto con su anotación en el registro
+        
+        Ambas escrituras se confirman juntas: dentro de una transacción
+        abierta pasan a formar parte de ella y, si no, se abre una solo para
+        ellas.
+        
+        Args:
+            coleccion: Nombre de la colección
+            modificados: IDs creados o actualizados
+            eliminados: IDs eliminados
+            escribir: Función sin argumentos que escribe la colección y
+                devuelve True si se escribió correctamente
+                
+        Returns:
+            bool: True si se escribieron la colección y el registro
+        """
+        with Registro_Cambios.bloqueo():
+            propia = Conexion.iniciar_transaccion()
+            try:
+                correcto = escribir() and Registro_Cambios._anotar(coleccion, modificados, eliminados)
+            except BaseException:
+                if propia:
+                    Conexion.descartar_transaccion()
+                    Registro_Cambios.descartar_cambios()
+                raise
+            
+            if not propia:
+                return correcto
+            if correcto and Conexion.confirmar_transaccion():
+                Registro_Cambios.avisar()
+                return True
+            
+            Conexion.descartar_transaccion()
+            Registro_Cambios.descartar_cambios()
+            return False
+    
+    @staticmethod
+    def observar(funcion):
+        """
+        Registra una función a la que avisar cada vez que se confirman cambios
+        
+        Se llama desde el hilo que hizo los cambios, a veces con los bloqueos
+        de las colecciones aún tomados, así que debe volver enseguida.
+        
+        Args:
+            funcion: Función sin argumentos
+        """
+        if funcion not in Registro_Cambios._observadores:
+            Registro_Cambios._observadores.append(funcion)
+    
+    @staticmethod
+    def avisar():
+        """Avisa a los observadores de que hay cambios confirmados en el registro"""
+        for funcion in list(Registro_Cambios._observadores):
+            try:
+                funcion()
+            except Exception as e:
+                print(f"Error al avisar de cambios: {e}")
+    
+    @staticmethod
+    def _confirmados():
+        """
+        Obtiene una copia de los cambios confirmados
+        
+        Si otro hilo está anotando cambios espera a que los confirme o los
+        descarte. La carga se hace sin el bloqueo del registro tomado, como
+        en los repositorios, porque leer el diario requiere el bloqueo del
+        archivo.
+        
+        Returns:
+            list: Cambios en orden de versión
+        """
+        while True:
+            Registro_Cambios._indices()
+            with Registro_Cambios._lock:
+                if Registro_Cambios._datos is not None:
+                    return list(Registro_Cambios._entradas)
+    
+    @staticmethod
+    def version(coleccion=None):
+        """
+        Obtiene la versión del registro o de una colección
+        
+        Args:
+            coleccion: Nombre de la colección (opcional)
+            
+        Returns:
+            int: Versión del último cambio, de la colección si se indica, o 0
+            si no hay ninguno
+        """
+        entradas = Registro_Cambios._confirmados()
+        if coleccion is None:
+            return entradas[-1]['id'] if entradas else 0
+        for cambio in reversed(entradas):
+            if cambio['coleccion'] == coleccion:
+                return cambio['id']
+        return 0
+    
+    @staticmethod
+    def cambios_desde(version):
+        """
+        Obtiene los cambios posteriores a una versión
+        
+        Args:
+            version: Última versión que conoce quien pregunta
+            
+        Returns:
+            tuple: (versión actual, lista de cambios posteriores en orden de
+            versión), o (versión actual, None) si algún cambio posterior ya
+            salió del registro o la versión no existe
+        """
+        entradas = Registro_Cambios._confirmados()
+        actual = entradas[-1]['id'] if entradas else 0
+        
+        # Primera versión a partir de la cual el registro está completo
+        inicio = len(entradas)
+        while inicio > 0 and (inicio == len(entradas) or entradas[inicio - 1]['id'] == entradas[inicio]['id'] - 1):
+            inicio -= 1
+        minima = entradas[inicio]['id'] - 1 if entradas else 0
+        
+        if version < minima or version > actual:
+            return actual, None
+        return actual, [cambio for cambio in entradas[inicio:] if cambio['id'] > version]
@@ -3,11 +3,14 @@ Servicio para la gestión de categorías
 """
 from persistence.Categoria_Repositorio import Categoria_Repositorio
 from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Instrumentacion import Instrumentacion
+from domain.service.Unidad_Trabajo import Unidad_Trabajo
 
 class Categoria_Service:
     """Servicio para la gestión de categorías"""
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
     def listar_categorias():
         """
         Lista todas las categorías disponibles
@@ -18,6 +21,7 @@ class Categoria_Service:
         return Categoria_Repositorio.listar_categorias()
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
     def obtener_categoria(id):
         """
         Obtiene una categoría por su ID
@@ -31,6 +35,32 @@ class Categoria_Service:
         return Categoria_Repositorio.buscar_por_id(id)
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
+    def contar_productos(id):
+        """
+        Cuenta los productos asociados a una categoría
+        
+        Args:
+            id: ID de la categoría
+            
+        Returns:
+            int: Número de productos de la categoría
+        """
+        return Producto_Repositorio.contar_por_categoria(id)
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
+    def conteos_productos():
+        """
+        Cuenta los productos asociados a cada categoría
+        
+        Returns:
+            dict: Diccionario id de categoría -> número de productos
+        """
+        return Producto_Repositorio.conteos_por_categoria()
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
     def crear_categoria(nombre, descripcion):
         """
         Crea una nueva categoría
@@ -48,10 +78,14 @@ class Categoria_Service:
         return Categoria_Repositorio.crear(nombre, descripcion)
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
     def actualizar_categoria(id, nombre, descripcion):
         """
         Actualiza una categoría existente
         
+        La categoría y el nombre de categoría de sus productos se escriben
+        juntos: si falla alguna de las dos escrituras no se aplica ninguna.
+        
         Args:
             id: ID de la categoría
             nombre: Nuevo nombre
@@ -63,16 +97,18 @@ class Categoria_Service:
         if not nombre:
             return False
         
-        resultado = Categoria_Repositorio.actualizar(id, nombre, descripcion)
-        
-        if resultado:
+        with Unidad_Trabajo() as unidad:
+            if not Categoria_Repositorio.actualizar(id, nombre, descripcion):
+                return False
+            
             # Actualizar nombre de categoría en productos
-            Producto_Repositorio.actualizar_nombre_categoria(id, nombre)
-            return True
+            if not Producto_Repositorio.actualizar_nombre_categoria(id, nombre):
+                unidad.descartar()
         
-        return False
+        return unidad.confirmada
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
     def eliminar_categoria(id):
         """
         Elimina una categoría
@@ -83,9 +119,13 @@ class Categoria_Service:
         Returns:
             bool: True si se eliminó correctamente
         """
-        # Verificar que no tenga productos asociados
-        productos_categoria = Producto_Repositorio.listar_por_categoria(id)
-        if productos_categoria:
-            return False  # No se puede eliminar si tiene productos
+        # Con ambas colecciones bloqueadas no se le pueden asociar productos entretanto
+        with Unidad_Trabajo() as unidad:
+            # Verificar que no tenga productos asociados
+            if Producto_Repositorio.contar_por_categoria(id):
+                return False  # No se puede eliminar si tiene productos
+            
+            if not Categoria_Repositorio.eliminar(id):
+                return False
         
-        return Categoria_Repositorio.eliminar(id)
+        return unidad.confirmada
@@ -1,13 +1,92 @@
 """
 Servicio para la gestión de productos
 """
+import csv
+import json
 from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from persistence.Instrumentacion import Instrumentacion
 from domain.service.Categoria_Service import Categoria_Service
+from domain.service.Unidad_Trabajo import Unidad_Trabajo
 
 class Producto_Service:
     """Servicio para la gestión de productos"""
     
+    # Formatos admitidos para importar y exportar el catálogo
+    FORMATOS = ('csv', 'jsonl')
+    COLUMNAS_EXPORTACION = ('id', 'nombre', 'descripcion', 'precio', 'categoria_id', 'nombre_categoria')
+    
+    @staticmethod
+    def version_datos():
+        """
+        Obtiene la versión conjunta de categorías y productos
+        
+        Cambia con cada creación, actualización o eliminación hecha a través
+        de los servicios y cuando los datos se recargan por cambios externos,
+        por lo que sirve para invalidar cachés de páginas.
+        
+        Returns:
+            tuple: (versión de categorías, versión de productos)
+        """
+        return (Categoria_Repositorio.version(), Producto_Repositorio.version())
+    
     @staticmethod
+    @Instrumentacion.medido('servicio')
+    def cambios_desde(version):
+        """
+        Obtiene lo que cambió en categorías y productos desde una versión
+        
+        Si los cambios posteriores a la versión siguen en el registro se
+        devuelven como deltas, uno por registro afectado y con sus datos
+        actuales; si no (o si no se indica versión) se devuelve el contenido
+        completo de ambas colecciones. Los datos pueden ser más recientes que
+        la versión devuelta, así que aplicar de nuevo un cambio debe ser
+        inocuo: "upsert" reemplaza el registro y "delete" lo elimina si existe.
+        
+        Args:
+            version: Versión que tiene el cliente, o None
+            
+        Returns:
+            dict: {"version", "versiones": {colección: versión}, "completo": bool}
+            con "cambios" (lista de {"version", "coleccion", "op", "id",
+            "datos"}) o, si "completo", "categorias" y "productos"
+        """
+        # La versión se lee antes que los datos para no anunciar datos que no se envían
+        actual, cambios = Registro_Cambios.cambios_desde(-1 if version is None else version)
+        resultado = {
+            'version': actual,
+            'versiones': {coleccion: Registro_Cambios.version(coleccion) for coleccion in ('categorias', 'productos')},
+            'completo': cambios is None
+        }
+        
+        if cambios is None:
+            resultado['categorias'] = [categoria.to_dict() for categoria in Categoria_Repositorio.listar_categorias()]
+            resultado['productos'] = [producto.to_dict() for producto in Producto_Repositorio.listar_productos()]
+            return resultado
+        
+        # Solo interesa el último cambio de cada registro
+        ultimos = {}
+        for cambio in cambios:
+            clave = (cambio['coleccion'], cambio['registro'])
+            ultimos.pop(clave, None)
+            ultimos[clave] = cambio
+        
+        buscar = {'categorias': Categoria_Repositorio.buscar_por_id, 'productos': Producto_Repositorio.buscar_por_id}
+        resultado['cambios'] = []
+        for (coleccion, id), cambio in ultimos.items():
+            registro = buscar[coleccion](id) if cambio['op'] == 'upsert' else None
+            resultado['cambios'].append({
+                'version': cambio['id'],
+                'coleccion': coleccion,
+                'op': 'upsert' if registro is not None else 'delete',
+                'id': id,
+                'datos': registro.to_dict() if registro is not None else None
+            })
+        return resultado
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
     def listar_productos():
         """
         Lista todos los productos disponibles
@@ -18,6 +97,7 @@ class Producto_Service:
         return Producto_Repositorio.listar_productos()
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
     def obtener_producto(id):
         """
         Obtiene un producto por su ID
@@ -31,6 +111,7 @@ class Producto_Service:
         return Producto_Repositorio.buscar_por_id(id)
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
     def listar_productos_por_categoria(categoria_id):
         """
         Lista los productos de una categoría específica
@@ -44,6 +125,96 @@ class Producto_Service:
         return Producto_Repositorio.listar_por_categoria(categoria_id)
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
+    def listar_productos_paginado(pagina=1, por_pagina=50, categoria_id=None, precio_min=None, precio_max=None, orden=None):
+        """
+        Lista una página de productos, con filtros opcionales
+        
+        Si se indica un rango de precios o un orden, el listado se obtiene
+        del índice por precio y queda ordenado por precio.
+        
+        Args:
+            pagina: Número de página, empezando en 1
+            por_pagina: Número de productos por página
+            categoria_id: ID de la categoría para filtrar (opcional)
+            precio_min: Precio mínimo, inclusive (opcional)
+            precio_max: Precio máximo, inclusive (opcional)
+            orden: "precio_asc" o "precio_desc" (opcional)
+            
+        Returns:
+            tuple: (lista de objetos Producto, total de productos)
+        """
+        desplazamiento = (max(pagina, 1) - 1) * por_pagina
+        
+        if precio_min is None and precio_max is None and orden is None:
+            return Producto_Repositorio.listar_pagina(desplazamiento, por_pagina, categoria_id)
+        
+        productos = Producto_Service.listar_por_rango_precio(
+            precio_min,
+            precio_max,
+            categoria_id,
+            'desc' if orden == 'precio_desc' else 'asc'
+        )
+        return productos[desplazamiento:desplazamiento + por_pagina], len(productos)
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
+    def listar_por_rango_precio(minimo=None, maximo=None, categoria_id=None, orden='asc'):
+        """
+        Lista productos en un rango de precios, ordenados por precio
+        
+        Args:
+            minimo: Precio mínimo, inclusive (opcional)
+            maximo: Precio máximo, inclusive (opcional)
+            categoria_id: ID de la categoría para filtrar (opcional)
+            orden: "asc" o "desc"
+            
+        Returns:
+            list: Lista de objetos Producto
+        """
+        return Producto_Repositorio.listar_por_rango_precio(minimo, maximo, categoria_id, orden)
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
+    def buscar(texto, limite=20):
+        """
+        Busca productos por nombre, descripción o categoría
+        
+        Args:
+            texto: Texto a buscar, sin distinguir tildes ni mayúsculas
+            limite: Número máximo de resultados
+            
+        Returns:
+            list: Lista de objetos Producto, de más a menos relevante
+        """
+        if not texto or not texto.strip():
+            return []
+        
+        return Producto_Repositorio.buscar(texto, limite)
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
+    def menu_agrupado():
+        """
+        Agrupa todos los productos por categoría en una sola pasada
+        
+        Returns:
+            dict: Diccionario Categoria -> lista de objetos Producto, en el
+            orden de las categorías
+        """
+        categorias = Categoria_Service.listar_categorias()
+        menu = {categoria: [] for categoria in categorias}
+        por_id = {categoria.id: productos for categoria, productos in menu.items()}
+        
+        for producto in Producto_Repositorio.listar_productos():
+            productos = por_id.get(producto.categoria_id)
+            if productos is not None:
+                productos.append(producto)
+        
+        return menu
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
     def crear_producto(nombre, descripcion, precio, categoria_id):
         """
         Crea un nuevo producto
@@ -74,6 +245,7 @@ class Producto_Service:
         )
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
     def actualizar_producto(id, nombre, descripcion, precio, categoria_id):
         """
         Actualiza un producto existente
@@ -106,6 +278,7 @@ class Producto_Service:
         )
     
     @staticmethod
+    @Instrumentacion.medido('servicio')
     def eliminar_producto(id):
         """
         Elimina un producto
@@ -117,3 +290,165 @@ class Producto_Service:
             bool: True si se eliminó correctamente
         """
         return Producto_Repositorio.eliminar(id)
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
+    def actualizar_precios(precios):
+        """
+        Cambia el precio de varios productos con una sola escritura
+        
+        Args:
+            precios (dict): Diccionario id de producto -> nuevo precio
+            
+        Returns:
+            bool: True si se actualizaron todos; si alguno no existe o algún
+            precio no es válido no se cambia ninguno
+        """
+        if any(precio <= 0 for precio in precios.values()):
+            return False
+        
+        with Unidad_Trabajo() as unidad:
+            for id, precio in precios.items():
+                producto = Producto_Repositorio.buscar_por_id(id)
+                if producto is None or not Producto_Repositorio.actualizar(
+                    id,
+                    producto.nombre,
+                    producto.descripcion,
+                    precio,
+                    producto.categoria_id,
+                    producto.nombre_categoria
+                ):
+                    unidad.descartar()
+                    break
+        
+        return unidad.confirmada
+    
+    @staticmethod
+    def formato_desde_nombre(nombre_archivo):
+        """
+        Deduce el formato de importación/exportación a partir de la extensión
+        
+        Args:
+            nombre_archivo: Nombre o ruta del archivo
+            
+        Returns:
+            str: "csv" o "jsonl", o None si la extensión no es reconocida
+        """
+        extension = nombre_archivo.rsplit('.', 1)[-1].lower()
+        if extension in ('jsonl', 'ndjson'):
+            return 'jsonl'
+        if extension == 'csv':
+            return 'csv'
+        return None
+    
+    @staticmethod
+    def _leer_filas(archivo, formato):
+        """
+        Recorre las filas de un archivo de importación sin cargarlo entero
+        
+        Args:
+            archivo: Archivo de texto abierto
+            formato: "csv" o "jsonl"
+            
+        Yields:
+            tuple: (número de línea, diccionario o None si la línea es inválida)
+        """
+        if formato == 'csv':
+            lector = csv.DictReader(archivo)
+            for fila in lector:
+                yield lector.line_num, fila
+            return
+        
+        for numero, linea in enumerate(archivo, 1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                fila = None
+            yield numero, fila if isinstance(fila, dict) else None
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
+    def importar_productos(archivo, formato):
+        """
+        Importa productos en bloque desde un archivo CSV o JSONL
+        
+        Las filas se validan contra las categorías existentes y las válidas
+        se crean con una sola escritura. Las columnas esperadas son nombre,
+        descripcion, precio y categoria_id; un id presente se ignora.
+        
+        Args:
+            archivo: Archivo de texto abierto
+            formato: "csv" o "jsonl"
+            
+        Returns:
+            dict: {"importados": int, "errores": [(línea, motivo), ...]}
+        """
+        if formato not in Producto_Service.FORMATOS:
+            raise ValueError(f"Formato no admitido: {formato}")
+        
+        categorias = {categoria.id: categoria for categoria in Categoria_Service.listar_categorias()}
+        productos = []
+        errores = []
+        
+        for numero, fila in Producto_Service._leer_filas(archivo, formato):
+            if fila is None:
+                errores.append((numero, 'Línea con formato inválido'))
+                continue
+            
+            nombre = (fila.get('nombre') or '').strip()
+            descripcion = (fila.get('descripcion') or '').strip()
+            try:
+                precio = float(fila.get('precio'))
+                categoria_id = int(fila.get('categoria_id'))
+            except (TypeError, ValueError):
+                errores.append((numero, 'El precio y la categoría deben ser números válidos'))
+                continue
+            
+            if not nombre or precio <= 0:
+                errores.append((numero, 'El nombre es obligatorio y el precio debe ser mayor que cero'))
+                continue
+            
+            categoria = categorias.get(categoria_id)
+            if not categoria:
+                errores.append((numero, f'La categoría {categoria_id} no existe'))
+                continue
+            
+            productos.append((nombre, descripcion, precio, categoria_id, categoria.nombre))
+        
+        ids = Producto_Repositorio.crear_lote(productos) if productos else []
+        if productos and not ids:
+            errores.append((0, 'Error al guardar los productos importados'))
+        
+        return {'importados': len(ids), 'errores': errores}
+    
+    @staticmethod
+    @Instrumentacion.medido('servicio')
+    def exportar_productos(archivo, formato):
+        """
+        Exporta el catálogo fila a fila a un archivo CSV o JSONL
+        
+        Args:
+            archivo: Archivo de texto abierto para escritura
+            formato: "csv" o "jsonl"
+            
+        Returns:
+            int: Número de productos exportados
+        """
+        if formato not in Producto_Service.FORMATOS:
+            raise ValueError(f"Formato no admitido: {formato}")
+        
+        total = 0
+        if formato == 'csv':
+            escritor = csv.DictWriter(archivo, fieldnames=Producto_Service.COLUMNAS_EXPORTACION, extrasaction='ignore')
+            escritor.writeheader()
+            for producto in Producto_Repositorio.listar_productos():
+                escritor.writerow(producto.to_dict())
+                total += 1
+        else:
+            for producto in Producto_Repositorio.listar_productos():
+                archivo.write(json.dumps(producto.to_dict(), ensure_ascii=False) + "\n")
+                total += 1
+        
+        return total
@@ -0,0 +1,88 @@
+"""
+Unidad de trabajo para agrupar varias modificaciones en una confirmación
+"""
+from contextlib import ExitStack
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+
+class Unidad_Trabajo:
+    """
+    Transacción de los servicios sobre categorías y productos
+    
+    Al entrar toma el bloqueo exclusivo de ambas colecciones y del registro
+    de cambios, siempre en el mismo orden, y comprueba que sus índices estén
+    al día. Las modificaciones hechas dentro se aplican en memoria y al
+    salir se escribe cada colección modificada una sola vez, sin importar
+    cuántos registros cambien. Si el bloque lanza una excepción, se llama a
+    descartar() o falla alguna escritura, no queda nada escrito y los
+    índices se recargan desde el almacenamiento.
+    
+    Dentro de otra unidad de trabajo del mismo hilo se integra en ella: sus
+    cambios se confirman con los de la externa, y descartarla descarta
+    también la externa.
+    
+    Uso:
+        with Unidad_Trabajo() as unidad:
+            ...
+        if unidad.confirmada:
+            ...
+    """
+    
+    REPOSITORIOS = (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios)
+    
+    class Descartada(Exception):
+        """Una unidad anidada se descartó; se anula la unidad que la contiene"""
+    
+    def __init__(self):
+        """Inicializa la unidad de trabajo"""
+        self.confirmada = False
+        self._descartada = False
+        self._pila = None
+    
+    def descartar(self):
+        """Marca la unidad para deshacer sus cambios al salir del bloque"""
+        self._descartada = True
+    
+    def __enter__(self):
+        if Conexion.en_transaccion():
+            return self
+        
+        pila = ExitStack()
+        try:
+            for repositorio in Unidad_Trabajo.REPOSITORIOS:
+                pila.enter_context(repositorio.bloqueo())
+            Conexion.iniciar_transaccion()
+        except BaseException:
+            pila.close()
+            raise
+        self._pila = pila
+        return self
+    
+    def __exit__(self, tipo, valor, traza):
+        if self._pila is None:
+            # Integrada en otra unidad: la externa confirma o descarta
+            if tipo is None and self._descartada:
+                raise Unidad_Trabajo.Descartada()
+            self.confirmada = tipo is None
+            return False
+        
+        try:
+            if tipo is None and not self._descartada:
+                self.confirmada = Conexion.confirmar_transaccion()
+            else:
+                Conexion.descartar_transaccion()
+            
+            if not self.confirmada:
+                for repositorio in Unidad_Trabajo.REPOSITORIOS:
+                    repositorio.descartar_cambios()
+        finally:
+            self._pila.close()
+            self._pila = None
+        
+        if self.confirmada:
+            Registro_Cambios.avisar()
+        
+        # Descartar una unidad anidada la anula por completo, sin propagar el error
+        return isinstance(valor, Unidad_Trabajo.Descartada)
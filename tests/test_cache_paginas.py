@@ -0,0 +1,111 @@
+"""
+Pruebas de la invalidación de la caché de páginas
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+from domain.service.Categoria_Service import Categoria_Service
+
+try:
+    from web.App import App
+except ImportError:  # Flask no instalado
+    App = None
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+@unittest.skipIf(App is None, "Flask no está instalado")
+class Test_Cache_Paginas(unittest.TestCase):
+    """Una página cacheada se sirve hasta que cambia la versión de los datos"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO)
+        self.data_dir = tempfile.mkdtemp(prefix="test_cache_paginas_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        self._reiniciar()
+        self.aplicacion = App()
+        self.cliente = self.aplicacion.app.test_client()
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _menu(self):
+        """Pide el menú y devuelve el HTML"""
+        respuesta = self.cliente.get('/menu')
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.get_data(as_text=True)
+    
+    def _contadores(self):
+        """Aciertos y fallos de la caché de páginas"""
+        estadisticas = self.aplicacion.cache_paginas.estadisticas()
+        return estadisticas['hits'], estadisticas['misses']
+    
+    def test_se_reutiliza_mientras_no_cambian_los_datos(self):
+        primera = self._menu()
+        self.assertEqual(self._contadores(), (0, 1))
+        self.assertEqual(self._menu(), primera)
+        self.assertEqual(self._contadores(), (1, 1))
+        
+        # Otra query string es otra página
+        self.cliente.get('/menu?vista=compacta')
+        self.assertEqual(self._contadores(), (1, 2))
+    
+    def test_escritura_en_el_servicio_invalida(self):
+        producto = Producto_Service.listar_productos()[0]
+        nombre = producto.nombre
+        self.assertIn(nombre, self._menu())
+        
+        self.assertTrue(Producto_Service.actualizar_producto(
+            producto.id, "Plato renombrado", producto.descripcion, producto.precio, producto.categoria_id
+        ))
+        html = self._menu()
+        self.assertIn("Plato renombrado", html)
+        self.assertNotIn(nombre, html)
+        self.assertEqual(self._contadores(), (0, 2))
+    
+    def test_cambio_de_categoria_invalida(self):
+        categoria = Categoria_Service.listar_categorias()[0]
+        self.assertIn(categoria.nombre, self._menu())
+        
+        self.assertTrue(Categoria_Service.actualizar_categoria(categoria.id, "Para empezar", categoria.descripcion))
+        self.assertIn("Para empezar", self._menu())
+        self.assertEqual(self._contadores(), (0, 2))
+    
+    def test_cambio_externo_invalida(self):
+        producto = Producto_Service.listar_productos()[0]
+        self.assertIn(producto.nombre, self._menu())
+        
+        # Otro proceso reescribe el archivo de productos
+        ruta = os.path.join(self.data_dir, "productos.json")
+        with open(ruta, 'r', encoding='utf-8') as file:
+            productos = json.load(file)
+        productos[0]['nombre'] = "Cambiado por otro proceso"
+        with open(ruta + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(productos, file, ensure_ascii=False)
+        os.replace(ruta + ".tmp", ruta)
+        
+        self.assertIn("Cambiado por otro proceso", self._menu())
+        self.assertEqual(self._contadores(), (0, 2))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Pruebas de la difusión de avisos de cambios a los suscriptores de /eventos
+"""
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+from web.Centro_Eventos import Centro_Eventos
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Centro_Eventos(unittest.TestCase):
+    """Cada suscriptor recibe el aviso de un cambio confirmado en poco tiempo"""
+    
+    SUSCRIPTORES = 50
+    LIMITE_S = 1.0
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO)
+        self.data_dir = tempfile.mkdtemp(prefix="test_eventos_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        self._reiniciar()
+        self.hilos = []
+    
+    def tearDown(self):
+        # Cerrar termina los flujos; después el centro vuelve a admitir suscriptores
+        Centro_Eventos.cerrar()
+        for hilo in self.hilos:
+            hilo.join(5)
+        if Centro_Eventos._vigilante is not None:
+            Centro_Eventos._vigilante.join(5)
+        Centro_Eventos._vigilante = None
+        Centro_Eventos._cerrado = False
+        Centro_Eventos._publicado = (0, ())
+        Centro_Eventos._version = None
+        
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _suscribir(self, version, recibido):
+        """
+        Consume en un hilo el flujo de un suscriptor
+        
+        Args:
+            version: Versión cuyo aviso se espera
+            recibido: Evento que se activa al recibirlo
+        """
+        flujo = Centro_Eventos.suscribir()
+        next(flujo)
+        
+        def escuchar():
+            for fragmento in flujo:
+                if f"id: {version}\nevent: cambios\n".encode('ascii') in fragmento:
+                    recibido.set()
+        
+        hilo = threading.Thread(target=escuchar, daemon=True)
+        hilo.start()
+        self.hilos.append(hilo)
+    
+    def test_todos_los_suscriptores_reciben_el_cambio(self):
+        producto = Producto_Service.listar_productos()[0]
+        version = Registro_Cambios.version() + 1
+        recibidos = [threading.Event() for _ in range(Test_Centro_Eventos.SUSCRIPTORES)]
+        for recibido in recibidos:
+            self._suscribir(version, recibido)
+        
+        self.assertTrue(Producto_Service.actualizar_producto(
+            producto.id, "Avisado", producto.descripcion, producto.precio, producto.categoria_id
+        ))
+        confirmado = time.perf_counter()
+        
+        limite = confirmado + Test_Centro_Eventos.LIMITE_S
+        for numero, recibido in enumerate(recibidos):
+            self.assertTrue(recibido.wait(max(limite - time.perf_counter(), 0)), f"suscriptor {numero} sin aviso")
+        self.assertEqual(Centro_Eventos.estadisticas()['suscriptores'], Test_Centro_Eventos.SUSCRIPTORES)
+
+if __name__ == "__main__":
+    unittest.main()
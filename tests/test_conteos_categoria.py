@@ -0,0 +1,92 @@
+"""
+Pruebas de los conteos de productos por categoría
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+from domain.service.Categoria_Service import Categoria_Service
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Conteos_Categoria(unittest.TestCase):
+    """Los conteos por categoría siguen a cada alta, cambio de categoría y baja"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO)
+        self.data_dir = tempfile.mkdtemp(prefix="test_conteos_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        self._reiniciar()
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _comprobar(self):
+        """Los conteos coinciden con los productos de cada categoría y los devuelve"""
+        esperado = Counter(p.categoria_id for p in Producto_Service.listar_productos())
+        conteos = Categoria_Service.conteos_productos()
+        # Las categorías sin productos no aparecen
+        self.assertEqual(conteos, dict(esperado))
+        for categoria in Categoria_Service.listar_categorias():
+            self.assertEqual(Categoria_Service.contar_productos(categoria.id), esperado[categoria.id])
+        return conteos
+    
+    def test_alta_cambio_y_baja(self):
+        antes = self._comprobar()
+        
+        nuevo = Producto_Service.crear_producto("Sopa del día", "Según temporada", 6.5, 1)
+        conteos = self._comprobar()
+        self.assertEqual(conteos[1], antes[1] + 1)
+        
+        # Moverlo de categoría descuenta de la anterior y suma a la nueva
+        self.assertTrue(Producto_Service.actualizar_producto(nuevo, "Sopa fría", "", 6.5, 2))
+        conteos = self._comprobar()
+        self.assertEqual(conteos[1], antes[1])
+        self.assertEqual(conteos[2], antes[2] + 1)
+        
+        # Actualizarlo sin cambiar de categoría no altera los conteos
+        self.assertTrue(Producto_Service.actualizar_producto(nuevo, "Gazpacho", "", 7.0, 2))
+        self.assertEqual(self._comprobar(), conteos)
+        
+        self.assertTrue(Producto_Service.eliminar_producto(nuevo))
+        self.assertEqual(self._comprobar(), antes)
+        
+        self._reiniciar()
+        self.assertEqual(self._comprobar(), antes)
+    
+    def test_categoria_vaciada_se_puede_eliminar(self):
+        categoria_id = Categoria_Service.crear_categoria("Temporada", "Platos de temporada")
+        self.assertGreater(categoria_id, 0)
+        self.assertEqual(Categoria_Service.contar_productos(categoria_id), 0)
+        
+        producto = Producto_Service.crear_producto("Sopa del día", "", 6.5, categoria_id)
+        self.assertEqual(self._comprobar()[categoria_id], 1)
+        self.assertFalse(Categoria_Service.eliminar_categoria(categoria_id))
+        
+        self.assertTrue(Producto_Service.actualizar_producto(producto, "Sopa del día", "", 6.5, 1))
+        self.assertEqual(Categoria_Service.contar_productos(categoria_id), 0)
+        self.assertTrue(Categoria_Service.eliminar_categoria(categoria_id))
+        self.assertNotIn(categoria_id, self._comprobar())
+
+if __name__ == "__main__":
+    unittest.main()
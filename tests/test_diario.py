@@ -0,0 +1,136 @@
+"""
+Pruebas del modo diario: reproducción y compactación del diario de cambios
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Diario(unittest.TestCase):
+    """Lo anexado al diario se reproduce al cargar y sobrevive a la compactación"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO, Conexion.UMBRAL_COMPACTACION)
+        self.data_dir = tempfile.mkdtemp(prefix="test_diario_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = True
+        # La compactación solo ocurre cuando la prueba la pide
+        Conexion.UMBRAL_COMPACTACION = 1 << 30
+        self.archivo = os.path.join(self.data_dir, "productos.json")
+        self.diario = self.archivo + Conexion.JOURNAL_SUFIJO
+        self._reiniciar()
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO, Conexion.UMBRAL_COMPACTACION) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _leer_archivo(self):
+        """Registros del archivo base, sin aplicar el diario"""
+        with open(self.archivo, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    
+    def _modificar(self):
+        """Crea, actualiza y elimina productos y devuelve los datos esperados"""
+        primero, segundo = Producto_Service.listar_productos()[:2]
+        nuevo = Producto_Service.crear_producto("Sopa del día", "Según temporada", 6.5, 1)
+        self.assertGreater(nuevo, 0)
+        self.assertTrue(Producto_Service.actualizar_producto(
+            primero.id, "Ensalada de la casa", primero.descripcion, 9.25, primero.categoria_id
+        ))
+        self.assertTrue(Producto_Service.eliminar_producto(segundo.id))
+        return [p.to_dict() for p in Producto_Service.listar_productos()]
+    
+    def test_escrituras_se_anexan_y_se_reproducen(self):
+        base = self._leer_archivo()
+        esperado = self._modificar()
+        
+        # El archivo no se reescribe; los cambios están solo en el diario
+        self.assertEqual(self._leer_archivo(), base)
+        self.assertTrue(os.path.exists(self.diario))
+        
+        self._reiniciar()
+        self.assertEqual(Conexion.load_json("productos.json"), esperado)
+        self.assertEqual([p.to_dict() for p in Producto_Service.listar_productos()], esperado)
+    
+    def test_linea_incompleta_se_ignora(self):
+        esperado = self._modificar()
+        with open(self.diario, 'a', encoding='utf-8') as file:
+            file.write('{"op": "delete", "id": ')
+        
+        self._reiniciar()
+        self.assertEqual(Conexion.load_json("productos.json"), esperado)
+    
+    def test_compactar_integra_el_diario(self):
+        esperado = self._modificar()
+        
+        self.assertTrue(Conexion.compactar("productos.json"))
+        self.assertFalse(os.path.exists(self.diario))
+        self.assertEqual(self._leer_archivo(), esperado)
+        self.assertEqual(Conexion.load_json("productos.json"), esperado)
+        
+        # Las escrituras siguientes empiezan un diario nuevo
+        self.assertTrue(Producto_Service.eliminar_producto(esperado[0]['id']))
+        self._reiniciar()
+        self.assertEqual(Conexion.load_json("productos.json"), esperado[1:])
+    
+    def test_diario_reemplazado_bajo_el_lector(self):
+        self._modificar()
+        with open(self.diario, 'rb') as file:
+            inodo = os.fstat(file.fileno()).st_ino
+            tamano = len(file.read())
+        self.assertEqual(Conexion.leer_diario("productos.json", inodo, tamano), ([], inodo, tamano))
+        
+        # Otro proceso sustituye el diario por uno distinto
+        base = self._leer_archivo()
+        reemplazo = dict(base[0], nombre="Reemplazado")
+        with open(self.diario + ".tmp", 'w', encoding='utf-8') as file:
+            file.write(json.dumps({'op': 'upsert', 'datos': reemplazo}, ensure_ascii=False) + "\n")
+        os.replace(self.diario + ".tmp", self.diario)
+        
+        self.assertIsNone(Conexion.leer_diario("productos.json", inodo, tamano))
+        self.assertEqual(Conexion.load_json("productos.json"), [reemplazo] + base[1:])
+    
+    def test_compactar_no_pisa_un_diario_reemplazado(self):
+        self._modificar()
+        base = self._leer_archivo()
+        reemplazo = dict(base[0], nombre="Reemplazado")
+        escribir_temporal = Conexion._escribir_temporal
+        
+        def reemplazar_y_escribir(file_path, data):
+            # Otro proceso compacta y empieza un diario nuevo entre ambas fases
+            with open(self.diario + ".tmp", 'w', encoding='utf-8') as file:
+                file.write(json.dumps({'op': 'upsert', 'datos': reemplazo}, ensure_ascii=False) + "\n")
+            os.replace(self.diario + ".tmp", self.diario)
+            return escribir_temporal(file_path, data)
+        
+        with mock.patch.object(Conexion, '_escribir_temporal', side_effect=reemplazar_y_escribir):
+            self.assertFalse(Conexion.compactar("productos.json"))
+        
+        self.assertEqual(self._leer_archivo(), base)
+        self.assertEqual([nombre for nombre in os.listdir(self.data_dir) if nombre.endswith(".tmp")], [])
+        self._reiniciar()
+        self.assertEqual(Conexion.load_json("productos.json"), [reemplazo] + base[1:])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Pruebas de la escritura diferida combinada con el modo diario
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+from domain.service.Unidad_Trabajo import Unidad_Trabajo
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Escritura_Diferida(unittest.TestCase):
+    """Lo anotado y aún no escrito debe sobrevivir a una recarga de los índices"""
+    
+    def setUp(self):
+        self.configuracion = (
+            Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO,
+            Conexion.ESCRITURA_DIFERIDA_ACTIVA, Conexion.RETARDO_ESCRITURA_MS, Conexion.RETARDO_MAXIMO_MS
+        )
+        self.data_dir = tempfile.mkdtemp(prefix="test_diferida_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = True
+        Conexion.ESCRITURA_DIFERIDA_ACTIVA = True
+        # Nada se escribe durante la prueba salvo al pedirlo
+        Conexion.RETARDO_ESCRITURA_MS = Conexion.RETARDO_MAXIMO_MS = 60000
+        self._reiniciar()
+    
+    def tearDown(self):
+        Conexion.detener_escritura_diferida()
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO,
+         Conexion.ESCRITURA_DIFERIDA_ACTIVA, Conexion.RETARDO_ESCRITURA_MS, Conexion.RETARDO_MAXIMO_MS) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _en_disco(self):
+        """Productos guardados, leídos de nuevo del archivo y su diario"""
+        Conexion.invalidar_cache()
+        return {producto['id']: producto['nombre'] for producto in Conexion.load_json("productos.json")}
+    
+    def test_unidad_descartada_no_pierde_lo_pendiente(self):
+        categoria_id = Producto_Service.listar_productos()[0].categoria_id
+        primero = Producto_Service.crear_producto("A", "", 1.5, categoria_id)
+        self.assertGreater(primero, 0)
+        
+        # Descartar recarga los índices mientras "A" solo está en las diferidas
+        with Unidad_Trabajo() as unidad:
+            Producto_Service.crear_producto("Descartado", "", 2.0, categoria_id)
+            unidad.descartar()
+        self.assertFalse(unidad.confirmada)
+        self.assertEqual(Producto_Service.obtener_producto(primero).nombre, "A")
+        
+        segundo = Producto_Service.crear_producto("B", "", 3.0, categoria_id)
+        self.assertNotEqual(segundo, primero)
+        
+        self.assertTrue(Conexion.volcar_pendientes())
+        en_disco = self._en_disco()
+        self.assertEqual(en_disco.get(primero), "A")
+        self.assertEqual(en_disco.get(segundo), "B")
+        self.assertNotIn("Descartado", en_disco.values())
+    
+    def test_lectura_incluye_cambios_pendientes(self):
+        producto = Producto_Service.listar_productos()[0]
+        self.assertTrue(Producto_Service.actualizar_producto(
+            producto.id, "Renombrado", producto.descripcion, producto.precio, producto.categoria_id
+        ))
+        
+        # Una recarga completa, como tras un cambio de otro proceso
+        self._reiniciar()
+        self.assertEqual(Producto_Service.obtener_producto(producto.id).nombre, "Renombrado")
+        self.assertIs(Conexion.cargar("productos.json"), Conexion.cargar("productos.json"))
+        
+        self.assertTrue(Conexion.volcar_pendientes())
+        self.assertEqual(self._en_disco()[producto.id], "Renombrado")
+
+if __name__ == "__main__":
+    unittest.main()
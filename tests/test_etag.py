@@ -0,0 +1,87 @@
+"""
+Pruebas de las respuestas JSON con ETag e If-None-Match
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+
+try:
+    from web.App import App
+except ImportError:  # Flask no instalado
+    App = None
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+@unittest.skipIf(App is None, "Flask no está instalado")
+class Test_ETag(unittest.TestCase):
+    """La API responde 304 mientras el cliente tenga la versión actual de los datos"""
+    
+    RUTA = '/api/productos'
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO)
+        self.data_dir = tempfile.mkdtemp(prefix="test_etag_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        self._reiniciar()
+        self.cliente = App().app.test_client()
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _etag(self):
+        """Pide la ruta sin condiciones y devuelve el ETag de la respuesta"""
+        respuesta = self.cliente.get(Test_ETag.RUTA)
+        self.assertEqual(respuesta.status_code, 200)
+        etag, debil = respuesta.get_etag()
+        self.assertFalse(debil)
+        return etag
+    
+    def test_coincidencia_devuelve_304(self):
+        etag = self._etag()
+        for cabecera in (f'"{etag}"', f'W/"{etag}"', f'"otro", "{etag}"', '*'):
+            with self.subTest(cabecera=cabecera):
+                respuesta = self.cliente.get(Test_ETag.RUTA, headers={'If-None-Match': cabecera})
+                self.assertEqual(respuesta.status_code, 304)
+                self.assertEqual(respuesta.data, b"")
+                self.assertEqual(respuesta.get_etag()[0], etag)
+    
+    def test_sin_coincidencia_devuelve_200(self):
+        etag = self._etag()
+        respuesta = self.cliente.get(Test_ETag.RUTA, headers={'If-None-Match': f'"{etag}x"'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.get_etag()[0], etag)
+    
+    def test_cambio_de_datos_cambia_el_etag(self):
+        etag = self._etag()
+        producto = Producto_Service.listar_productos()[0]
+        self.assertTrue(Producto_Service.actualizar_producto(
+            producto.id, "Renombrado", producto.descripcion, producto.precio, producto.categoria_id
+        ))
+        
+        respuesta = self.cliente.get(Test_ETag.RUTA, headers={'If-None-Match': f'W/"{etag}"'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta.get_etag()[0], etag)
+        self.assertIn("Renombrado", respuesta.get_data(as_text=True))
+
+if __name__ == "__main__":
+    unittest.main()
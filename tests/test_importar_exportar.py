@@ -0,0 +1,124 @@
+"""
+Pruebas de la importación y exportación del catálogo en CSV y JSONL
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import Main
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Importar_Exportar(unittest.TestCase):
+    """Lo exportado se vuelve a importar igual, también por la entrada y salida estándar"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO)
+        self.data_dir = tempfile.mkdtemp(prefix="test_importar_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        self._reiniciar()
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    @staticmethod
+    def _sin_id(productos):
+        """Datos de los productos sin el id, que la importación asigna de nuevo"""
+        # La importación quita los espacios sobrantes de los textos
+        return [
+            {k: v.strip() if isinstance(v, str) else v for k, v in p.to_dict().items() if k != 'id'}
+            for p in productos
+        ]
+    
+    def test_ida_y_vuelta(self):
+        for formato in Producto_Service.FORMATOS:
+            with self.subTest(formato=formato):
+                originales = Producto_Service.listar_productos()
+                salida = io.StringIO(newline='')
+                self.assertEqual(Producto_Service.exportar_productos(salida, formato), len(originales))
+                
+                resultado = Producto_Service.importar_productos(io.StringIO(salida.getvalue(), newline=''), formato)
+                self.assertEqual(resultado, {'importados': len(originales), 'errores': []})
+                
+                productos = Producto_Service.listar_productos()
+                importados = productos[len(originales):]
+                self.assertEqual(self._sin_id(importados), self._sin_id(originales))
+                self.assertGreater(min(p.id for p in importados), max(p.id for p in originales))
+                
+                # Lo importado está escrito, no solo en memoria
+                self._reiniciar()
+                self.assertEqual([p.to_dict() for p in Producto_Service.listar_productos()], [p.to_dict() for p in productos])
+    
+    def test_filas_invalidas_se_rechazan(self):
+        total = len(Producto_Service.listar_productos())
+        filas = [
+            {'nombre': "Sopa del día", 'descripcion': "Según temporada", 'precio': 6.5, 'categoria_id': 1},
+            {'nombre': "Sin precio", 'precio': "gratis", 'categoria_id': 1},
+            {'nombre': "", 'precio': 3, 'categoria_id': 1},
+            {'nombre': "Sin categoría", 'precio': 3, 'categoria_id': 99},
+        ]
+        entrada = "".join(json.dumps(fila, ensure_ascii=False) + "\n" for fila in filas) + "no es json\n"
+        
+        resultado = Producto_Service.importar_productos(io.StringIO(entrada), 'jsonl')
+        self.assertEqual(resultado['importados'], 1)
+        self.assertEqual([linea for linea, _ in resultado['errores']], [2, 3, 4, 5])
+        self.assertEqual(len(Producto_Service.listar_productos()), total + 1)
+        
+        with self.assertRaises(ValueError):
+            Producto_Service.importar_productos(io.StringIO(entrada), 'xml')
+    
+    def test_formato_desde_nombre(self):
+        self.assertEqual(Producto_Service.formato_desde_nombre("menu.CSV"), 'csv')
+        self.assertEqual(Producto_Service.formato_desde_nombre("menu.ndjson"), 'jsonl')
+        self.assertIsNone(Producto_Service.formato_desde_nombre("-"))
+    
+    def test_guion_usa_la_entrada_y_salida_estandar(self):
+        parser = argparse.ArgumentParser()
+        total = len(Producto_Service.listar_productos())
+        
+        salida = io.StringIO(newline='')
+        with mock.patch('sys.stdout', salida):
+            Main.importar_exportar(parser, argparse.Namespace(comando="exportar", archivo="-", formato="csv"))
+        self.assertFalse(salida.closed)
+        exportado = salida.getvalue()
+        # Solo el CSV: el resumen no se mezcla con los datos
+        self.assertEqual(len(exportado.splitlines()), total + 1)
+        
+        entrada = io.StringIO(exportado, newline='')
+        with mock.patch('sys.stdin', entrada), contextlib.redirect_stdout(io.StringIO()) as resumen:
+            Main.importar_exportar(parser, argparse.Namespace(comando="importar", archivo="-", formato="csv"))
+        self.assertFalse(entrada.closed)
+        self.assertIn(f"{total} productos importados", resumen.getvalue())
+        self.assertEqual(len(Producto_Service.listar_productos()), 2 * total)
+    
+    def test_guion_sin_formato_es_un_error(self):
+        parser = argparse.ArgumentParser()
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            Main.importar_exportar(parser, argparse.Namespace(comando="exportar", archivo="-", formato=None))
+
+if __name__ == "__main__":
+    unittest.main()
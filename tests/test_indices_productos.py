@@ -0,0 +1,88 @@
+"""
+Pruebas de los índices de productos por id y por categoría
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Indices_Productos(unittest.TestCase):
+    """Los índices en memoria coinciden con lo escrito tras cada modificación"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO)
+        self.data_dir = tempfile.mkdtemp(prefix="test_indices_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        self._reiniciar()
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _estado(self):
+        """Resume lo que devuelven los índices: producto por id e ids por categoría"""
+        por_id = {p.id: p.to_dict() for p in Producto_Repositorio.listar_productos()}
+        for id, datos in por_id.items():
+            self.assertEqual(Producto_Repositorio.buscar_por_id(id).to_dict(), datos)
+        por_categoria = {
+            categoria.id: sorted(p.id for p in Producto_Repositorio.listar_por_categoria(categoria.id))
+            for categoria in Categoria_Repositorio.listar_categorias()
+        }
+        return por_id, por_categoria
+    
+    def _comprobar_contra_disco(self):
+        """Los índices actuales son los mismos que se obtienen al recargar desde disco"""
+        en_memoria = self._estado()
+        self._reiniciar()
+        self.assertEqual(self._estado(), en_memoria)
+        return en_memoria
+    
+    def test_crear_actualizar_y_eliminar(self):
+        Producto_Service.listar_productos()
+        
+        nuevo = Producto_Service.crear_producto("Sopa del día", "Según temporada", 6.5, 1)
+        self.assertGreater(nuevo, 0)
+        por_id, por_categoria = self._comprobar_contra_disco()
+        self.assertEqual(por_id[nuevo]['nombre'], "Sopa del día")
+        self.assertIn(nuevo, por_categoria[1])
+        
+        # Cambiar de categoría lo saca del índice de la anterior
+        self.assertTrue(Producto_Service.actualizar_producto(nuevo, "Sopa fría", "Gazpacho", 7.0, 2))
+        por_id, por_categoria = self._comprobar_contra_disco()
+        self.assertEqual(por_id[nuevo]['nombre_categoria'], "Platos principales")
+        self.assertNotIn(nuevo, por_categoria[1])
+        self.assertIn(nuevo, por_categoria[2])
+        
+        self.assertTrue(Producto_Service.eliminar_producto(nuevo))
+        por_id, por_categoria = self._comprobar_contra_disco()
+        self.assertIsNone(Producto_Repositorio.buscar_por_id(nuevo))
+        self.assertNotIn(nuevo, por_id)
+        self.assertNotIn(nuevo, por_categoria[2])
+    
+    def test_eliminar_inexistente_no_altera_indices(self):
+        antes = self._estado()
+        self.assertFalse(Producto_Service.eliminar_producto(9999))
+        self.assertEqual(self._comprobar_contra_disco(), antes)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Pruebas de que cada petición lee cada colección del almacenamiento como mucho una vez
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+
+try:
+    from web.App import App
+except ImportError:  # Flask no instalado
+    App = None
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+@unittest.skipIf(App is None, "Flask no está instalado")
+class Test_Lecturas_Por_Peticion(unittest.TestCase):
+    """Las páginas del menú y del catálogo no vuelven a leer una colección ya cargada"""
+    
+    RUTAS = ('/', '/menu', '/productos', '/categorias', '/api/menu', '/api/productos')
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp(prefix="test_lecturas_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        self.data_dir_patch = mock.patch.object(Conexion, 'get_data_dir', staticmethod(lambda: self.data_dir))
+        self.data_dir_patch.start()
+        self.cliente = App().app.test_client()
+    
+    def tearDown(self):
+        self.data_dir_patch.stop()
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices, como en un proceso recién arrancado"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio):
+            repositorio._datos = None
+    
+    def _lecturas(self, ruta):
+        """
+        Hace una petición contando las lecturas del almacenamiento de cada colección
+        
+        Returns:
+            dict: file_name -> veces que se leyó del disco
+        """
+        lecturas = {}
+        load_json = Conexion.load_json
+        
+        def contar(file_name):
+            antes = Conexion.estadisticas_cache()['misses']
+            data = load_json(file_name)
+            if Conexion.estadisticas_cache()['misses'] > antes:
+                lecturas[file_name] = lecturas.get(file_name, 0) + 1
+            return data
+        
+        with mock.patch.object(Conexion, 'load_json', staticmethod(contar)):
+            respuesta = self.cliente.get(ruta)
+        self.assertEqual(respuesta.status_code, 200, ruta)
+        return lecturas
+    
+    def test_una_lectura_por_coleccion(self):
+        for ruta in Test_Lecturas_Por_Peticion.RUTAS:
+            with self.subTest(ruta=ruta):
+                self._reiniciar()
+                lecturas = self._lecturas(ruta)
+                self.assertIn("productos.json" if ruta != '/categorias' else "categorias.json", lecturas)
+                self.assertTrue(all(veces == 1 for veces in lecturas.values()), lecturas)
+    
+    def test_sin_lecturas_con_la_cache_al_dia(self):
+        for ruta in Test_Lecturas_Por_Peticion.RUTAS:
+            with self.subTest(ruta=ruta):
+                self._lecturas(ruta)
+                self.assertEqual(self._lecturas(ruta), {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Pruebas del catálogo en memoria compartida
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Catalogo_Compartido import Catalogo_Compartido
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Memoria_Compartida(unittest.TestCase):
+    """Las escrituras no obligan a reconstruir los índices de quien lee el catálogo"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO, Conexion.MEMORIA_COMPARTIDA_ACTIVA)
+        self.data_dir = tempfile.mkdtemp(prefix="test_compartida_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.MEMORIA_COMPARTIDA_ACTIVA = True
+        self._reiniciar()
+    
+    def tearDown(self):
+        Catalogo_Compartido.liberar("productos.json")
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO, Conexion.MEMORIA_COMPARTIDA_ACTIVA) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def test_diario_de_otro_proceso_se_aplica_sin_reconstruir(self):
+        Conexion.JOURNAL_ACTIVO = True
+        cambiado, eliminado = Producto_Service.listar_productos()[:2]
+        Producto_Service.buscar(cambiado.nombre)
+        por_id = Producto_Repositorio._por_id
+        generacion = Catalogo_Compartido.publicada("productos.json").generacion
+        
+        # Otro proceso anexa al diario sin pasar por este repositorio
+        datos = dict(cambiado.to_dict(), nombre="Anexado por otro")
+        self.assertTrue(Conexion.registrar_cambios("productos.json", [
+            {'op': 'upsert', 'datos': datos},
+            {'op': 'delete', 'id': eliminado.id}
+        ]))
+        
+        self.assertEqual(Producto_Service.obtener_producto(cambiado.id).nombre, "Anexado por otro")
+        self.assertIsNone(Producto_Service.obtener_producto(eliminado.id))
+        self.assertEqual([p.id for p in Producto_Service.buscar("anexado otro")], [cambiado.id])
+        self.assertIs(Producto_Repositorio._por_id, por_id)
+        self.assertEqual(Catalogo_Compartido.publicada("productos.json").generacion, generacion)
+    
+    def test_escritura_propia_conserva_indices(self):
+        Conexion.JOURNAL_ACTIVO = False
+        producto = Producto_Service.listar_productos()[0]
+        Producto_Service.buscar(producto.nombre)
+        por_id = Producto_Repositorio._por_id
+        
+        self.assertTrue(Producto_Service.actualizar_producto(
+            producto.id, "Renombrado", producto.descripcion, producto.precio, producto.categoria_id
+        ))
+        
+        self.assertEqual([p.id for p in Producto_Service.buscar("renombrado")], [producto.id])
+        self.assertIs(Producto_Repositorio._por_id, por_id)
+        self.assertIs(Producto_Repositorio._datos, Catalogo_Compartido.publicada("productos.json"))
+
+if __name__ == "__main__":
+    unittest.main()
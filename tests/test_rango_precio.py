@@ -0,0 +1,116 @@
+"""
+Pruebas del listado de productos por rango de precios
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Rango_Precio(unittest.TestCase):
+    """Los límites del rango son inclusivos y los empates se ordenan por id"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO)
+        self.data_dir = tempfile.mkdtemp(prefix="test_rango_precio_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        self._reiniciar()
+        
+        # Dos productos más al precio de uno existente para tener empates
+        self.precio = Producto_Service.listar_productos()[0].precio
+        self.empatados = [
+            Producto_Service.crear_producto(nombre, "", self.precio, 2)
+            for nombre in ("Empate uno", "Empate dos")
+        ]
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    @staticmethod
+    def _esperado(minimo=None, maximo=None, categoria_id=None):
+        """Ids del rango calculados recorriendo todos los productos"""
+        return [
+            p.id for p in sorted(Producto_Service.listar_productos(), key=lambda p: (p.precio, p.id))
+            if (minimo is None or p.precio >= minimo)
+            and (maximo is None or p.precio <= maximo)
+            and (categoria_id is None or p.categoria_id == categoria_id)
+        ]
+    
+    @staticmethod
+    def _ids(minimo=None, maximo=None, categoria_id=None, orden='asc'):
+        """Ids devueltos por el servicio para un rango"""
+        return [p.id for p in Producto_Service.listar_por_rango_precio(minimo, maximo, categoria_id, orden)]
+    
+    def test_limites_inclusivos(self):
+        iguales = self._ids(self.precio, self.precio)
+        self.assertEqual(len(iguales), 3)
+        self.assertEqual(iguales, sorted(iguales))
+        self.assertEqual(iguales[1:], self.empatados)
+        
+        precios = sorted({p.precio for p in Producto_Service.listar_productos()})
+        for minimo, maximo in ((None, None), (precios[0], None), (None, precios[-1]), (precios[1], precios[-2])):
+            with self.subTest(minimo=minimo, maximo=maximo):
+                self.assertEqual(self._ids(minimo, maximo), self._esperado(minimo, maximo))
+        
+        # Justo por encima o por debajo de un precio lo deja fuera
+        self.assertNotIn(self.empatados[0], self._ids(self.precio + 0.001, None))
+        self.assertNotIn(self.empatados[0], self._ids(None, self.precio - 0.001))
+    
+    def test_rango_vacio(self):
+        self.assertEqual(self._ids(self.precio + 1, self.precio), [])
+        self.assertEqual(self._ids(10 ** 9, None), [])
+        self.assertEqual(self._ids(None, 0), [])
+    
+    def test_orden_descendente(self):
+        self.assertEqual(self._ids(orden='desc'), self._ids()[::-1])
+    
+    def test_filtro_por_categoria(self):
+        for categoria in Categoria_Repositorio.listar_categorias():
+            with self.subTest(categoria=categoria.id):
+                self.assertEqual(self._ids(categoria_id=categoria.id), self._esperado(categoria_id=categoria.id))
+        self.assertEqual(self._ids(self.precio, self.precio, 2), self.empatados)
+    
+    def test_cambio_de_precio_mueve_el_producto(self):
+        producto = Producto_Service.obtener_producto(self.empatados[0])
+        self.assertTrue(Producto_Service.actualizar_producto(
+            producto.id, producto.nombre, producto.descripcion, 10 ** 6, producto.categoria_id
+        ))
+        
+        self.assertNotIn(producto.id, self._ids(self.precio, self.precio))
+        self.assertEqual(self._ids(10 ** 6, 10 ** 6), [producto.id])
+        self.assertEqual(self._ids(), self._esperado())
+        
+        self.assertTrue(Producto_Service.eliminar_producto(producto.id))
+        self.assertEqual(self._ids(10 ** 6, None), [])
+    
+    def test_paginado_por_precio(self):
+        todos = self._ids(orden='desc')
+        paginas = [
+            [p.id for p in Producto_Service.listar_productos_paginado(pagina, 4, orden='precio_desc')[0]]
+            for pagina in (1, 2, 3)
+        ]
+        self.assertEqual(sum(paginas, []), todos)
+        self.assertEqual(Producto_Service.listar_productos_paginado(1, 4, precio_min=self.precio, precio_max=self.precio)[1], 3)
+
+if __name__ == "__main__":
+    unittest.main()
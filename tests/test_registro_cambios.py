@@ -0,0 +1,96 @@
+"""
+Pruebas del registro de cambios y de la sincronización incremental
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Registro_Cambios(unittest.TestCase):
+    """Los clientes reciben deltas mientras estén en el registro y, si no, todo el contenido"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO, Registro_Cambios.LIMITE)
+        self.data_dir = tempfile.mkdtemp(prefix="test_cambios_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        Registro_Cambios.LIMITE = 5
+        self._reiniciar()
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO, Registro_Cambios.LIMITE) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _renombrar(self, producto, nombre):
+        self.assertTrue(Producto_Service.actualizar_producto(
+            producto.id, nombre, producto.descripcion, producto.precio, producto.categoria_id
+        ))
+    
+    def test_sin_version_devuelve_todo(self):
+        resultado = Producto_Service.cambios_desde(None)
+        self.assertTrue(resultado['completo'])
+        self.assertEqual(resultado['version'], 0)
+        self.assertEqual(len(resultado['productos']), len(Producto_Service.listar_productos()))
+    
+    def test_version_cero_recibe_deltas(self):
+        primero, segundo = Producto_Service.listar_productos()[:2]
+        self._renombrar(primero, "Uno")
+        self.assertTrue(Producto_Service.eliminar_producto(segundo.id))
+        
+        resultado = Producto_Service.cambios_desde(0)
+        self.assertFalse(resultado['completo'])
+        self.assertEqual(resultado['version'], 2)
+        self.assertEqual(
+            [(cambio['op'], cambio['id']) for cambio in resultado['cambios']],
+            [('upsert', primero.id), ('delete', segundo.id)]
+        )
+        self.assertEqual(resultado['cambios'][0]['datos']['nombre'], "Uno")
+    
+    def test_version_que_salio_del_registro_devuelve_todo(self):
+        producto = Producto_Service.listar_productos()[0]
+        for i in range(Registro_Cambios.LIMITE + 3):
+            self._renombrar(producto, f"Nombre {i}")
+        actual = Registro_Cambios.version()
+        
+        # Recargado de disco, como en otro proceso
+        self._reiniciar()
+        resultado = Producto_Service.cambios_desde(1)
+        self.assertTrue(resultado['completo'])
+        self.assertEqual(resultado['version'], actual)
+        self.assertIn(f"Nombre {Registro_Cambios.LIMITE + 2}", [p['nombre'] for p in resultado['productos']])
+        
+        resultado = Producto_Service.cambios_desde(actual - 1)
+        self.assertFalse(resultado['completo'])
+        self.assertEqual([cambio['version'] for cambio in resultado['cambios']], [actual])
+    
+    def test_registro_se_anexa_sin_reescribirse(self):
+        producto = Producto_Service.listar_productos()[0]
+        self._renombrar(producto, "Anexado")
+        cambios_path = Conexion.get_file_path(Registro_Cambios.CAMBIOS_FILE)
+        self.assertFalse(os.path.exists(cambios_path))
+        self.assertTrue(os.path.exists(cambios_path + Conexion.JOURNAL_SUFIJO))
+        
+        self._reiniciar()
+        self.assertEqual(Registro_Cambios.version('productos'), 1)
+
+if __name__ == "__main__":
+    unittest.main()
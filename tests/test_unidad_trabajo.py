@@ -0,0 +1,131 @@
+"""
+Pruebas de la unidad de trabajo: confirmación y anulación de los cambios
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from persistence.Conexion import Conexion
+from persistence.Categoria_Repositorio import Categoria_Repositorio
+from persistence.Producto_Repositorio import Producto_Repositorio
+from persistence.Registro_Cambios import Registro_Cambios
+from domain.service.Producto_Service import Producto_Service
+from domain.service.Categoria_Service import Categoria_Service
+from domain.service.Unidad_Trabajo import Unidad_Trabajo
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+class Test_Unidad_Trabajo(unittest.TestCase):
+    """Una unidad que no se confirma no deja nada escrito ni en memoria"""
+    
+    def setUp(self):
+        self.configuracion = (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO)
+        self.data_dir = tempfile.mkdtemp(prefix="test_unidad_")
+        for file_name in ("categorias.json", "productos.json"):
+            shutil.copy(os.path.join(DATA, file_name), self.data_dir)
+        
+        Conexion.DATA_DIR = self.data_dir
+        Conexion.BACKEND = 'json'
+        Conexion.JOURNAL_ACTIVO = False
+        self._reiniciar()
+    
+    def tearDown(self):
+        (Conexion.DATA_DIR, Conexion.BACKEND, Conexion.JOURNAL_ACTIVO) = self.configuracion
+        self._reiniciar()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _reiniciar():
+        """Olvida la caché y los índices cargados de otro directorio de datos"""
+        Conexion.invalidar_cache()
+        for repositorio in (Categoria_Repositorio, Producto_Repositorio, Registro_Cambios):
+            repositorio.descartar_cambios()
+    
+    def _archivos(self):
+        """Nombre y contenido de cada archivo del directorio de datos"""
+        contenido = {}
+        for nombre in sorted(os.listdir(self.data_dir)):
+            if not nombre.endswith(".lock"):
+                with open(os.path.join(self.data_dir, nombre), 'rb') as file:
+                    contenido[nombre] = file.read()
+        return contenido
+    
+    @staticmethod
+    def _en_memoria():
+        """Categorías y productos que ven los servicios"""
+        return (
+            [c.to_dict() for c in Categoria_Service.listar_categorias()],
+            [p.to_dict() for p in Producto_Service.listar_productos()]
+        )
+    
+    def _modificar(self):
+        """Hace cambios en ambas colecciones dentro de la unidad en curso"""
+        producto = Producto_Service.listar_productos()[0]
+        self.assertGreater(Categoria_Service.crear_categoria("Temporada", ""), 0)
+        self.assertGreater(Producto_Service.crear_producto("Sopa del día", "", 6.5, 1), 0)
+        self.assertTrue(Producto_Service.actualizar_producto(producto.id, "Renombrado", "", 1.0, 2))
+        self.assertTrue(Producto_Service.eliminar_producto(Producto_Service.listar_productos()[1].id))
+    
+    def _comprobar_anulada(self, unidad, archivos, memoria):
+        """Nada de lo hecho en la unidad quedó escrito ni en memoria"""
+        self.assertFalse(unidad.confirmada)
+        self.assertEqual(self._archivos(), archivos)
+        self.assertEqual(self._en_memoria(), memoria)
+        self._reiniciar()
+        self.assertEqual(self._en_memoria(), memoria)
+    
+    def test_excepcion_anula_los_cambios(self):
+        for journal in (False, True):
+            with self.subTest(journal=journal):
+                Conexion.JOURNAL_ACTIVO = journal
+                self._reiniciar()
+                archivos, memoria = self._archivos(), self._en_memoria()
+                
+                unidad = Unidad_Trabajo()
+                with self.assertRaises(RuntimeError):
+                    with unidad:
+                        self._modificar()
+                        raise RuntimeError("fallo a mitad de la unidad")
+                
+                self._comprobar_anulada(unidad, archivos, memoria)
+                # La unidad no deja bloqueos tomados
+                self.assertFalse(Conexion.en_transaccion())
+                self.assertGreater(Producto_Service.crear_producto("Después", "", 2.0, 1), 0)
+    
+    def test_descartar_anula_los_cambios(self):
+        archivos, memoria = self._archivos(), self._en_memoria()
+        
+        with Unidad_Trabajo() as unidad:
+            self._modificar()
+            unidad.descartar()
+        
+        self._comprobar_anulada(unidad, archivos, memoria)
+    
+    def test_descartar_una_unidad_anidada_anula_la_externa(self):
+        archivos, memoria = self._archivos(), self._en_memoria()
+        
+        # La externa se anula sin propagar el error ni seguir con el bloque
+        seguido = False
+        with Unidad_Trabajo() as externa:
+            self._modificar()
+            with Unidad_Trabajo() as interna:
+                interna.descartar()
+            seguido = True
+        
+        self.assertFalse(seguido)
+        self._comprobar_anulada(externa, archivos, memoria)
+    
+    def test_confirmada_escribe_todo(self):
+        with Unidad_Trabajo() as unidad:
+            self._modificar()
+        self.assertTrue(unidad.confirmada)
+        
+        categorias, productos = self._en_memoria()
+        with open(os.path.join(self.data_dir, "productos.json"), 'r', encoding='utf-8') as file:
+            self.assertEqual(json.load(file), productos)
+        self._reiniciar()
+        self.assertEqual(self._en_memoria(), (categorias, productos))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,67 +1,320 @@
 """
 Aplicación web para el sistema de restaurante
 """
+import json
+import time
+import hashlib
 import secrets
-from flask import Flask, render_template, request, redirect, url_for, flash
+from functools import wraps
+from flask import Flask, render_template, stream_template, request, redirect, url_for, flash, session, jsonify, g
+from flask import before_render_template, template_rendered
+from persistence.Conexion import Conexion
+from persistence.Instrumentacion import Instrumentacion
 from domain.service.Categoria_Service import Categoria_Service
 from domain.service.Producto_Service import Producto_Service
+from web.Cache_Paginas import Cache_Paginas
+from web.Centro_Eventos import Centro_Eventos
 
 class App:
     """Clase principal de la aplicación web"""
     
-    def __init__(self):
-        """Inicializa la aplicación Flask"""
+    # Paginación de los listados de productos
+    POR_PAGINA = 50
+    MAX_POR_PAGINA = 500
+    
+    # A partir de este tamaño de página la respuesta se genera por partes
+    UMBRAL_STREAMING = 200
+    
+    # Número máximo de resultados de una búsqueda
+    MAX_RESULTADOS_BUSQUEDA = 100
+    
+    # Número máximo de páginas renderizadas guardadas en caché
+    MAX_PAGINAS_CACHE = 256
+    
+    # Opciones de configuración que ajustan la persistencia, con el mismo
+    # nombre que la variable de entorno equivalente. Son comunes a todo el
+    # proceso, no a cada aplicación
+    OPCIONES_PERSISTENCIA = {
+        'RESTAURANTE_DATA_DIR': (Conexion, 'DATA_DIR'),
+        'RESTAURANTE_BACKEND': (Conexion, 'BACKEND'),
+        'RESTAURANTE_JOURNAL': (Conexion, 'JOURNAL_ACTIVO'),
+        'RESTAURANTE_SNAPSHOT': (Conexion, 'SNAPSHOT_ACTIVO'),
+        'RESTAURANTE_MEMORIA_COMPARTIDA': (Conexion, 'MEMORIA_COMPARTIDA_ACTIVA'),
+        'RESTAURANTE_ESCRITURA_DIFERIDA': (Conexion, 'ESCRITURA_DIFERIDA_ACTIVA'),
+        'RESTAURANTE_RETARDO_ESCRITURA_MS': (Conexion, 'RETARDO_ESCRITURA_MS'),
+        'RESTAURANTE_RETARDO_MAXIMO_MS': (Conexion, 'RETARDO_MAXIMO_MS'),
+        'RESTAURANTE_LATIDO_EVENTOS_S': (Centro_Eventos, 'LATIDO_S'),
+        'RESTAURANTE_INTERVALO_EVENTOS_S': (Centro_Eventos, 'INTERVALO_S'),
+        'RESTAURANTE_METRICAS': (Instrumentacion, 'ACTIVA'),
+        'RESTAURANTE_UMBRAL_LENTO_MS': (Instrumentacion, 'UMBRAL_LENTO_MS')
+    }
+    
+    def __init__(self, config=None):
+        """
+        Inicializa la aplicación Flask
+        
+        No se accede a los datos ni se cargan plantillas hasta la primera
+        petición que los necesita.
+        
+        Args:
+            config (dict): Configuración de Flask y opciones RESTAURANTE_*
+                (opcional)
+        """
         self.app = Flask(__name__)
         self.app.secret_key = secrets.token_hex(16)
         self.app.config['SESSION_TYPE'] = 'filesystem'
+        if config:
+            self.app.config.update(config)
+            App._aplicar_configuracion(self.app.config)
+        
+        max_paginas = self.app.config.get('RESTAURANTE_MAX_PAGINAS_CACHE', App.MAX_PAGINAS_CACHE)
+        self.cache_paginas = Cache_Paginas(max_paginas)
+        self.cache_api = Cache_Paginas(max_paginas)
         self._configurar_rutas()
+        self._configurar_instrumentacion()
+    
+    @staticmethod
+    def _aplicar_configuracion(config):
+        """
+        Traslada a la persistencia las opciones presentes en la configuración
+        
+        Args:
+            config: Configuración de la aplicación
+        """
+        for opcion, (clase, atributo) in App.OPCIONES_PERSISTENCIA.items():
+            if opcion in config:
+                setattr(clase, atributo, config[opcion])
+        
+        if Instrumentacion.UMBRAL_LENTO_MS:
+            Instrumentacion.ACTIVA = True
     
     def _configurar_rutas(self):
         """Configura las rutas de la aplicación"""
         # Página principal
-        self.app.add_url_rule('/', 'index', self.index)
-        self.app.add_url_rule('/menu', 'menu', self.menu)
+        self.app.add_url_rule('/', 'index', self._cacheado(self.index))
+        self.app.add_url_rule('/menu', 'menu', self._cacheado(self.menu))
         
         # Rutas para categorías
-        self.app.add_url_rule('/categorias', 'listar_categorias', self.listar_categorias)
+        self.app.add_url_rule('/categorias', 'listar_categorias', self._cacheado(self.listar_categorias))
         self.app.add_url_rule('/categorias/nueva', 'nueva_categoria', self.nueva_categoria, methods=['GET', 'POST'])
         self.app.add_url_rule('/categorias/editar/<int:id>', 'editar_categoria', self.editar_categoria, methods=['GET', 'POST'])
         self.app.add_url_rule('/categorias/eliminar/<int:id>', 'eliminar_categoria', self.eliminar_categoria, methods=['POST'])
         
         # Rutas para productos
-        self.app.add_url_rule('/productos', 'listar_productos', self.listar_productos)
-        self.app.add_url_rule('/productos/categoria/<int:categoria_id>', 'productos_por_categoria', self.productos_por_categoria)
+        self.app.add_url_rule('/productos', 'listar_productos', self._cacheado(self.listar_productos))
+        self.app.add_url_rule('/productos/buscar', 'buscar_productos', self.buscar_productos)
+        self.app.add_url_rule('/productos/categoria/<int:categoria_id>', 'productos_por_categoria', self._cacheado(self.productos_por_categoria))
         self.app.add_url_rule('/productos/nuevo', 'nuevo_producto', self.nuevo_producto, methods=['GET', 'POST'])
         self.app.add_url_rule('/productos/editar/<int:id>', 'editar_producto', self.editar_producto, methods=['GET', 'POST'])
         self.app.add_url_rule('/productos/eliminar/<int:id>', 'eliminar_producto', self.eliminar_producto, methods=['POST'])
+        
+        # API JSON de solo lectura para terminales y pantallas de menú
+        self.app.add_url_rule('/api/categorias', 'api_categorias', self.api_categorias)
+        self.app.add_url_rule('/api/productos', 'api_productos', self.api_productos)
+        self.app.add_url_rule('/api/productos/<int:id>', 'api_producto', self.api_producto)
+        self.app.add_url_rule('/api/menu', 'api_menu', self.api_menu)
+        self.app.add_url_rule('/api/cambios', 'api_cambios', self.api_cambios)
+        
+        # Avisos de cambios como Server-Sent Events
+        self.app.add_url_rule('/eventos', 'eventos', self.eventos)
+        
+        # Métricas en formato de texto de Prometheus
+        self.app.add_url_rule('/metrics', 'metricas', self.metricas)
+    
+    def _configurar_instrumentacion(self):
+        """Registra los puntos de medida de las peticiones y las plantillas"""
+        self.app.before_request(self._inicio_peticion)
+        self.app.after_request(self._fin_peticion)
+        before_render_template.connect(self._inicio_plantilla, self.app, weak=False)
+        template_rendered.connect(self._fin_plantilla, self.app, weak=False)
+    
+    def _inicio_peticion(self):
+        """Empieza a medir la petición en curso"""
+        if Instrumentacion.ACTIVA:
+            g.inicio_peticion = time.perf_counter()
+            Instrumentacion.iniciar_peticion()
+    
+    def _fin_peticion(self, respuesta):
+        """
+        Registra la duración de la petición y, si fue lenta, su desglose por capa
+        
+        Las respuestas por partes se miden hasta que empieza su envío.
+        """
+        inicio = g.pop('inicio_peticion', None)
+        if inicio is None:
+            return respuesta
+        
+        duracion = time.perf_counter() - inicio
+        desglose = Instrumentacion.terminar_peticion()
+        ruta = request.url_rule.rule if request.url_rule else "sin ruta"
+        Instrumentacion.observar('peticion', f"{request.method} {ruta}", duracion)
+        Instrumentacion.contar('restaurante_peticiones_total', metodo=request.method, ruta=ruta, estado=respuesta.status_code)
+        
+        if Instrumentacion.UMBRAL_LENTO_MS and duracion * 1000 >= Instrumentacion.UMBRAL_LENTO_MS:
+            detalle = ", ".join(
+                f"{capa} {segundos * 1000:.1f} ms en {llamadas} llamadas"
+                for capa, (llamadas, segundos) in sorted(desglose.items())
+            )
+            self.app.logger.warning(
+                "Petición lenta: %s %s %.1f ms (%s)",
+                request.method, request.full_path, duracion * 1000, detalle or "sin desglose"
+            )
+        return respuesta
+    
+    def _inicio_plantilla(self, sender, template, context, **extra):
+        """Empieza a medir el renderizado de una plantilla"""
+        if Instrumentacion.ACTIVA:
+            g.setdefault('inicios_plantilla', []).append(time.perf_counter())
+    
+    def _fin_plantilla(self, sender, template, context, **extra):
+        """Registra la duración del renderizado de una plantilla"""
+        inicios = g.get('inicios_plantilla')
+        if inicios:
+            Instrumentacion.observar('plantilla', template.name, time.perf_counter() - inicios.pop())
     
     def run(self, debug=True):
         """Ejecuta la aplicación Flask"""
         self.app.run(debug=debug)
     
+    def _cacheado(self, vista):
+        """
+        Envuelve una vista de solo lectura con la caché de páginas
+        
+        La clave incluye la ruta, sus argumentos, la query string y la versión
+        de los datos, de modo que cualquier escritura en los servicios deja
+        obsoletas las páginas anteriores. No se cachean las respuestas por
+        partes ni las que muestran mensajes flash del usuario.
+        """
+        @wraps(vista)
+        def vista_cacheada(**kwargs):
+            if session.get('_flashes'):
+                return vista(**kwargs)
+            
+            clave = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                request.query_string,
+                Producto_Service.version_datos()
+            )
+            html = self.cache_paginas.obtener(clave)
+            if html is None:
+                html = vista(**kwargs)
+                if isinstance(html, str):
+                    self.cache_paginas.guardar(clave, html)
+            return html
+        
+        return vista_cacheada
+    
+    def _respuesta_json(self, generar):
+        """
+        Construye una respuesta JSON con ETag fuerte y soporte de If-None-Match
+        
+        El cuerpo y su ETag se calculan una vez por versión de los datos. El
+        ETag es el hash del contenido, así que coincide entre procesos que
+        sirven los mismos datos.
+        
+        Args:
+            generar: Función sin argumentos que devuelve los datos a serializar
+            
+        Returns:
+            Response: 200 con el JSON, o 304 sin cuerpo si el cliente ya lo tiene
+        """
+        clave = (request.endpoint, tuple(sorted(request.view_args.items())), request.query_string, Producto_Service.version_datos())
+        entrada = self.cache_api.obtener(clave)
+        if entrada is None:
+            cuerpo = json.dumps(generar(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            entrada = (hashlib.sha1(cuerpo).hexdigest(), cuerpo)
+            self.cache_api.guardar(clave, entrada)
+        etag, cuerpo = entrada
+        
+        # If-None-Match usa la comparación débil: W/"x" también coincide con "x"
+        if request.if_none_match.contains_weak(etag):
+            respuesta = self.app.response_class(status=304)
+        else:
+            respuesta = self.app.response_class(cuerpo, mimetype='application/json')
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta
+    
+    def _leer_paginacion(self):
+        """
+        Lee la página y el tamaño de página de la query string
+        
+        Returns:
+            tuple: (pagina, por_pagina) ya acotados
+        """
+        pagina = max(request.args.get('pagina', 1, type=int), 1)
+        por_pagina = request.args.get('por_pagina', App.POR_PAGINA, type=int)
+        por_pagina = min(max(por_pagina, 1), App.MAX_POR_PAGINA)
+        return pagina, por_pagina
+    
+    def _leer_filtros_precio(self):
+        """
+        Lee de la query string el rango de precios y el orden del listado
+        
+        Returns:
+            dict: precio_min, precio_max y orden; None si no se indicaron
+        """
+        orden = request.args.get('orden')
+        return {
+            'precio_min': request.args.get('precio_min', type=float),
+            'precio_max': request.args.get('precio_max', type=float),
+            'orden': orden if orden in ('precio_asc', 'precio_desc') else None
+        }
+    
+    def _paginacion(self, pagina, por_pagina, total):
+        """
+        Construye los datos de navegación entre páginas para la plantilla
+        
+        Args:
+            pagina: Página actual
+            por_pagina: Productos por página
+            total: Total de productos del listado
+            
+        Returns:
+            dict: Página actual, total de páginas y URLs anterior/siguiente
+        """
+        total_paginas = max((total + por_pagina - 1) // por_pagina, 1)
+        
+        def url_pagina(numero):
+            args = dict(request.view_args, **request.args.to_dict())
+            args.update(pagina=numero, por_pagina=por_pagina)
+            return url_for(request.endpoint, **args)
+        
+        return {
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total': total,
+            'total_paginas': total_paginas,
+            'anterior': url_pagina(pagina - 1) if pagina > 1 else None,
+            'siguiente': url_pagina(pagina + 1) if pagina < total_paginas else None
+        }
+    
+    def _renderizar_listado(self, plantilla, por_pagina, **contexto):
+        """Renderiza un listado, por partes si la página es grande"""
+        if por_pagina >= App.UMBRAL_STREAMING:
+            return stream_template(plantilla, **contexto)
+        return render_template(plantilla, **contexto)
+    
     # Controladores de rutas
     
     def index(self):
         """Página principal"""
-        categorias = Categoria_Service.listar_categorias()
-        productos = Producto_Service.listar_productos()
+        menu_por_categoria = Producto_Service.menu_agrupado()
+        categorias = list(menu_por_categoria)
+        productos = [producto for productos in menu_por_categoria.values() for producto in productos]
         return render_template('index.html', categorias=categorias, productos=productos)
     
     def menu(self):
         """Ver menú completo"""
-        categorias = Categoria_Service.listar_categorias()
-        menu_por_categoria = {}
-        
-        for categoria in categorias:
-            productos = Producto_Service.listar_productos_por_categoria(categoria.id)
-            menu_por_categoria[categoria] = productos
-        
+        menu_por_categoria = Producto_Service.menu_agrupado()
         return render_template('menu.html', menu_por_categoria=menu_por_categoria)
     
     def listar_categorias(self):
         """Lista todas las categorías"""
         categorias = Categoria_Service.listar_categorias()
-        return render_template('categorias/listar.html', categorias=categorias)
+        conteos = Categoria_Service.conteos_productos()
+        return render_template('categorias/listar.html', categorias=categorias, conteos=conteos)
     
     def nueva_categoria(self):
         """Formulario para crear una nueva categoría"""
@@ -120,8 +373,17 @@ class App:
     
     def listar_productos(self):
         """Lista todos los productos"""
-        productos = Producto_Service.listar_productos()
-        return render_template('productos/listar.html', productos=productos)
+        pagina, por_pagina = self._leer_paginacion()
+        filtros = self._leer_filtros_precio()
+        productos, total = Producto_Service.listar_productos_paginado(pagina, por_pagina, **filtros)
+        paginacion = self._paginacion(pagina, por_pagina, total)
+        return self._renderizar_listado('productos/listar.html', por_pagina, productos=productos, paginacion=paginacion, filtros=filtros)
+    
+    def buscar_productos(self):
+        """Busca productos por texto"""
+        texto = request.args.get('q', '').strip()
+        productos = Producto_Service.buscar(texto, App.MAX_RESULTADOS_BUSQUEDA)
+        return render_template('productos/listar.html', productos=productos, texto_busqueda=texto)
     
     def productos_por_categoria(self, categoria_id):
         """Lista productos por categoría"""
@@ -130,8 +392,10 @@ class App:
             flash('Categoría no encontrada', 'danger')
             return redirect(url_for('listar_categorias'))
         
-        productos = Producto_Service.listar_productos_por_categoria(categoria_id)
-        return render_template('productos/por_categoria.html', productos=productos, categoria=categoria)
+        pagina, por_pagina = self._leer_paginacion()
+        productos, total = Producto_Service.listar_productos_paginado(pagina, por_pagina, categoria_id)
+        paginacion = self._paginacion(pagina, por_pagina, total)
+        return self._renderizar_listado('productos/por_categoria.html', por_pagina, productos=productos, categoria=categoria, paginacion=paginacion)
     
     def nuevo_producto(self):
         """Formulario para crear un nuevo producto"""
@@ -220,3 +484,97 @@ class App:
             flash('Error al eliminar el producto', 'danger')
         
         return redirect(url_for('listar_productos'))
+    
+    # API JSON
+    
+    def api_categorias(self):
+        """Lista todas las categorías en JSON"""
+        return self._respuesta_json(
+            lambda: [categoria.to_dict() for categoria in Categoria_Service.listar_categorias()]
+        )
+    
+    def api_productos(self):
+        """Lista los productos en JSON, opcionalmente de una categoría"""
+        categoria_id = request.args.get('categoria_id', type=int)
+        if categoria_id is None:
+            return self._respuesta_json(
+                lambda: [producto.to_dict() for producto in Producto_Service.listar_productos()]
+            )
+        return self._respuesta_json(
+            lambda: [producto.to_dict() for producto in Producto_Service.listar_productos_por_categoria(categoria_id)]
+        )
+    
+    def api_producto(self, id):
+        """Obtiene un producto en JSON"""
+        producto = Producto_Service.obtener_producto(id)
+        if not producto:
+            return jsonify({'error': 'Producto no encontrado'}), 404
+        return self._respuesta_json(producto.to_dict)
+    
+    def api_menu(self):
+        """Menú completo agrupado por categoría en JSON"""
+        return self._respuesta_json(
+            lambda: [
+                {'categoria': categoria.to_dict(), 'productos': [producto.to_dict() for producto in productos]}
+                for categoria, productos in Producto_Service.menu_agrupado().items()
+            ]
+        )
+    
+    def api_cambios(self):
+        """Cambios en categorías y productos desde la versión ?desde=N en JSON"""
+        desde = request.args.get('desde', type=int)
+        return self._respuesta_json(lambda: Producto_Service.cambios_desde(desde))
+    
+    def eventos(self):
+        """
+        Flujo de avisos de cambios en los datos (text/event-stream)
+        
+        Al reconectarse, el navegador envía en Last-Event-ID la última
+        versión recibida; sin ella se acepta también ?desde=N.
+        """
+        desde = request.headers.get('Last-Event-ID', type=int)
+        if desde is None:
+            desde = request.args.get('desde', type=int)
+        respuesta = self.app.response_class(Centro_Eventos.suscribir(desde), mimetype='text/event-stream')
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        respuesta.headers['X-Accel-Buffering'] = 'no'
+        return respuesta
+    
+    def metricas(self):
+        """Exporta las mediciones y el estado de las cachés para Prometheus"""
+        caches = (
+            ('paginas', self.cache_paginas.estadisticas()),
+            ('api', self.cache_api.estadisticas()),
+            ('almacenamiento', Conexion.estadisticas_cache())
+        )
+        adicionales = [
+            ('restaurante_cache_aciertos_total', 'counter', "Aciertos de las cachés",
+             [({'cache': nombre}, estadisticas['hits']) for nombre, estadisticas in caches]),
+            ('restaurante_cache_fallos_total', 'counter', "Fallos de las cachés",
+             [({'cache': nombre}, estadisticas['misses']) for nombre, estadisticas in caches])
+        ]
+        eventos = Centro_Eventos.estadisticas()
+        adicionales += [
+            ('restaurante_eventos_suscriptores', 'gauge', "Clientes conectados a /eventos",
+             [({}, eventos['suscriptores'])]),
+            ('restaurante_eventos_avisos_total', 'counter', "Avisos de cambios publicados",
+             [({}, eventos['avisos'])])
+        ]
+        if Conexion.ESCRITURA_DIFERIDA_ACTIVA:
+            estado = Conexion.estado_escritura_diferida()
+            adicionales += [
+                ('restaurante_escritura_diferida_pendientes', 'gauge', "Colecciones con cambios sin escribir",
+                 [({}, estado['pendientes'])]),
+                ('restaurante_escritura_diferida_antiguedad_segundos', 'gauge', "Antigüedad del cambio sin escribir más antiguo",
+                 [({}, estado['antiguedad'])]),
+                ('restaurante_escritura_diferida_escrituras_total', 'counter', "Escrituras diferidas completadas",
+                 [({}, estado['escrituras'])]),
+                ('restaurante_escritura_diferida_errores_total', 'counter', "Escrituras diferidas fallidas",
+                 [({}, estado['errores'])]),
+                ('restaurante_escritura_diferida_ultima_timestamp_segundos', 'gauge', "Momento de la última escritura diferida",
+                 [({}, estado['ultima_escritura'])]),
+                ('restaurante_escritura_diferida_ultima_duracion_segundos', 'gauge', "Duración de la última escritura diferida",
+                 [({}, estado['duracion_ultima'])])
+            ]
+        texto = Instrumentacion.exportar(adicionales)
+        return self.app.response_class(texto, mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,74 @@
+"""
+Caché de páginas renderizadas
+"""
+import threading
+from collections import OrderedDict
+
+class Cache_Paginas:
+    """Caché LRU acotada de páginas HTML ya renderizadas"""
+    
+    def __init__(self, max_entradas=256):
+        """
+        Inicializa la caché
+        
+        Args:
+            max_entradas: Número máximo de páginas guardadas
+        """
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def obtener(self, clave):
+        """
+        Obtiene una página de la caché
+        
+        Args:
+            clave: Clave de la página (debe incluir la versión de los datos)
+            
+        Returns:
+            str: HTML guardado o None si no está en caché
+        """
+        with self._lock:
+            html = self._entradas.get(clave)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return html
+    
+    def guardar(self, clave, html):
+        """
+        Guarda una página, descartando la usada hace más tiempo si está llena
+        
+        Args:
+            clave: Clave de la página
+            html: HTML renderizado
+        """
+        with self._lock:
+            self._entradas[clave] = html
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+    
+    def limpiar(self):
+        """Descarta todas las páginas guardadas"""
+        with self._lock:
+            self._entradas.clear()
+    
+    def estadisticas(self):
+        """
+        Obtiene los contadores de uso de la caché
+        
+        Returns:
+            dict: Aciertos, fallos, entradas y capacidad
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas
+            }
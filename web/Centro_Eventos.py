@@ -0,0 +1,276 @@
+"""
+Difusión de avisos de cambios a los clientes de Server-Sent Events
+"""
+import os
+import json
+import threading
+from persistence.Registro_Cambios import Registro_Cambios
+
+class Centro_Eventos:
+    """
+    Difunde un aviso por cada cambio en los datos a los suscriptores del proceso
+    
+    Un único hilo vigilante por proceso lee el registro de cambios cuando
+    se confirma un cambio en este proceso y, mientras hay suscriptores,
+    cada INTERVALO_S segundos para recoger los de otros procesos. Cada
+    aviso se formatea una sola vez y se publica numerado en una tupla
+    inmutable con los últimos CAPACIDAD avisos. Cada suscriptor espera en
+    su propio cerrojo, sin consumir CPU; al publicar se liberan todos y cada
+    uno lee la tupla sin tomar ningún bloqueo compartido, así que cientos de
+    suscriptores despiertan sin estorbarse. Si pasan LATIDO_S segundos sin
+    avisos se envía un comentario, que mantiene abierta la conexión a través
+    de proxies y permite detectar a los clientes desconectados.
+    
+    Cada aviso es un evento "cambios" con id igual a la versión del
+    registro y datos {"version": N, "categorias": [ids], "productos": [ids]}.
+    Si un cliente se ha perdido avisos que ya no están disponibles recibe
+    un evento "reinicio" con {"version": N} y debe pedir /api/cambios.
+    """
+    
+    # Segundos sin avisos tras los que se envía un latido
+    LATIDO_S = float(os.environ.get('RESTAURANTE_LATIDO_EVENTOS_S', '15'))
+    
+    # Segundos entre comprobaciones de cambios hechos por otros procesos
+    INTERVALO_S = float(os.environ.get('RESTAURANTE_INTERVALO_EVENTOS_S', '1'))
+    
+    # Avisos guardados para los suscriptores que se retrasan
+    CAPACIDAD = 256
+    
+    # Milisegundos que espera el navegador antes de reconectarse
+    REINTENTO_MS = 3000
+    
+    _lock = threading.Lock()
+    _publicado = (0, ())        # (número del último aviso, avisos como (número, texto))
+    _version = None             # Versión del registro ya avisada; None sin suscriptores
+    _suscriptores = 0
+    _cerrado = False
+    _esperando = []             # Cerrojos de los suscriptores que esperan un aviso
+    _despertar = threading.Event()
+    _vigilante = None
+    
+    @staticmethod
+    def _avisar():
+        """Despierta al hilo vigilante tras confirmarse cambios en este proceso"""
+        Centro_Eventos._despertar.set()
+    
+    @staticmethod
+    def _arrancar():
+        """Arranca el hilo vigilante del proceso si no está en marcha"""
+        with Centro_Eventos._lock:
+            if Centro_Eventos._vigilante is None:
+                Centro_Eventos._vigilante = threading.Thread(
+                    target=Centro_Eventos._vigilar, name="centro-eventos", daemon=True
+                )
+                Centro_Eventos._vigilante.start()
+    
+    @staticmethod
+    def _vigilar():
+        """Bucle del hilo vigilante: publica un aviso por cada tanda de cambios"""
+        while True:
+            # Sin suscriptores no hay nada que comprobar hasta que llegue uno
+            Centro_Eventos._despertar.wait(Centro_Eventos.INTERVALO_S if Centro_Eventos._suscriptores else None)
+            Centro_Eventos._despertar.clear()
+            
+            with Centro_Eventos._lock:
+                if Centro_Eventos._cerrado:
+                    return
+                if not Centro_Eventos._suscriptores:
+                    Centro_Eventos._version = None
+                    continue
+                version = Centro_Eventos._version
+            
+            try:
+                Centro_Eventos._publicar(version)
+            except Exception as e:
+                print(f"Error al leer el registro de cambios: {e}")
+    
+    @staticmethod
+    def _publicar(version):
+        """
+        Publica un aviso con los cambios posteriores a una versión, si los hay
+        
+        Args:
+            version: Última versión avisada
+        """
+        actual, cambios = Registro_Cambios.cambios_desde(version)
+        if cambios is not None and not cambios:
+            return
+        
+        texto = Centro_Eventos._evento(actual, cambios)
+        with Centro_Eventos._lock:
+            numero, avisos = Centro_Eventos._publicado
+            Centro_Eventos._publicado = (numero + 1, (avisos + ((numero + 1, texto),))[-Centro_Eventos.CAPACIDAD:])
+            Centro_Eventos._version = actual
+        Centro_Eventos._liberar_esperas()
+    
+    @staticmethod
+    def _liberar_esperas():
+        """Despierta a todos los suscriptores que esperan un aviso"""
+        # Tras cambiar lo publicado: quien se apunte después ya lo ve al comprobarlo
+        with Centro_Eventos._lock:
+            esperando = Centro_Eventos._esperando
+            Centro_Eventos._esperando = []
+        for espera in esperando:
+            espera.release()
+    
+    @staticmethod
+    def _esperar(siguiente):
+        """
+        Espera hasta que haya un aviso con número igual o mayor, o un latido
+        
+        Args:
+            siguiente: Número del primer aviso que falta por enviar
+            
+        Returns:
+            tuple: Lo publicado al terminar la espera
+        """
+        espera = threading.Lock()
+        espera.acquire()
+        with Centro_Eventos._lock:
+            lista = Centro_Eventos._esperando
+            lista.append(espera)
+        
+        publicado = Centro_Eventos._publicado
+        if publicado[0] >= siguiente or Centro_Eventos._cerrado:
+            return publicado
+        
+        if not espera.acquire(timeout=Centro_Eventos.LATIDO_S):
+            with Centro_Eventos._lock:
+                # Una lista ya retirada la está recorriendo quien publica
+                if lista is Centro_Eventos._esperando:
+                    lista.remove(espera)
+        return Centro_Eventos._publicado
+    
+    @staticmethod
+    def _evento(version, cambios):
+        """
+        Formatea un aviso como evento de Server-Sent Events
+        
+        Args:
+            version: Versión del registro tras los cambios
+            cambios: Cambios del registro, o None si no se conocen
+            
+        Returns:
+            bytes: Texto del evento, ya codificado
+        """
+        if cambios is None:
+            tipo, datos = 'reinicio', {'version': version}
+        else:
+            tipo, datos = 'cambios', {'version': version}
+            for cambio in cambios:
+                # Un diccionario conserva el orden y elimina los repetidos
+                datos.setdefault(cambio['coleccion'], {})[cambio['registro']] = None
+            for coleccion in ('categorias', 'productos'):
+                if coleccion in datos:
+                    datos[coleccion] = list(datos[coleccion])
+        return f"id: {version}\nevent: {tipo}\ndata: {json.dumps(datos, separators=(',', ':'))}\n\n".encode('utf-8')
+    
+    @staticmethod
+    def _pendientes(publicado, siguiente):
+        """
+        Obtiene el texto de los avisos a partir de un número
+        
+        Args:
+            publicado: Lo publicado, como (número del último aviso, avisos)
+            siguiente: Número del primer aviso que falta por enviar
+            
+        Returns:
+            bytes: Texto de los avisos, un evento "reinicio" si alguno ya no
+            está guardado, o None si no hay avisos nuevos
+        """
+        numero, avisos = publicado
+        if siguiente > numero:
+            return None
+        primero = avisos[0][0]
+        if siguiente < primero:
+            return Centro_Eventos._evento(Centro_Eventos._version, None)
+        return b"".join(texto for _, texto in avisos[siguiente - primero:])
+    
+    @staticmethod
+    def suscribir(desde=None):
+        """
+        Genera el flujo de eventos de un suscriptor hasta que se desconecte
+        
+        Args:
+            desde: Última versión que conoce el cliente (cabecera
+                Last-Event-ID al reconectarse); si es distinta de la actual
+                se le envían primero los cambios que se perdió
+                
+        Yields:
+            bytes: Fragmentos del flujo text/event-stream
+        """
+        Centro_Eventos._arrancar()
+        # Se lee antes de suscribirse: lo posterior lo avisará el vigilante
+        actual = Registro_Cambios.version()
+        
+        with Centro_Eventos._lock:
+            if Centro_Eventos._cerrado:
+                return
+            if Centro_Eventos._version is None:
+                Centro_Eventos._version = actual
+            Centro_Eventos._suscriptores += 1
+            siguiente = Centro_Eventos._publicado[0] + 1
+        Centro_Eventos._despertar.set()
+        
+        try:
+            inicio = f"retry: {Centro_Eventos.REINTENTO_MS}\n\n".encode('ascii')
+            if desde is not None and desde != actual:
+                version, cambios = Registro_Cambios.cambios_desde(desde)
+                inicio += Centro_Eventos._evento(version, cambios)
+            yield inicio
+            
+            while True:
+                publicado = Centro_Eventos._esperar(siguiente)
+                if Centro_Eventos._cerrado:
+                    return
+                texto = Centro_Eventos._pendientes(publicado, siguiente)
+                siguiente = publicado[0] + 1
+                
+                # Escribir a un cliente desconectado falla y termina el generador
+                yield texto or b": latido\n\n"
+        finally:
+            with Centro_Eventos._lock:
+                Centro_Eventos._suscriptores -= 1
+    
+    @staticmethod
+    def cerrar():
+        """
+        Termina los flujos abiertos y rechaza suscripciones nuevas
+        
+        Se llama al detener el servidor, que de otro modo esperaría a que
+        los clientes se desconectaran; los navegadores se reconectan solos.
+        """
+        with Centro_Eventos._lock:
+            Centro_Eventos._cerrado = True
+        Centro_Eventos._liberar_esperas()
+        Centro_Eventos._despertar.set()
+    
+    @staticmethod
+    def estadisticas():
+        """
+        Obtiene el estado de la difusión
+        
+        Returns:
+            dict: Suscriptores conectados, avisos publicados y versión avisada
+        """
+        with Centro_Eventos._lock:
+            return {
+                'suscriptores': Centro_Eventos._suscriptores,
+                'avisos': Centro_Eventos._publicado[0],
+                'version': Centro_Eventos._version or 0
+            }
+    
+    @staticmethod
+    def _tras_fork():
+        """En un proceso hijo, el vigilante y los suscriptores del padre no existen"""
+        Centro_Eventos._lock = threading.Lock()
+        Centro_Eventos._despertar = threading.Event()
+        Centro_Eventos._esperando = []
+        Centro_Eventos._suscriptores = 0
+        Centro_Eventos._version = None
+        Centro_Eventos._vigilante = None
+
+Registro_Cambios.observar(Centro_Eventos._avisar)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=Centro_Eventos._tras_fork)
@@ -3,10 +3,16 @@ Punto de entrada para la aplicación web
 """
 from web.App import App
 
-# Inicializar la aplicación
-app = App()
+def __getattr__(nombre):
+    """Crea la aplicación la primera vez que se accede a app"""
+    if nombre != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    
+    global app
+    app = App()
+    return app
 
 # Punto de entrada
 if __name__ == "__main__":
     # Ejecutar la aplicación
-    app.run(debug=True)
+    App().run(debug=True)
@@ -0,0 +1,309 @@
+"""
+Servidor WSGI de producción con procesos prebifurcados
+"""
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import threading
+import traceback
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+from persistence.Conexion import Conexion
+from persistence.Catalogo_Compartido import Catalogo_Compartido
+from domain.service.Categoria_Service import Categoria_Service
+from domain.service.Producto_Service import Producto_Service
+from web.Centro_Eventos import Centro_Eventos
+
+class _Servidor_WSGI(ThreadingMixIn, WSGIServer):
+    """Servidor WSGI de un proceso hijo, que atiende sobre un socket ya abierto"""
+    
+    # Al detenerse se esperan las peticiones en curso
+    daemon_threads = False
+    block_on_close = True
+    
+    def __init__(self, sock, aplicacion, manejador):
+        WSGIServer.__init__(self, sock.getsockname()[:2], manejador, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        host, port = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(aplicacion)
+
+class _Manejador_Silencioso(WSGIRequestHandler):
+    """Manejador de peticiones sin registro de accesos"""
+    
+    def log_message(self, format, *args):
+        pass
+
+class Servidor:
+    """
+    Servidor de producción con N procesos hijos sobre un socket compartido
+    
+    El proceso padre abre el socket, carga el catálogo y construye sus
+    índices una sola vez; los hijos se crean con fork y comparten esos datos
+    en copia en escritura. Ante SIGHUP, o cuando cambian los archivos de
+    datos, el padre vuelve a cargar el catálogo, crea hijos nuevos y pide a
+    los anteriores que terminen las peticiones en curso y salgan.
+    
+    Con el catálogo en memoria compartida los hijos leen siempre la última
+    generación publicada, así que un cambio de datos no requiere recargarlos.
+    
+    Un hijo que termina antes de VIDA_MINIMA_S segundos se reemplaza con una
+    espera que se duplica en cada fallo seguido, hasta RETARDO_MAXIMO_S; tras
+    MAX_FALLOS_RAPIDOS fallos seguidos el servidor se detiene.
+    """
+    
+    # Segundos que debe vivir un hijo para no contar como fallo al arrancar
+    VIDA_MINIMA_S = 5.0
+    
+    # Espera máxima antes de reemplazar un hijo que falla al arrancar
+    RETARDO_MAXIMO_S = 10.0
+    
+    # Fallos seguidos al arrancar tras los que se abandona
+    MAX_FALLOS_RAPIDOS = 5
+    
+    def __init__(self, aplicacion, bind="127.0.0.1:8000", workers=2, backlog=128, intervalo_recarga=2.0, registro_accesos=True):
+        """
+        Inicializa el servidor
+        
+        Args:
+            aplicacion: Aplicación WSGI, creada antes de bifurcar
+            bind: Dirección "host:puerto" en la que escuchar
+            workers: Número de procesos hijos
+            backlog: Longitud de la cola de conexiones pendientes
+            intervalo_recarga: Segundos entre comprobaciones de cambios en
+                los datos (0 para recargar solo con SIGHUP)
+            registro_accesos: Si se escribe una línea por petición en stderr
+        """
+        self.aplicacion = aplicacion
+        self.direccion = Servidor.leer_bind(bind)
+        self.workers = max(1, workers)
+        self.backlog = backlog
+        self.intervalo_recarga = intervalo_recarga
+        self.manejador = WSGIRequestHandler if registro_accesos else _Manejador_Silencioso
+        self._socket = None
+        self._hijos = {}        # pid -> generación
+        self._inicios = {}      # pid -> instante de creación (time.monotonic)
+        self._reemplazos = []   # Instantes en que crear los hijos que faltan
+        self._fallos_rapidos = 0
+        self._generacion = 0
+        self._detener = False
+        self._abandonar = False
+        self._recargar = False
+    
+    @staticmethod
+    def leer_bind(bind):
+        """
+        Interpreta una dirección "host:puerto"
+        
+        Args:
+            bind: Dirección; el host puede omitirse (":8000") para escuchar
+                en todas las interfaces
+                
+        Returns:
+            tuple: (host, puerto)
+        """
+        host, _, puerto = bind.rpartition(":")
+        return host.strip("[]"), int(puerto)
+    
+    @staticmethod
+    def precalentar():
+        """
+        Carga el catálogo y construye los índices que se crean bajo demanda
+        
+        Returns:
+            float: Segundos empleados
+        """
+        inicio = time.perf_counter()
+        Categoria_Service.listar_categorias()
+        Producto_Service.version_datos()
+        Producto_Service.menu_agrupado()
+        Producto_Service.listar_por_rango_precio(0, 0)
+        Producto_Service.buscar("a", 1)
+        return time.perf_counter() - inicio
+    
+    def _preparar_fork(self):
+        """Precalienta el catálogo y congela los objetos para compartirlos entre hijos"""
+        gc.unfreeze()
+        segundos = Servidor.precalentar()
+        # Sin congelar, el recolector de ciclos tocaría las cabeceras de todos
+        # los objetos en cada hijo y anularía la copia en escritura
+        gc.collect()
+        gc.freeze()
+        print(f"Catálogo cargado en {segundos * 1000:.0f} ms", file=sys.stderr, flush=True)
+    
+    def _lanzar_hijo(self):
+        """Crea un proceso hijo de la generación actual"""
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                self._atender()
+            except BaseException:
+                traceback.print_exc()
+                codigo = 1
+            finally:
+                # Sin ejecutar la limpieza heredada del padre, que tampoco vacía stderr
+                sys.stderr.flush()
+                os._exit(codigo)
+        self._hijos[pid] = self._generacion
+        self._inicios[pid] = time.monotonic()
+    
+    def _atender(self):
+        """Bucle de un proceso hijo: atiende peticiones hasta recibir SIGTERM"""
+        servidor = _Servidor_WSGI(self._socket, self.aplicacion, self.manejador)
+        
+        def detener(signum, frame):
+            # Los flujos de /eventos no terminan solos y el cierre los esperaría
+            Centro_Eventos.cerrar()
+            # shutdown() espera al bucle de serve_forever, así que se llama desde otro hilo
+            threading.Thread(target=servidor.shutdown).start()
+        
+        signal.signal(signal.SIGTERM, detener)
+        signal.signal(signal.SIGINT, detener)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        
+        try:
+            servidor.serve_forever(poll_interval=0.5)
+        finally:
+            servidor.server_close()
+            # os._exit no ejecuta atexit: lo pendiente de escribir se escribe aquí
+            Conexion.detener_escritura_diferida()
+    
+    def _recoger_hijos(self):
+        """Recoge los hijos terminados y reemplaza los de la generación actual"""
+        while self._hijos:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generacion = self._hijos.pop(pid, None)
+            inicio = self._inicios.pop(pid, None)
+            if generacion != self._generacion or self._detener:
+                continue
+            
+            if inicio is not None and time.monotonic() - inicio < Servidor.VIDA_MINIMA_S:
+                self._fallos_rapidos += 1
+            else:
+                self._fallos_rapidos = 0
+            if self._fallos_rapidos >= Servidor.MAX_FALLOS_RAPIDOS:
+                print(f"Los procesos hijos fallaron al arrancar {self._fallos_rapidos} veces seguidas; "
+                      "se detiene el servidor", file=sys.stderr, flush=True)
+                self._detener = self._abandonar = True
+                return
+            
+            espera = 0.0
+            if self._fallos_rapidos:
+                espera = min(Servidor.RETARDO_MAXIMO_S, 0.5 * 2 ** (self._fallos_rapidos - 1))
+            demora = f" en {espera:.1f} s" if espera else ""
+            print(f"El proceso {pid} terminó inesperadamente; se reemplaza{demora}", file=sys.stderr, flush=True)
+            self._reemplazos.append(time.monotonic() + espera)
+    
+    def _reemplazar_hijos(self):
+        """Crea los hijos de reemplazo cuya espera ha terminado"""
+        ahora = time.monotonic()
+        pendientes = [instante for instante in self._reemplazos if instante > ahora]
+        for _ in range(len(self._reemplazos) - len(pendientes)):
+            self._lanzar_hijo()
+        self._reemplazos = pendientes
+    
+    def _recargar_hijos(self):
+        """Carga de nuevo el catálogo y reemplaza todos los hijos"""
+        self._recargar = False
+        self._reemplazos = []
+        self._fallos_rapidos = 0
+        anteriores = list(self._hijos)
+        self._preparar_fork()
+        self._generacion += 1
+        for _ in range(self.workers):
+            self._lanzar_hijo()
+        for pid in anteriores:
+            self._senal(pid, signal.SIGTERM)
+        print(f"Procesos recargados (generación {self._generacion})", file=sys.stderr, flush=True)
+    
+    @staticmethod
+    def _senal(pid, signum):
+        """Envía una señal a un proceso que puede haber terminado ya"""
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+    
+    def servir(self):
+        """
+        Abre el socket, crea los procesos hijos y los supervisa hasta recibir SIGTERM o SIGINT
+        
+        Returns:
+            bool: False si se detuvo porque los hijos fallaban al arrancar
+        """
+        familia = socket.AF_INET6 if ":" in self.direccion[0] else socket.AF_INET
+        self._socket = socket.create_server(self.direccion, family=familia, backlog=self.backlog)
+        host, puerto = self._socket.getsockname()[:2]
+        
+        if not hasattr(os, 'fork'):
+            # Sin fork (Windows) se atiende en este mismo proceso
+            print(f"Escuchando en http://{host}:{puerto} (un solo proceso)", file=sys.stderr, flush=True)
+            Servidor.precalentar()
+            servidor = _Servidor_WSGI(self._socket, self.aplicacion, self.manejador)
+            try:
+                servidor.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                Centro_Eventos.cerrar()
+                servidor.server_close()
+            return True
+        
+        def pedir_detencion(signum, frame):
+            self._detener = True
+        
+        def pedir_recarga(signum, frame):
+            self._recargar = True
+        
+        signal.signal(signal.SIGTERM, pedir_detencion)
+        signal.signal(signal.SIGINT, pedir_detencion)
+        signal.signal(signal.SIGHUP, pedir_recarga)
+        
+        self._preparar_fork()
+        for _ in range(self.workers):
+            self._lanzar_hijo()
+        print(f"Escuchando en http://{host}:{puerto} con {self.workers} procesos", file=sys.stderr, flush=True)
+        
+        # La versión de los datos cambia cuando el almacenamiento tiene otro contenido
+        version = Producto_Service.version_datos()
+        siguiente_comprobacion = time.monotonic() + self.intervalo_recarga
+        try:
+            while not self._detener:
+                time.sleep(0.2)
+                self._recoger_hijos()
+                self._reemplazar_hijos()
+                
+                if self.intervalo_recarga and not Conexion.MEMORIA_COMPARTIDA_ACTIVA and time.monotonic() >= siguiente_comprobacion:
+                    siguiente_comprobacion = time.monotonic() + self.intervalo_recarga
+                    if Producto_Service.version_datos() != version:
+                        self._recargar = True
+                
+                if self._recargar:
+                    self._recargar_hijos()
+                    version = Producto_Service.version_datos()
+        finally:
+            for pid in list(self._hijos):
+                self._senal(pid, signal.SIGTERM)
+            for pid in list(self._hijos):
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            self._hijos.clear()
+            self._socket.close()
+            if Conexion.MEMORIA_COMPARTIDA_ACTIVA:
+                for file_name in Catalogo_Compartido.COLECCIONES:
+                    Catalogo_Compartido.liberar(file_name)
+        return not self._abandonar
@@ -1,10 +1,38 @@
 """
 Inicializador para la creación de la aplicación
 """
-from web.App import App
+import threading
 
-# Crear la instancia de la aplicación
-app_instance = App()
+_lock = threading.Lock()
 
-# Exponer la aplicación Flask para que pueda ser importada por WSGI
-app = app_instance.app
+def create_app(config=None):
+    """
+    Crea una aplicación Flask del sistema de restaurante
+    
+    Args:
+        config (dict): Configuración de Flask y opciones RESTAURANTE_*, como
+            RESTAURANTE_DATA_DIR o RESTAURANTE_BACKEND (opcional)
+            
+    Returns:
+        Flask: Aplicación lista para servir por WSGI
+    """
+    from web.App import App
+    return App(config).app
+
+def __getattr__(nombre):
+    """
+    Crea bajo demanda la aplicación por defecto
+    
+    Importar el paquete no construye ninguna aplicación; "app" (la
+    aplicación Flask, para WSGI) y "app_instance" se crean la primera vez
+    que se piden.
+    """
+    if nombre not in ('app', 'app_instance'):
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    
+    with _lock:
+        if 'app_instance' not in globals():
+            from web.App import App
+            instancia = App()
+            globals().update(app_instance=instancia, app=instancia.app)
+    return globals()[nombre]